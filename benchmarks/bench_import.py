@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported until they are actually needed.
+LAZY_MODULES = ("selenium",)
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+DISABLED_ARTICLE = """---
+title: cold start
+note_disabled: true
+---
+
+body
+"""
+
+
+def _import_profile():
+    """新しいプロセスで main を import し、(main の累積 import 時間 [ms], 上位モジュール, import 済みモジュール) を返す"""
+    code = "import sys, json, main; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    # Children are listed before their parent: main's direct imports are the
+    # lines one level deeper between the previous top-level import and main.
+    top = {}
+    total_us = None
+    for index, (cumulative, indent, name) in enumerate(entries):
+        if indent == 1 and name == "main":
+            total_us = cumulative
+            for child_cumulative, child_indent, child in reversed(entries[:index]):
+                if child_indent == 1:
+                    break
+                if child_indent == 3:
+                    top[child] = child_cumulative
+    modules = json.loads(result.stdout.strip().splitlines()[-1])
+    heaviest = dict(sorted(top.items(), key=lambda item: -item[1])[:8])
+    return (total_us or 0) / 1000, {name: us / 1000 for name, us in heaviest.items()}, modules
+
+
+def _disabled_run_seconds():
+    """note_disabled: true の記事で main.py を起動して終了するまでの時間"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "article.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(DISABLED_ARTICLE)
+        env = dict(os.environ, NOTE_CACHE_DIR=tmp)
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "main.py"), "--content-file", path],
+            cwd=tmp,
+            env=env,
+            capture_output=True,
+            check=True,
+        )
+        return time.perf_counter() - started
+
+
+def run(repeat):
+    import_ms = []
+    startup_ms = []
+    heaviest = {}
+    modules = []
+    for _ in range(repeat):
+        total, heaviest, modules = _import_profile()
+        import_ms.append(total)
+        startup_ms.append(_disabled_run_seconds() * 1000)
+    return {
+        "import_ms": round(min(import_ms), 1),
+        "disabled_run_ms": round(min(startup_ms), 1),
+        "heaviest_imports_ms": {name: round(ms, 1) for name, ms in heaviest.items()},
+        "eager_lazy_modules": [
+            name for name in LAZY_MODULES if any(m == name or m.startswith(name + ".") for m in modules)
+        ],
+    }
+
+
+def build_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the import time and cold start of main.py against a budget."
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=250.0,
+        help="fail when importing main takes longer than this (best of --repeat)",
+    )
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = build_args(argv)
+    report = run(args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+    failed = False
+    if report["import_ms"] > args.budget_ms:
+        print(f"main の import が予算を超えています: {report['import_ms']}ms > {args.budget_ms}ms")
+        failed = True
+    if report["eager_lazy_modules"]:
+        print(f"遅延 import すべきモジュールが起動時に読み込まれています: {report['eager_lazy_modules']}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,99 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from note_api.markdown import inline_format  # noqa: E402
+
+# Inputs that make backtracking or multi-pass regex substitution super-linear.
+PATHOLOGICAL_CASES = {
+    "open_brackets": lambda n: "[" * n + "](https://example.com)",
+    "image_openers": lambda n: "![" * n + "x",
+    "unclosed_strike": lambda n: "~~a" * n,
+    "unclosed_emphasis": lambda n: "*a" * n + "*",
+    "lonely_asterisks": lambda n: "*" * n,
+    "unclosed_code": lambda n: "`" + "a" * n,
+    "link_prefixes": lambda n: "[a](https://example.com/" * n,
+    "bare_urls": lambda n: "https://example.com/a " * (n // 8 + 1),
+    "long_url": lambda n: "https://example.com/" + "a" * n + ")" * n,
+}
+
+
+def _time_once(text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        inline_format(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def scaling_exponent(samples):
+    """(入力長, 秒) の組から log-log の傾き (1.0 で線形) を最小二乗で求める"""
+    xs = [math.log(n) for n, _ in samples]
+    ys = [math.log(max(t, 1e-9)) for _, t in samples]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return num / den if den else 0.0
+
+
+def run(sizes, repeat):
+    report = {}
+    for name, build in PATHOLOGICAL_CASES.items():
+        samples = []
+        for n in sizes:
+            text = build(n)
+            samples.append((len(text), _time_once(text, repeat)))
+        report[name] = {
+            "exponent": round(scaling_exponent(samples), 3),
+            "samples": [{"chars": n, "seconds": round(t, 6)} for n, t in samples],
+        }
+    return report
+
+
+def build_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that inline_format scales linearly on pathological inputs."
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[2000, 4000, 8000, 16000, 32000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.3,
+        help="fail when the fitted log-log slope exceeds this value",
+    )
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = build_args(argv)
+    report = run(args.sizes, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    failed = []
+    for name, result in report.items():
+        mark = ""
+        if result["exponent"] > args.max_exponent:
+            mark = "  <-- SUPER-LINEAR"
+            failed.append(name)
+        print(f"{name}: exponent={result['exponent']}{mark}")
+    if failed:
+        print(f"線形時間で処理できない入力があります: {failed}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from note_api.auth import get_note_cookies  # noqa: E402
+from note_api.tracing import Tracer, set_tracer  # noqa: E402
+
+# (name, environment) of each measured configuration.
+VARIANTS = [
+    ("default", {}),
+    ("fast_cold", {"NOTE_FAST_LOGIN": "1"}),
+    ("fast_warm", {"NOTE_FAST_LOGIN": "1"}),
+]
+
+
+def _login_once(email, password, env):
+    """env を設定して 1 回ログインし、(成功したか, 全体 [ms], スパン名 -> ms) を返す"""
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    tracer = Tracer("bench_login")
+    set_tracer(tracer)
+    try:
+        started = time.perf_counter()
+        cookies = get_note_cookies(email, password, fallback_cookies={})
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        set_tracer(None)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    tracer.finish()
+    phases = {}
+    for span in tracer.report()["spans"]:
+        if span["name"].startswith("login."):
+            phases[span["name"]] = phases.get(span["name"], 0) + span["duration_ms"]
+    return bool(cookies), elapsed, phases
+
+
+def run(email, password, repeat):
+    report = {}
+    for name, env in VARIANTS:
+        totals = []
+        phases = {}
+        failures = 0
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as profile_dir:
+                variant_env = dict(env, NOTE_BROWSER_PROFILE_DIR=profile_dir) if env else env
+                if name == "fast_warm":
+                    # Log in once so the measured login can reuse the saved session.
+                    _login_once(email, password, variant_env)
+                ok, total, spans = _login_once(email, password, variant_env)
+            if not ok:
+                failures += 1
+                continue
+            totals.append(total)
+            for span_name, ms in spans.items():
+                phases.setdefault(span_name, []).append(ms)
+        report[name] = {
+            "login_ms": round(statistics.median(totals), 1) if totals else None,
+            "phases_ms": {span: round(statistics.median(ms), 1) for span, ms in sorted(phases.items())},
+            "failures": failures,
+        }
+    return report
+
+
+def build_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the browser login with and without --fast-login (needs Chrome and NOTE_EMAIL / NOTE_PASSWORD)."
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = build_args(argv)
+    email = os.getenv("NOTE_EMAIL")
+    password = os.getenv("NOTE_PASSWORD")
+    if not email or not password:
+        print("NOTE_EMAIL と NOTE_PASSWORD を設定してください。")
+        return 1
+    os.environ["NOTE_LOGIN_MODE"] = "browser"
+    report = run(email, password, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if all(result["login_ms"] is not None for result in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import SIZES, generate_corpus  # noqa: E402
+from note_api.front_matter import (  # noqa: E402
+    parse_front_matter,
+    split_front_matter_and_body,
+)
+from note_api.markdown import markdown_body_length, markdown_to_html  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _front_matter_like_main(content):
+    """main() と同じ方法で front matter を解析する"""
+    front_matter, body = split_front_matter_and_body(content)
+    parsed = parse_front_matter(front_matter)
+    return (
+        parsed.note_disabled,
+        parsed.title,
+        parsed.image,
+        parsed.note_id,
+        parsed.note_published,
+        parsed.note_hashtags,
+        body,
+    )
+
+
+def _time_case(func, inputs, repeat, number=1):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            for item in inputs:
+                func(item)
+        samples.append((time.perf_counter() - start) / (len(inputs) * number))
+    return {
+        "min_us": round(min(samples) * 1e6, 2),
+        "median_us": round(statistics.median(samples) * 1e6, 2),
+        "repeat": repeat,
+        "docs": len(inputs),
+    }
+
+
+def run_benchmarks(sizes, count, repeat):
+    results = {}
+    for size in sizes:
+        documents = generate_corpus(size, count=count)
+        bodies = [split_front_matter_and_body(doc)[1] for doc in documents]
+        results[f"markdown_to_html/{size}"] = _time_case(markdown_to_html, bodies, repeat)
+        results[f"markdown_body_length/{size}"] = _time_case(
+            markdown_body_length, bodies, repeat
+        )
+        results[f"front_matter/{size}"] = _time_case(
+            _front_matter_like_main, documents, repeat, number=50
+        )
+        results[f"markdown_to_html/{size}"]["input_bytes"] = sum(
+            len(body.encode("utf-8")) for body in bodies
+        ) // len(bodies)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance, verbose=True):
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            if verbose:
+                print(f"{name}: baseline なし ({current['min_us']}us)")
+            continue
+        # min is far less sensitive to scheduler noise than the median.
+        ratio = current["min_us"] / previous["min_us"] if previous["min_us"] else 0
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark = "  <-- REGRESSION"
+            regressions.append(name)
+        if verbose:
+            print(
+                f"{name}: {previous['min_us']}us -> {current['min_us']}us "
+                f"(x{ratio:.2f}){mark}"
+            )
+    return regressions
+
+
+def confirm_regressions(results, baseline, args):
+    """劣化したケースのサイズだけを最大 args.confirm 回測り直し、最速の結果で比べ直す
+
+    共有 CPU では実行全体が遅くなる時間帯があるため、1 回の計測だけでは劣化とみなさない。
+    """
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    for _ in range(args.confirm):
+        if not regressions:
+            break
+        sizes = sorted({name.split("/", 1)[1] for name in regressions})
+        print(f"再計測します: {regressions}")
+        for name, rerun in run_benchmarks(sizes, args.count, args.repeat).items():
+            if rerun["min_us"] < results[name]["min_us"]:
+                results[name] = rerun
+        regressions = compare_with_baseline(results, baseline, args.tolerance, verbose=False)
+    return regressions
+
+
+def build_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark note_api.markdown renderer.")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--count", type=int, default=5, help="documents per size")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--output", default=None, help="write JSON results to this path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed slowdown ratio before a case counts as a regression",
+    )
+    parser.add_argument(
+        "--confirm",
+        type=int,
+        default=2,
+        help="re-measure regressed cases this many times before reporting them",
+    )
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = build_args(argv)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": run_benchmarks(args.sizes, args.count, args.repeat),
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"baseline を保存しました: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"baseline が見つからないため比較をスキップします: {args.baseline}")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = confirm_regressions(report["results"], baseline, args)
+    if regressions:
+        print(f"性能劣化を検出: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_document  # noqa: E402
+from note_api import TRANSFER_MODES, http, publisher  # noqa: E402
+from note_api.front_matter import parse_front_matter, split_front_matter_and_body  # noqa: E402
+from note_api.markdown import extract_image_urls, markdown_to_html  # noqa: E402
+from note_api.state import SyncState, content_hashes  # noqa: E402
+
+
+class _FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self._data = {"data": data or {}}
+        self.text = json.dumps(self._data)
+
+    def json(self):
+        return self._data
+
+
+def _fake_request(method, url, **kwargs):
+    if method == "POST" and url.endswith("/text_notes"):
+        return _FakeResponse(201, {"id": 1, "key": "n0000"})
+    return _FakeResponse(200)
+
+
+def measure(document, mode, publish, gzip_requests):
+    """偽のトランスポートで post_article を実行し、エンドポイントごとの送信量を返す"""
+    front_matter_text, body = split_front_matter_and_body(document)
+    front_matter = parse_front_matter(front_matter_text)
+    env = {"NOTE_GZIP_REQUESTS": "1" if gzip_requests else "0", "NOTE_CACHE_DIR": ""}
+    with mock.patch.dict(os.environ, env), mock.patch.object(
+        http.requests.Session, "request", side_effect=_fake_request
+    ), mock.patch.object(
+        publisher, "get_note_cookies", return_value={"_note_session_v5": "x"}
+    ), mock.patch.object(
+        publisher, "upload_markdown_images", side_effect=lambda c, m, **kwargs: (m, [])
+    ), mock.patch.object(
+        publisher, "DraftSaveStrategy", return_value=None
+    ), mock.patch.object(
+        http, "_transfer_stats", {}
+    ), redirect_stdout(StringIO()):
+        publisher.post_article(
+            "bench@example.com",
+            "password",
+            front_matter.title,
+            body,
+            publish=publish,
+            hashtags=front_matter.note_hashtags,
+            transfer_mode=mode,
+        )
+        return http.transfer_stats()
+
+
+def measure_retag(document, gzip_requests):
+    """公開済みの記事のハッシュタグだけを変えたときの送信量と画像アップロード数を返す"""
+    front_matter_text, body = split_front_matter_and_body(document)
+    title = parse_front_matter(front_matter_text).title
+    images = {
+        src: [f"key{i}", f"https://assets.st-note.com/{i}.png"]
+        for i, src in enumerate(extract_image_urls(body))
+    }
+    state = SyncState(None)
+    state.update("bench.md", "1", content_hashes(title, body, ["old"], None, True), images=images)
+    remote = {"id": 1, "key": "n0000", "name": title, "body": markdown_to_html(body), "status": "published"}
+    uploads = []
+
+    def fake_request(method, url, **kwargs):
+        if method == "GET" and url.endswith("/text_notes/1"):
+            return _FakeResponse(200, dict(remote, hashtags=[{"hashtag": {"name": "#old"}}]))
+        return _fake_request(method, url, **kwargs)
+
+    def fake_upload(cookies, markdown, **kwargs):
+        uploads.append(markdown)
+        return markdown, []
+
+    env = {"NOTE_GZIP_REQUESTS": "1" if gzip_requests else "0", "NOTE_CACHE_DIR": ""}
+    with mock.patch.dict(os.environ, env), mock.patch.object(
+        http.requests.Session, "request", side_effect=fake_request
+    ), mock.patch.object(
+        publisher, "get_note_cookies", return_value={"_note_session_v5": "x"}
+    ), mock.patch.object(
+        publisher, "upload_markdown_images", side_effect=fake_upload
+    ), mock.patch.object(
+        http, "_transfer_stats", {}
+    ), redirect_stdout(StringIO()):
+        publisher.post_article(
+            "bench@example.com",
+            "password",
+            title,
+            body,
+            article_id="1",
+            publish=True,
+            hashtags=["new"],
+            state=state,
+            state_key="bench.md",
+        )
+        return http.transfer_stats(), len(uploads)
+
+
+def build_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure request bytes sent by post_article per transfer mode."
+    )
+    parser.add_argument("--size", default="large")
+    parser.add_argument("--draft", action="store_true", help="measure draft posts instead of publish")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = build_args(argv)
+    document = generate_document(args.size)
+    report = {}
+    for mode in TRANSFER_MODES:
+        for gzip_requests in (False, True):
+            stats = measure(document, mode, not args.draft, gzip_requests)
+            name = f"{mode}{'+gzip' if gzip_requests else ''}"
+            report[name] = {
+                "total_bytes": sum(value["bytes"] for value in stats.values()),
+                "endpoints": stats,
+            }
+    stats, uploads = measure_retag(document, False)
+    report["retag"] = {
+        "total_bytes": sum(value["bytes"] for value in stats.values()),
+        "image_upload_passes": uploads,
+        "endpoints": stats,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
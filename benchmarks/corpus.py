@@ -0,0 +1,151 @@
+import random
+
+JAPANESE_SENTENCES = [
+    "最近、朝のコーヒーの淹れ方を少しだけ変えてみました。",
+    "といっても、豆を変えたわけでも、高級な器具を買ったわけでもありません。",
+    "単純に、お湯の温度を少し下げてみただけです。",
+    "気のせいかもしれません。でも、それで十分です。",
+    "今日は天気が良かったので、少し遠回りして帰りました。",
+    "小さな習慣の積み重ねが、思っていたより大きな違いになります。",
+    "週末にまとめて作業するより、毎日少しずつ進めるほうが楽でした。",
+    "メモを取る場所をひとつに決めたら、探しものが減りました。",
+]
+
+ENGLISH_WORDS = [
+    "note",
+    "markdown",
+    "render",
+    "draft",
+    "publish",
+    "article",
+    "coffee",
+    "morning",
+    "weekly",
+    "update",
+]
+
+SIZES = {
+    "small": 8,
+    "medium": 64,
+    "large": 512,
+}
+
+
+def _sentence(rng):
+    text = rng.choice(JAPANESE_SENTENCES)
+    roll = rng.random()
+    if roll < 0.2:
+        word = rng.choice(ENGLISH_WORDS)
+        text += f" [{word}](https://example.com/{word}/{rng.randint(1, 9999)})"
+    elif roll < 0.3:
+        text += f" **{rng.choice(ENGLISH_WORDS)}**"
+    elif roll < 0.4:
+        text += f" *{rng.choice(ENGLISH_WORDS)}*"
+    elif roll < 0.45:
+        text += f" ~~{rng.choice(ENGLISH_WORDS)}~~"
+    elif roll < 0.5:
+        text += f" `{rng.choice(ENGLISH_WORDS)}()`"
+    return text
+
+
+def _paragraph(rng):
+    return "\n".join(_sentence(rng) for _ in range(rng.randint(1, 4)))
+
+
+def _image(rng):
+    image_id = rng.randint(1, 1000)
+    return f"![image {image_id}](https://picsum.photos/id/{image_id}/600/400.jpg)"
+
+
+def _nested_list(rng):
+    lines = []
+    depth = 1
+    for _ in range(rng.randint(3, 12)):
+        depth = max(1, min(5, depth + rng.choice((-1, 0, 1))))
+        marker = "-" if rng.random() < 0.7 else "1."
+        lines.append(f"{'  ' * (depth - 1)}{marker} {_sentence(rng)}")
+    return "\n".join(lines)
+
+
+def _quote(rng):
+    return "\n".join(f"> {_sentence(rng)}" for _ in range(rng.randint(1, 3)))
+
+
+def _code_fence(rng):
+    body = "\n".join(
+        f"print('{rng.choice(ENGLISH_WORDS)} <{idx}> & \"{idx}\"')"
+        for idx in range(rng.randint(2, 8))
+    )
+    return f"```python\n{body}\n```"
+
+
+def _inline_heavy(rng):
+    parts = []
+    for _ in range(rng.randint(5, 15)):
+        word = rng.choice(ENGLISH_WORDS)
+        if rng.random() < 0.5:
+            parts.append(f"[{word}](https://example.com/{word})")
+        else:
+            parts.append(f"![{word}](https://example.com/{word}.png)")
+    return " ".join(parts)
+
+
+BLOCK_BUILDERS = [
+    (_paragraph, 40),
+    (_nested_list, 15),
+    (_quote, 10),
+    (_code_fence, 8),
+    (_image, 12),
+    (_inline_heavy, 10),
+    (lambda rng: "---", 5),
+]
+
+
+def generate_front_matter(rng, title):
+    hashtags = ", ".join(f'"{rng.choice(ENGLISH_WORDS)}"' for _ in range(rng.randint(1, 5)))
+    return "\n".join(
+        [
+            "---",
+            "layout: post",
+            f'title: "{title}"',
+            "author: [",
+            '  "noraworld"',
+            "]",
+            f'description: "{rng.choice(JAPANESE_SENTENCES)}"',
+            f'image: "https://picsum.photos/id/{rng.randint(1, 1000)}/1280/670.jpg"',
+            "date: 2026-02-25 09:30:00 +09:00",
+            "tags: [",
+            '  "thoughts"',
+            "]",
+            f"note_hashtags: [{hashtags}]",
+            f"note_published: {'true' if rng.random() < 0.5 else 'false'}",
+            f"note_id: n{rng.randint(10 ** 11, 10 ** 12 - 1):x}",
+            "---",
+            "",
+        ]
+    )
+
+
+def generate_body(rng, sections):
+    builders = [builder for builder, _ in BLOCK_BUILDERS]
+    weights = [weight for _, weight in BLOCK_BUILDERS]
+    blocks = []
+    for idx in range(sections):
+        level = "#" if idx == 0 else rng.choice(("##", "###"))
+        blocks.append(f"{level} {_sentence(rng)}")
+        for builder in rng.choices(builders, weights=weights, k=rng.randint(2, 6)):
+            blocks.append(builder(rng))
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_document(size="medium", seed=0):
+    """ベンチマーク用の Markdown 記事 (front matter 付き) を生成"""
+    sections = SIZES[size] if isinstance(size, str) else int(size)
+    rng = random.Random(f"{size}:{seed}")
+    title = f"ベンチマーク記事 {size} #{seed}"
+    return generate_front_matter(rng, title) + generate_body(rng, sections)
+
+
+def generate_corpus(size="medium", count=10, seed=0):
+    """同じサイズの記事を count 件生成"""
+    return [generate_document(size, seed + idx) for idx in range(count)]
@@ -1,11 +1,34 @@
 import argparse
+import json
 import os
-import re
 import sys
+import time
+from datetime import datetime
+from functools import partial
 
 from dotenv import load_dotenv
 
-from note_api import post_to_note
+from note_api import TRANSFER_MODES, post_article
+from note_api.accounts import AccountConfigError, account_router, load_accounts
+from note_api.article_index import ArticleIndex
+from note_api.auth import LOGIN_MODES, login_mode
+from note_api.batch import format_summary, post_files, post_routed_files, prepare_article
+from note_api.cache import account_key, cache_path
+from note_api.client import NoteClient
+from note_api.deadline import Deadline, set_deadline
+from note_api.dryrun import dry_run_file
+from note_api.gitdiff import GitDiffError, changed_markdown_files, note_id_at_revision
+from note_api.http import format_transfer_stats
+from note_api.jobqueue import JobQueue, run_queue
+from note_api.journal import Journal
+from note_api.metrics import add_sink, create_sink, flush_sinks
+from note_api.profiling import DEFAULT_PROFILE_DIR, profile_run
+from note_api.render import iter_markdown_paths, map_files, render_files
+from note_api.state import SyncState, state_key_for_path
+from note_api.strategy import DraftSaveStrategy
+from note_api.tracing import Tracer, get_tracer, otlp_traces_endpoint, set_tracer
+from note_api.watch import watch_changes
+from note_api.writeback import FSYNC_POLICIES, NoteIdWriteBack, write_back_note_id
 
 
 def _get_input(name, env_fallback=None, default=None):
@@ -37,216 +60,694 @@ def _read_content(content_arg, content_file_arg):
     return content
 
 
-def _split_front_matter_and_body(content):
-    if not content:
-        return "", content
-    text = content.replace("\r\n", "\n")
-    if not text.startswith("---\n"):
-        return "", content
-
-    end = text.find("\n---\n", 4)
-    if end == -1:
-        return "", content
+def build_args():
+    parser = argparse.ArgumentParser(
+        description="Post markdown content to note.com draft."
+    )
+    parser.add_argument("--note-email", default=None)
+    parser.add_argument("--note-password", default=None)
+    parser.add_argument("--content", default=None)
+    parser.add_argument("--content-file", default=None)
+    parser.add_argument(
+        "--content-dir",
+        default=None,
+        help="post every markdown file under this directory with a single login",
+    )
+    parser.add_argument(
+        "--glob",
+        action="append",
+        default=None,
+        metavar="PATTERN",
+        help="post every markdown file matching this glob (repeatable)",
+    )
+    parser.add_argument(
+        "--git-base",
+        default=None,
+        metavar="REV",
+        help="post only markdown files added, modified or renamed since this commit",
+    )
+    parser.add_argument("--git-head", default=None, metavar="REV")
+    parser.add_argument("--image-path", default=None)
+    parser.add_argument("--article-id", default=None)
+    parser.add_argument("--write-note-id", action="store_true")
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default=None)
+    parser.add_argument("--state-file", default=None)
+    parser.add_argument(
+        "--journal",
+        default=None,
+        metavar="PATH",
+        help="checkpoint journal used to resume interrupted posts",
+    )
+    parser.add_argument("--transfer-mode", choices=TRANSFER_MODES, default=None)
+    parser.add_argument("--gzip-requests", action="store_true")
+    parser.add_argument(
+        "--hedge-downloads",
+        action="store_true",
+        help="send a second request for source image downloads slower than the recent p95",
+    )
+    parser.add_argument(
+        "--embed-urls",
+        action="store_true",
+        help="render lines that contain only a URL as note embed blocks (unverified on note)",
+    )
+    parser.add_argument("--publish", action="store_true")
+    parser.add_argument("--show-browser", action="store_true")
+    parser.add_argument(
+        "--fast-login",
+        action="store_true",
+        help="log in with an eager page load, blocked images/fonts/trackers and a reused browser profile",
+    )
+    parser.add_argument(
+        "--browser-profile-dir",
+        default=None,
+        metavar="DIR",
+        help="keep the Chrome profile of each account under DIR to reuse its session",
+    )
+    parser.add_argument(
+        "--login-mode",
+        choices=LOGIN_MODES,
+        default=None,
+        help="browser: log in with Chrome (default); session: only use session cookies from the environment",
+    )
+    parser.add_argument(
+        "--accounts",
+        default=None,
+        metavar="FILE",
+        help="JSON config mapping content paths or note_account front matter to accounts",
+    )
+    parser.add_argument(
+        "--match-existing",
+        action="store_true",
+        help="look up articles without note_id on note by note_key or title before creating them",
+    )
+    parser.add_argument(
+        "--render",
+        nargs="+",
+        default=None,
+        metavar="PATH",
+        help="render markdown files, directories or glob patterns without posting",
+    )
+    parser.add_argument("--render-output", default=None, metavar="DIR")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and repost --content-file / --content-dir / --glob files when they change",
+    )
+    parser.add_argument("--debounce", type=float, default=1.0, metavar="SECONDS")
+    parser.add_argument("--queue-db", default=None, metavar="PATH")
+    parser.add_argument(
+        "--enqueue",
+        nargs="+",
+        default=None,
+        metavar="PATH",
+        help="add post jobs for markdown files, directories or glob patterns to --queue-db",
+    )
+    parser.add_argument("--priority", type=int, default=0)
+    parser.add_argument(
+        "--run-at",
+        default=None,
+        help="schedule enqueued jobs (ISO 8601 date/time, e.g. 2026-01-01T09:00+09:00)",
+    )
+    parser.add_argument(
+        "--run-queue",
+        action="store_true",
+        help="process every job in --queue-db that is due, then exit",
+    )
+    parser.add_argument("--account-concurrency", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="build every request payload without logging in or sending anything",
+    )
+    parser.add_argument("--dry-run-output", default=None, metavar="DIR")
+    parser.add_argument(
+        "--trace-report",
+        default=None,
+        metavar="PATH",
+        help="write per-phase timings and trace spans of this run as JSON",
+    )
+    parser.add_argument(
+        "--otlp-endpoint",
+        default=None,
+        metavar="URL",
+        help="export trace spans to an OpenTelemetry collector (OTLP/HTTP JSON)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="append",
+        default=None,
+        metavar="SINK",
+        help="HTTP metrics sink: prometheus:PATH, json:PATH or statsd:HOST:PORT (repeatable)",
+    )
+    parser.add_argument(
+        "--deadline",
+        default=None,
+        metavar="SECONDS",
+        help="stop starting new steps and requests once the run has taken SECONDS",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_DIR,
+        default=None,
+        metavar="DIR",
+        help=f"profile the whole run and write the results to DIR (default: {DEFAULT_PROFILE_DIR})",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="also track allocations with tracemalloc in --profile mode",
+    )
+    return parser.parse_args()
 
-    front_matter = text[4:end]
-    body = text[end + 5 :]
-    return front_matter, body
 
+def _run_render(args):
+    output_dir = args.render_output
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
-def _extract_title_from_front_matter(front_matter):
-    return _extract_front_matter_value(front_matter, "title")
+    failed = 0
+    results = render_files(
+        iter_markdown_paths(args.render),
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+    for path, html, body_length, image_urls in results:
+        if html is None:
+            failed += 1
+            continue
+        if output_dir:
+            relative = os.path.relpath(path)
+            if relative.startswith(os.pardir):
+                relative = os.path.basename(path)
+            html_path = os.path.join(output_dir, os.path.splitext(relative)[0] + ".html")
+            os.makedirs(os.path.dirname(html_path), exist_ok=True)
+            with open(html_path, "w", encoding="utf-8") as f:
+                f.write(html)
+        record = {
+            "path": path,
+            "body_length": body_length,
+            "html_bytes": len(html.encode("utf-8")),
+            "image_urls": image_urls,
+        }
+        print(json.dumps(record, ensure_ascii=False))
+    return 0 if failed == 0 else 1
+
+
+def _run_dry_run(args, paths, options):
+    output_dir = args.dry_run_output
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    totals = {}
+    files = failed = 0
+    records = map_files(
+        partial(dry_run_file, publish=options["publish"], transfer_mode=options["transfer_mode"]),
+        paths,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+    for record in records:
+        files += 1
+        if record.get("error") or record.get("problems"):
+            failed += 1
+        for stage, value in (record.get("timings_us") or {}).items():
+            totals[stage] = totals.get(stage, 0) + value
+        if output_dir and "requests" in record:
+            relative = os.path.relpath(record["path"])
+            if relative.startswith(os.pardir):
+                relative = os.path.basename(record["path"])
+            json_path = os.path.join(output_dir, os.path.splitext(relative)[0] + ".json")
+            os.makedirs(os.path.dirname(json_path), exist_ok=True)
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, indent=2)
+            # Keep stdout small: payloads are in the file, sizes stay on the line.
+            for request in record["requests"]:
+                request.pop("payload", None)
+        print(json.dumps(record, ensure_ascii=False))
+
+    stages = ", ".join(f"{stage} {value / 1000:.1f}ms" for stage, value in totals.items())
+    print(
+        f"dry-run: {files} ファイル (問題あり {failed} 件) {time.perf_counter() - started:.2f}s"
+        f" / 段階別 CPU 時間の合計: {stages or 'なし'}",
+        file=sys.stderr,
+    )
+    return 0 if failed == 0 else 1
 
 
-def _extract_front_matter_value(front_matter, key):
-    if not front_matter:
-        return None
-    for line in front_matter.splitlines():
-        m = re.match(rf"^\s*{re.escape(key)}\s*:\s*(.+?)\s*$", line)
-        if not m:
-            continue
-        value = m.group(1).strip()
-        if (value.startswith('"') and value.endswith('"')) or (
-            value.startswith("'") and value.endswith("'")
-        ):
-            value = value[1:-1]
-        return value.strip() or None
-    return None
+def _batch_sources(args):
+    content_dir = args.content_dir or _get_input("content_dir")
+    globs = args.glob
+    if not globs:
+        glob_input = _get_input("glob") or ""
+        globs = [line.strip() for line in glob_input.splitlines() if line.strip()]
+    return content_dir, globs
 
 
-def _extract_front_matter_bool(front_matter, key):
-    value = _extract_front_matter_value(front_matter, key)
-    return _is_truthy(value)
+def _git_changed_paths(options, state):
+    """git diff で変更のあった Markdown ファイルと、リネーム元から引き継ぐ note_id を返す"""
+    base = options["git_base"]
+    head = options["git_head"]
+    changed = changed_markdown_files(
+        base, head, content_dir=options["content_dir"], globs=options["globs"]
+    )
+    print(f"git diff ({base}..{head}): 対象の Markdown ファイル {len(changed)} 件")
+    paths = []
+    article_ids = {}
+    for entry in changed:
+        paths.append(entry.path)
+        if entry.status != "R":
+            continue
+        print(f"リネーム: {entry.old_path} -> {entry.path}")
+        if state is not None:
+            state.rename(state_key_for_path(entry.old_path), state_key_for_path(entry.path))
+        note_id = note_id_at_revision(base, entry.old_path)
+        if note_id:
+            article_ids[entry.path] = note_id
+    return paths, article_ids
 
 
-def _has_front_matter_key(front_matter, key):
-    if not front_matter:
+def _check_credentials(email, password):
+    if not email:
+        print("Missing note email. Set --note-email or NOTE_EMAIL.")
         return False
-    pattern = re.compile(rf"^\s*{re.escape(key)}\s*:", flags=re.MULTILINE)
-    return pattern.search(front_matter) is not None
-
+    if not password and login_mode() != "session":
+        print("Missing note password. Set --note-password or NOTE_PASSWORD.")
+        return False
+    return True
 
-def _strip_quotes(text):
-    value = (text or "").strip()
-    if (value.startswith('"') and value.endswith('"')) or (
-        value.startswith("'") and value.endswith("'")
-    ):
-        return value[1:-1].strip()
-    return value
 
+def _account_clients(email, password, options, workers=None):
+    """(アカウント名 -> NoteClient, パス -> アカウント名の関数, アカウント名 -> 同時投稿数)
 
-def _extract_front_matter_string_list(front_matter, key):
-    if not front_matter:
-        return []
-    lines = front_matter.splitlines()
-    key_pattern = re.compile(rf"^\s*{re.escape(key)}\s*:\s*(.*)$")
-    top_level_key_pattern = re.compile(r"^[A-Za-z0-9_-]+\s*:")
+    accounts 設定がなければ email / password の 1 アカウントだけを使う。
+    """
+    if not options["accounts"]:
+        client = NoteClient(
+            email, password, journal=options["journal"], article_index=options["article_index"]
+        )
+        return {None: client}, lambda path: None, {None: workers}
+
+    accounts, default = options["accounts"]
+    # One strategy object so concurrent clients do not overwrite each other's cache file.
+    strategy = DraftSaveStrategy()
+    clients = {
+        name: NoteClient(
+            account.email,
+            account.password,
+            journal=options["journal"],
+            rate_limit=account.rate_limit,
+            pool_size=account.concurrency,
+            draft_strategy=strategy,
+            fallback_cookies=account.fallback_cookies(),
+            article_index=options["article_index"],
+        )
+        for name, account in accounts.items()
+    }
+    concurrency = {name: account.concurrency for name, account in accounts.items()}
+    return clients, account_router(accounts, default), concurrency
 
-    for idx, line in enumerate(lines):
-        m = key_pattern.match(line)
-        if not m:
-            continue
-        rest = m.group(1).strip()
-        if rest.startswith("["):
-            flow_text = rest
-            if not rest.endswith("]"):
-                for sub in lines[idx + 1 :]:
-                    flow_text += " " + sub.strip()
-                    if "]" in sub:
-                        break
-            start = flow_text.find("[")
-            end = flow_text.rfind("]")
-            if start == -1 or end == -1 or end <= start:
-                return []
-            inner = flow_text[start + 1 : end].strip()
-            if not inner:
-                return []
-            parts = re.findall(r'''(?:'[^']*'|"[^"]*"|[^,]+)''', inner)
-            return [_strip_quotes(p) for p in parts if _strip_quotes(p)]
-        if rest:
-            value = _strip_quotes(rest)
-            return [value] if value else []
-
-        items = []
-        for sub in lines[idx + 1 :]:
-            if not sub.strip():
-                continue
-            if top_level_key_pattern.match(sub.strip()):
-                break
-            item_match = re.match(r"^\s*-\s*(.+?)\s*$", sub)
-            if item_match:
-                value = _strip_quotes(item_match.group(1))
-                if value:
-                    items.append(value)
-            elif items:
-                break
-        return items
-    return []
-
-
-def _upsert_note_id_to_content_file(content_file, note_id):
-    try:
-        with open(content_file, "r", encoding="utf-8") as f:
-            source = f.read()
-    except Exception as exc:
-        print(f"note_id の書き戻し失敗: ファイル読み込み不可 ({exc})")
-        return False
 
-    front_matter, body = _split_front_matter_and_body(source)
-    if not front_matter:
-        print("note_id の書き戻しスキップ: YAML front matter がありません。")
-        return False
+def _run_batch(args, email, password, options):
+    clients, route, workers = _account_clients(
+        email, password, options, workers=args.workers or _get_input("workers")
+    )
+    state = SyncState(options["state_file"]) if options["state_file"] else None
+    write_back = NoteIdWriteBack(fsync=options["fsync"]) if options["write_note_id"] else None
+
+    article_ids = None
+    if options["git_base"]:
+        try:
+            paths, article_ids = _git_changed_paths(options, state)
+        except GitDiffError as exc:
+            print(exc)
+            return 1
+    else:
+        patterns = ([options["content_dir"]] if options["content_dir"] else []) + options["globs"]
+        paths = iter_markdown_paths(patterns)
 
-    note_id_line = f"note_id: {note_id}"
-    if re.search(r"^\s*note_id\s*:\s*.+$", front_matter, flags=re.MULTILINE):
-        updated_front_matter = re.sub(
-            r"^\s*note_id\s*:\s*.+$",
-            note_id_line,
-            front_matter,
-            count=1,
-            flags=re.MULTILINE,
+    started = time.perf_counter()
+    try:
+        rows = post_routed_files(
+            clients,
+            route,
+            paths,
+            publish=options["publish"],
+            state=state,
+            write_back=write_back,
+            transfer_mode=options["transfer_mode"],
+            workers=workers,
+            article_ids=article_ids,
         )
-    else:
-        if front_matter.endswith("\n"):
-            updated_front_matter = f"{front_matter}{note_id_line}"
-        else:
-            updated_front_matter = f"{front_matter}\n{note_id_line}"
+    finally:
+        if write_back is not None:
+            write_back.flush()
+        if state is not None:
+            state.save()
+    print(format_summary(rows, time.perf_counter() - started))
+    print(format_transfer_stats())
+    return 0 if all(row["status"] != "failed" for row in rows) else 1
+
+
+def _run_watch(args, targets, email, password, options):
+    client = NoteClient(
+        email, password, journal=options["journal"], article_index=options["article_index"]
+    )
+    # Without a state file an in-memory one still skips unchanged saves and
+    # reuses uploaded images between refreshes.
+    state = SyncState(options["state_file"])
+    write_back = NoteIdWriteBack(fsync=options["fsync"]) if options["write_note_id"] else None
+    if not client.get_cookies():
+        print("ログインに失敗したため監視を開始できません。")
+        return 1
 
-    updated_source = f"---\n{updated_front_matter}\n---\n{body}"
+    print(f"変更を監視しています: {', '.join(targets)} (Ctrl+C で終了)")
+    own_writes = {}
     try:
-        with open(content_file, "w", encoding="utf-8") as f:
-            f.write(updated_source)
-    except Exception as exc:
-        print(f"note_id の書き戻し失敗: ファイル書き込み不可 ({exc})")
-        return False
+        for paths in watch_changes(targets, debounce=args.debounce):
+            # Skip files whose only change is our own note_id write-back.
+            paths = [path for path in paths if own_writes.pop(path, None) != _mtime_ns(path)]
+            if not paths:
+                continue
+            started = time.perf_counter()
+            rows = post_files(
+                client,
+                paths,
+                publish=options["publish"],
+                state=state,
+                write_back=write_back,
+                transfer_mode=options["transfer_mode"],
+                workers=args.workers or _get_input("workers"),
+            )
+            if write_back is not None:
+                written = list(write_back.pending)
+                write_back.flush()
+                for path in written:
+                    own_writes[os.path.relpath(path)] = _mtime_ns(path)
+            state.save()
+            print(format_summary(rows, time.perf_counter() - started))
+    except KeyboardInterrupt:
+        print("監視を終了します。")
+    print(format_transfer_stats())
+    return 0
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
 
-    print(f"content_file に note_id を書き戻しました: {content_file} (note_id={note_id})")
-    return True
 
+def _parse_run_at(value):
+    if not value:
+        return None
+    # fromisoformat() before Python 3.11 does not accept a trailing "Z".
+    text = value.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _run_queue_commands(args, email, password, options):
+    queue = JobQueue(options["queue_db"])
+    clients, route, concurrency = _account_clients(email, password, options)
+
+    if args.enqueue:
+        try:
+            run_at = _parse_run_at(args.run_at)
+        except ValueError:
+            print(f"Invalid --run-at: {args.run_at}")
+            return 1
+        action = "publish" if options["publish"] else "post"
+        jobs = []
+        for path in iter_markdown_paths(args.enqueue):
+            client = clients.get(route(path))
+            if client is None:
+                print(f"アカウントが決まらないためスキップします: {path}")
+                continue
+            jobs.append((account_key(client.email), path, action, args.priority, run_at))
+        ids = queue.enqueue_many(jobs)
+        print(f"{len(ids)} 件のジョブを追加しました: {options['queue_db']}")
 
-def build_args():
-    parser = argparse.ArgumentParser(
-        description="Post markdown content to note.com draft."
-    )
-    parser.add_argument("--note-email", default=None)
-    parser.add_argument("--note-password", default=None)
-    parser.add_argument("--content", default=None)
-    parser.add_argument("--content-file", default=None)
-    parser.add_argument("--image-path", default=None)
-    parser.add_argument("--article-id", default=None)
-    parser.add_argument("--write-note-id", action="store_true")
-    parser.add_argument("--publish", action="store_true")
-    parser.add_argument("--show-browser", action="store_true")
-    return parser.parse_args()
+    if not args.run_queue:
+        return 0
+
+    state = SyncState(options["state_file"]) if options["state_file"] else None
+    write_back = NoteIdWriteBack(fsync=options["fsync"]) if options["write_note_id"] else None
+    default_limit = args.account_concurrency or _get_input("account_concurrency", default=1)
+    account_limits = {
+        account_key(client.email): concurrency[name]
+        for name, client in clients.items()
+        if concurrency[name]
+    }
+    started = time.perf_counter()
+    try:
+        rows = run_queue(
+            queue,
+            {account_key(client.email): client for client in clients.values()},
+            workers=args.workers or _get_input("workers", default=2),
+            account_limits=account_limits,
+            default_limit=int(default_limit),
+            state=state,
+            write_back=write_back,
+            transfer_mode=options["transfer_mode"],
+        )
+    finally:
+        if write_back is not None:
+            write_back.flush()
+        if state is not None:
+            state.save()
+    print(format_summary(rows, time.perf_counter() - started))
+    print(f"キューの状態: {queue.counts()}")
+    print(format_transfer_stats())
+    return 0 if all(row["status"] != "failed" for row in rows) else 1
 
 
 def main():
     load_dotenv()
     args = build_args()
+    profile = args.profile or _get_input("profile")
+    if profile and _is_truthy(profile):
+        profile = DEFAULT_PROFILE_DIR
+    if not profile or str(profile).strip().lower() in ("0", "false", "no", "off"):
+        return _main(args)
+    memory = args.profile_memory or _is_truthy(_get_input("profile_memory"))
+    with profile_run(profile, memory=memory):
+        return _main(args)
+
+
+def _main(args):
+    if args.embed_urls or _is_truthy(_get_input("embed_urls")):
+        os.environ["NOTE_EMBED_URLS"] = "1"
+    if args.render:
+        return _run_render(args)
+
+    trace_report = args.trace_report or _get_input("trace_report")
+    otlp_endpoint = args.otlp_endpoint or _get_input(
+        "otlp_endpoint", env_fallback="OTEL_EXPORTER_OTLP_ENDPOINT"
+    )
+    metric_specs = args.metrics or [
+        line.strip() for line in (_get_input("metrics") or "").splitlines() if line.strip()
+    ]
+    try:
+        sinks = [create_sink(spec) for spec in metric_specs]
+    except ValueError as exc:
+        print(exc)
+        return 1
+    if not trace_report and not otlp_endpoint and not sinks:
+        return _run_with_deadline(args)
+
+    for sink in sinks:
+        add_sink(sink)
+    tracer = None
+    if trace_report or otlp_endpoint:
+        tracer = Tracer("main")
+        set_tracer(tracer)
+    status = 1
+    try:
+        status = _run_with_deadline(args)
+        return status
+    finally:
+        if tracer is not None:
+            tracer.root.set(exit_status=status)
+            tracer.finish()
+            set_tracer(None)
+            if trace_report:
+                tracer.write_report(trace_report)
+                print(f"トレースを書き出しました: {trace_report}")
+            if otlp_endpoint:
+                tracer.export_otlp(otlp_traces_endpoint(otlp_endpoint))
+        if sinks:
+            flush_sinks()
+            print(f"メトリクスを書き出しました: {', '.join(metric_specs)}")
+
+
+def _run_with_deadline(args):
+    """--deadline があれば実行全体に期限を設けて _run を実行し、工程別の所要時間を報告する"""
+    seconds = args.deadline or _get_input("deadline")
+    if not seconds:
+        return _run(args)
+    try:
+        budget = float(seconds)
+    except ValueError:
+        budget = 0
+    if budget <= 0:
+        print(f"Invalid deadline: {seconds} (expected a positive number of seconds)")
+        return 1
 
+    deadline = Deadline(budget)
+    set_deadline(deadline)
+    try:
+        return _run(args)
+    finally:
+        set_deadline(None)
+        report = deadline.report()
+        print(deadline.format_report())
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.root.set(
+                deadline_seconds=budget,
+                deadline_exceeded=report["exceeded"],
+                deadline_exceeded_in=report["exceeded_in"],
+            )
+
+
+def _run(args):
     email = args.note_email or _get_input("note_email", env_fallback="NOTE_EMAIL")
     password = args.note_password or _get_input(
         "note_password", env_fallback="NOTE_PASSWORD"
     )
-    content_arg = args.content or _get_input("content")
-    content_file = args.content_file or _get_input("content_file")
-    content = _read_content(content_arg, content_file)
     image_path = args.image_path or _get_input("image_path")
-    article_id = args.article_id or _get_input("article_id")
     write_note_id = args.write_note_id or _is_truthy(_get_input("write_note_id"))
-    publish_input = _is_truthy(_get_input("publish"))
+    publish_input = args.publish or _is_truthy(_get_input("publish"))
+    fsync = args.fsync or _get_input("fsync", default="file")
+    state_file = args.state_file or _get_input("state_file")
+    transfer_mode = args.transfer_mode or _get_input("transfer_mode", default="full")
+    if transfer_mode not in TRANSFER_MODES:
+        print(f"Unknown transfer mode: {transfer_mode} (expected one of {', '.join(TRANSFER_MODES)})")
+        return 1
+    if args.gzip_requests or _is_truthy(_get_input("gzip_requests")):
+        os.environ["NOTE_GZIP_REQUESTS"] = "1"
+    if args.hedge_downloads or _is_truthy(_get_input("hedge_downloads")):
+        os.environ["NOTE_HEDGE_DOWNLOADS"] = "1"
     if args.show_browser:
         os.environ["NOTE_SHOW_BROWSER"] = "1"
+    if args.fast_login or _is_truthy(_get_input("fast_login")):
+        os.environ["NOTE_FAST_LOGIN"] = "1"
+    browser_profile = args.browser_profile_dir or _get_input("browser_profile_dir")
+    if browser_profile:
+        os.environ["NOTE_BROWSER_PROFILE_DIR"] = browser_profile
+    selected_login_mode = args.login_mode or _get_input("login_mode")
+    if selected_login_mode:
+        if selected_login_mode not in LOGIN_MODES:
+            print(
+                f"Unknown login mode: {selected_login_mode} (expected one of {', '.join(LOGIN_MODES)})"
+            )
+            return 1
+        os.environ["NOTE_LOGIN_MODE"] = selected_login_mode
+    journal = Journal(
+        args.journal or _get_input("journal_file", default=cache_path("journal.jsonl"))
+    )
 
-    front_matter, body = _split_front_matter_and_body(content)
-    note_disabled = _extract_front_matter_bool(front_matter, "note_disabled")
-    title = _extract_title_from_front_matter(front_matter)
-    eyecatch_image_url = _extract_front_matter_value(front_matter, "image")
-    front_matter_note_id = _extract_front_matter_value(front_matter, "note_id")
-    front_matter_published = _extract_front_matter_bool(front_matter, "note_published")
-    hashtags = None
-    if _has_front_matter_key(front_matter, "note_hashtags"):
-        hashtags = []
-        for tag in _extract_front_matter_string_list(front_matter, "note_hashtags"):
-            value = str(tag).strip()
-            if not value:
-                continue
-            if not value.startswith("#"):
-                value = f"#{value}"
-            hashtags.append(value)
-        hashtags = list(dict.fromkeys(hashtags))
-    publish = args.publish or publish_input or front_matter_published
-    article_id = article_id or front_matter_note_id
-    content = body
+    options = {
+        "publish": publish_input,
+        "state_file": state_file,
+        "fsync": fsync,
+        "write_note_id": write_note_id,
+        "transfer_mode": transfer_mode,
+        "journal": journal,
+        "accounts": None,
+        "article_index": None,
+    }
+    if not args.dry_run and (args.match_existing or _is_truthy(_get_input("match_existing"))):
+        # One index for every client so they share a single cache file.
+        options["article_index"] = ArticleIndex()
+    accounts_file = args.accounts or _get_input("accounts_file")
+    if accounts_file and not args.dry_run:
+        try:
+            options["accounts"] = load_accounts(accounts_file, email, password)
+        except AccountConfigError as exc:
+            print(exc)
+            return 1
+
+    if args.dry_run and (args.enqueue or args.run_queue or args.watch):
+        print("--dry-run cannot be combined with --enqueue, --run-queue or --watch.")
+        return 1
+
+    queue_db = args.queue_db or _get_input("queue_db")
+    if args.enqueue or args.run_queue:
+        if not queue_db:
+            print("Missing queue database. Set --queue-db or INPUT_QUEUE_DB.")
+            return 1
+        if not options["accounts"]:
+            if not email:
+                print("Missing note email. Set --note-email or NOTE_EMAIL.")
+                return 1
+            # Enqueueing only needs the account; the password is used by --run-queue.
+            if args.run_queue and not _check_credentials(email, password):
+                return 1
+        options["queue_db"] = queue_db
+        return _run_queue_commands(args, email, password, options)
+
+    content_dir, globs = _batch_sources(args)
+    git_base = args.git_base or _get_input("git_base")
+    if args.dry_run and (git_base or content_dir or globs):
+        if git_base:
+            head = args.git_head or _get_input("git_head", default="HEAD")
+            try:
+                changed = changed_markdown_files(git_base, head, content_dir=content_dir, globs=globs)
+            except GitDiffError as exc:
+                print(exc)
+                return 1
+            paths = [entry.path for entry in changed]
+        else:
+            paths = iter_markdown_paths(([content_dir] if content_dir else []) + globs)
+        return _run_dry_run(args, paths, options)
+
+    if args.watch:
+        targets = ([content_dir] if content_dir else []) + globs
+        content_file = args.content_file or _get_input("content_file")
+        if content_file:
+            targets.append(content_file)
+        if not targets:
+            print("Missing watch target. Set --content-file, --content-dir or --glob.")
+            return 1
+        if not _check_credentials(email, password):
+            return 1
+        return _run_watch(args, targets, email, password, options)
+
+    if git_base or content_dir or globs:
+        if not options["accounts"] and not _check_credentials(email, password):
+            return 1
+        options.update(
+            content_dir=content_dir,
+            globs=globs,
+            git_base=git_base,
+            git_head=args.git_head or _get_input("git_head", default="HEAD"),
+        )
+        return _run_batch(args, email, password, options)
+
+    content_arg = args.content or _get_input("content")
+    content_file = args.content_file or _get_input("content_file")
+    content = _read_content(content_arg, content_file)
+    article = prepare_article(
+        content or "",
+        publish=publish_input,
+        article_id=args.article_id or _get_input("article_id"),
+    )
+    note_disabled = article["disabled"]
+    title = article["title"]
+    content = article["content"]
 
     if note_disabled:
         print("YAML front matter で note_disabled: true が指定されているため、note への処理をスキップします。")
         return 0
 
-    if not email:
-        print("Missing note email. Set --note-email or NOTE_EMAIL.")
-        return 1
-    if not password:
-        print("Missing note password. Set --note-password or NOTE_PASSWORD.")
+    if not args.dry_run and not _check_credentials(email, password):
         return 1
     if not title:
         print("Missing title in YAML front matter (title: ...).")
@@ -255,21 +756,42 @@ def main():
         print("Missing content. Set --content / --content-file / INPUT_CONTENT.")
         return 1
 
-    success, posted_article_id, created_new = post_to_note(
+    state = None
+    state_key = None
+    if state_file:
+        if content_file:
+            state = SyncState(state_file)
+            state_key = state_key_for_path(content_file)
+        else:
+            print("同期状態ファイルは content_file 指定時のみ使用します。")
+
+    result = post_article(
         email,
         password,
         title,
         content,
         image_path,
-        eyecatch_image_url=eyecatch_image_url,
-        article_id=article_id,
-        publish=publish,
-        hashtags=hashtags,
+        eyecatch_image_url=article["eyecatch_image_url"],
+        article_id=article["article_id"],
+        publish=article["publish"],
+        hashtags=article["hashtags"],
+        state=state,
+        state_key=state_key,
+        transfer_mode=transfer_mode,
+        journal=journal,
+        dry_run=args.dry_run,
+        article_index=options["article_index"],
+        note_key=article["note_key"],
+        content_file=content_file,
     )
+    success, posted_article_id = result.success, result.article_id
+    if args.dry_run:
+        return 0 if success else 1
+    print(format_transfer_stats())
     if success and write_note_id:
-        if created_new and posted_article_id:
+        if (result.created_new or result.matched) and posted_article_id:
             if content_file:
-                _upsert_note_id_to_content_file(content_file, posted_article_id)
+                write_back_note_id(content_file, posted_article_id, fsync=fsync)
             else:
                 print("note_id の書き戻しスキップ: content_file が指定されていません。")
         else:
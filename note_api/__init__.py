@@ -1,3 +1,3 @@
-from .publisher import post_to_note
+from .publisher import TRANSFER_MODES, PostResult, post_article, post_to_note
 
-__all__ = ["post_to_note"]
+__all__ = ["TRANSFER_MODES", "PostResult", "post_article", "post_to_note"]
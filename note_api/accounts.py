@@ -0,0 +1,117 @@
+import fnmatch
+import json
+import os
+from dataclasses import dataclass, field
+
+from .auth import _parse_cookie_header, login_mode
+from .front_matter import read_front_matter
+
+ACCOUNT_FRONT_MATTER_KEY = "note_account"
+DEFAULT_CONCURRENCY = 2
+
+
+class AccountConfigError(Exception):
+    pass
+
+
+@dataclass
+class Account:
+    """accounts 設定の 1 アカウント分"""
+
+    name: str
+    email: str
+    password: str
+    paths: list = field(default_factory=list)
+    rate_limit: float = None
+    concurrency: int = DEFAULT_CONCURRENCY
+    cookie_env: str = None
+    # Only the implicit NOTE_EMAIL account may fall back to NOTE_COOKIE / NOTE_SESSION_V5.
+    env_cookies: bool = False
+
+    def fallback_cookies(self):
+        """そのアカウント専用のセッション Cookie (cookie_env がなければ空)
+
+        None は get_note_cookies で環境変数のセッション情報を使う意味になるため、
+        NOTE_EMAIL から作った既定のアカウントだけが None を返す。
+        """
+        if self.cookie_env:
+            return _parse_cookie_header(os.getenv(self.cookie_env))
+        return None if self.env_cookies else {}
+
+
+def _value(entry, name, key, required=True):
+    """entry[key] か、entry[key + "_env"] が指す環境変数の値"""
+    env_name = entry.get(f"{key}_env")
+    value = os.getenv(env_name) if env_name else entry.get(key)
+    if not value and required:
+        where = f"環境変数 {env_name}" if env_name else f"{key} / {key}_env"
+        raise AccountConfigError(f"アカウント {name} の {key} がありません ({where})")
+    return value
+
+
+def load_accounts(path, default_email=None, default_password=None):
+    """accounts 設定ファイル (JSON) を読み込み、(名前 -> Account, 既定のアカウント名) を返す
+
+    default_email / default_password (NOTE_EMAIL など) があれば "default" という名前の
+    アカウントとして追加し、設定に "default" の指定がなければそれを既定にする。
+    NOTE_LOGIN_MODE=session ではパスワードを使わないため、パスワードは省略できる。
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        raise AccountConfigError(f"accounts 設定を読み込めません: {path} ({exc})") from exc
+    if not isinstance(data, dict) or not isinstance(data.get("accounts") or {}, dict):
+        raise AccountConfigError(f"accounts 設定は accounts を持つ JSON オブジェクトにしてください: {path}")
+
+    needs_password = login_mode() != "session"
+    accounts = {}
+    for name, entry in (data.get("accounts") or {}).items():
+        if not isinstance(entry, dict):
+            raise AccountConfigError(f"アカウント {name} の設定が JSON オブジェクトではありません")
+        paths = entry.get("paths") or []
+        if isinstance(paths, str):
+            paths = [paths]
+        accounts[name] = Account(
+            name=name,
+            email=_value(entry, name, "email"),
+            password=_value(entry, name, "password", required=needs_password),
+            paths=[p.replace(os.sep, "/") for p in paths],
+            rate_limit=entry.get("rate_limit"),
+            concurrency=int(entry.get("concurrency") or DEFAULT_CONCURRENCY),
+            cookie_env=entry.get("cookie_env"),
+        )
+
+    default = data.get("default")
+    if default_email and (default_password or not needs_password) and "default" not in accounts:
+        accounts["default"] = Account("default", default_email, default_password, env_cookies=True)
+        default = default or "default"
+    if default and default not in accounts:
+        raise AccountConfigError(f"既定のアカウント {default} が accounts にありません")
+    if not accounts:
+        raise AccountConfigError(f"accounts 設定にアカウントがありません: {path}")
+    return accounts, default
+
+
+def account_router(accounts, default=None):
+    """記事ファイルのパスからアカウント名を返す関数を作る
+
+    front matter の note_account が最優先で、次に各アカウントの paths (glob、
+    作業ディレクトリからの相対パス) に最初に一致したもの、どれにも一致しなければ default。
+    """
+    rules = [(pattern, account.name) for account in accounts.values() for pattern in account.paths]
+
+    def route(path):
+        try:
+            name = read_front_matter(path).get(ACCOUNT_FRONT_MATTER_KEY)
+        except OSError:
+            name = None
+        if name:
+            return name
+        relative = os.path.relpath(path).replace(os.sep, "/")
+        for pattern, name in rules:
+            if fnmatch.fnmatch(relative, pattern):
+                return name
+        return default
+
+    return route
@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+
+from .cache import cache_path
+from .deadline import request_timeout
+from .http import build_note_api_headers, get_session
+from .writeback import atomic_write_text
+
+# The editor's own list of the logged-in user's notes (drafts included),
+# newest first.
+NOTE_LIST_URL = "https://note.com/api/v2/note_list/contents"
+MAX_PAGES = 200
+# Pages after the first are only re-read this often; in between only
+# pages with new or updated notes are fetched.
+FULL_REFRESH_SECONDS = 7 * 24 * 3600
+
+
+def normalize_title(title):
+    return " ".join(str(title or "").split()).casefold()
+
+
+def _first(entry, *names):
+    for name in names:
+        value = entry.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _parse_page(payload):
+    """一覧 API のレスポンスから (記事のリスト, 最終ページか) を取り出す"""
+    data = payload.get("data") if isinstance(payload, dict) else None
+    if isinstance(data, list):
+        items, last = data, None
+    elif isinstance(data, dict):
+        items = _first(data, "notes", "contents", "items") or []
+        last = _first(data, "isLastPage", "is_last_page", "last_page")
+    else:
+        return [], True
+    notes = []
+    for entry in items:
+        if not isinstance(entry, dict) or not entry.get("id"):
+            continue
+        notes.append(
+            {
+                "id": str(entry["id"]),
+                "key": _first(entry, "key"),
+                "title": _first(entry, "name", "title") or "",
+                "status": _first(entry, "status"),
+                "updated_at": str(
+                    _first(entry, "updatedAt", "updated_at", "publishAt", "publish_at", "createdAt")
+                    or ""
+                ),
+            }
+        )
+    return notes, bool(last) if last is not None else not notes
+
+
+class ArticleIndex:
+    """アカウントの既存記事 (id, key, タイトル, 状態, 更新日時) のローカルキャッシュ
+
+    records は アカウントキー -> {"notes": {id: 記事}, "refreshed_at", "complete"}。
+    note_id のない記事ファイルを、新規作成する前にタイトルまたは記事キーで
+    既存の記事と突き合わせるために使う。一覧 API の読み込みは 1 回の実行で
+    アカウントごとに 1 度だけ行い、前回以降に更新された記事のページだけを読む。
+    この実行で作成した記事と突き合わせ済みの記事 (claimed) は、別のファイルには使わない。
+    記事を作成したファイルは source として記録し、別のファイルとはタイトルで一致させない。
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else cache_path("article_index.json")
+        self.records = {}
+        self.lock = threading.Lock()
+        self._refreshed = set()
+        self._refresh_locks = {}
+        self._claimed = {}
+        self._by_title = {}
+        self._by_key = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self.records = data
+            except (OSError, ValueError) as exc:
+                print(f"記事一覧のキャッシュを読み込めないため作り直します: {exc}")
+        for account in self.records:
+            self._reindex(account)
+
+    def _reindex(self, account):
+        notes = (self.records.get(account) or {}).get("notes") or {}
+        by_title = {}
+        by_key = {}
+        for note in notes.values():
+            by_title.setdefault(normalize_title(note.get("title")), []).append(note)
+            if note.get("key"):
+                by_key[note["key"]] = note
+        self._by_title[account] = by_title
+        self._by_key[account] = by_key
+
+    def _refresh_lock(self, account):
+        with self.lock:
+            return self._refresh_locks.setdefault(account, threading.RLock())
+
+    def refresh(self, account, cookies, full=False):
+        """一覧 API から記事を読み込む (full=False なら既知の記事に行き着いた時点で止める)"""
+        with self._refresh_lock(account):
+            return self._refresh(account, cookies, full)
+
+    def _refresh(self, account, cookies, full):
+        with self.lock:
+            record = self.records.setdefault(
+                account, {"notes": {}, "refreshed_at": 0, "complete": False}
+            )
+            full = (
+                full
+                or not record.get("complete")
+                or time.time() - record.get("refreshed_at", 0) > FULL_REFRESH_SECONDS
+            )
+            known = dict(record["notes"])
+        headers = build_note_api_headers(cookies)
+        fetched = {}
+        complete = False
+        for page in range(1, MAX_PAGES + 1):
+            response = get_session().get(
+                NOTE_LIST_URL,
+                params={"page": page},
+                cookies=cookies,
+                headers=headers,
+                timeout=request_timeout(read=30, phase="note_list"),
+            )
+            if response.status_code != 200:
+                print(f"記事一覧の取得に失敗しました: {response.status_code} (page {page})")
+                break
+            try:
+                notes, last = _parse_page(response.json())
+            except ValueError:
+                print(f"記事一覧のレスポンスを解釈できません (page {page})")
+                break
+            unchanged = 0
+            for note in notes:
+                previous = known.get(note["id"])
+                if previous and previous.get("updated_at") == note["updated_at"]:
+                    unchanged += 1
+                if previous and previous.get("source"):
+                    note["source"] = previous["source"]
+                fetched[note["id"]] = note
+            if last:
+                complete = True
+                break
+            if not full and notes and unchanged == len(notes):
+                # Everything further down is older than what the cache already has.
+                break
+        with self.lock:
+            if full and complete:
+                # Notes missing from a complete listing were deleted.
+                record["notes"] = fetched
+            else:
+                record["notes"].update(fetched)
+            record["complete"] = record.get("complete") or complete
+            if full and complete:
+                record["refreshed_at"] = int(time.time())
+            self._reindex(account)
+            self._refreshed.add(account)
+        return len(fetched)
+
+    def lookup(self, account, cookies, title=None, key=None, source=None):
+        """記事キーかタイトルが一致する既存記事を返し、この実行で使用済みにする (なければ None)
+
+        source は記事ファイルのキー (state_key_for_path)。別のファイルが作成した記事と、
+        この実行で作成・使用済みの記事はタイトルでは一致させない。タイトルが一致する
+        記事が複数ある場合はどれとも一致させない。
+        この実行でまだ一覧を読み込んでいなければ、先に refresh する。
+        """
+        with self._refresh_lock(account):
+            if account not in self._refreshed:
+                self._refresh(account, cookies, False)
+        with self.lock:
+            claimed = self._claimed.setdefault(account, set())
+            match = None
+            if key and key in self._by_key.get(account, {}):
+                match = self._by_key[account][key]
+            elif title:
+                candidates = [
+                    note
+                    for note in self._by_title.get(account, {}).get(normalize_title(title)) or []
+                    if note["id"] not in claimed and note.get("source") in (None, source)
+                ]
+                if len(candidates) > 1:
+                    print(
+                        f"同じタイトルの記事が {len(candidates)} 件あるため、既存記事とは一致させません "
+                        f"(note_key か note_id を指定してください): "
+                        f"{', '.join(note['id'] for note in candidates)}"
+                    )
+                    return None
+                match = candidates[0] if candidates else None
+            if match is None:
+                return None
+            if match["id"] in claimed:
+                print(f"記事 {match['id']} はこの実行で別のファイルに使われているため一致させません")
+                return None
+            claimed.add(match["id"])
+            return dict(match)
+
+    def record(self, account, article_id, key=None, title=None, status=None, source=None):
+        """投稿した記事を一覧に反映し、この実行で使用済みにする (次の lookup で一覧 API を読まずに見つかる)"""
+        with self.lock:
+            record = self.records.setdefault(
+                account, {"notes": {}, "refreshed_at": 0, "complete": False}
+            )
+            note = record["notes"].setdefault(str(article_id), {"id": str(article_id)})
+            note.update(
+                {
+                    name: value
+                    for name, value in (
+                        ("key", key),
+                        ("title", title),
+                        ("status", status),
+                        ("source", source),
+                    )
+                    if value is not None
+                }
+            )
+            note.setdefault("updated_at", "")
+            self._claimed.setdefault(account, set()).add(str(article_id))
+            self._reindex(account)
+
+    def forget(self, account, article_id):
+        with self.lock:
+            notes = (self.records.get(account) or {}).get("notes") or {}
+            if notes.pop(str(article_id), None) is not None:
+                self._reindex(account)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            text = json.dumps(self.records, ensure_ascii=False, indent=2, sort_keys=True)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            atomic_write_text(self.path, text + "\n", fsync="none")
+        except OSError as exc:
+            print(f"記事一覧のキャッシュを保存できませんでした: {exc}")
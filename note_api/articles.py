@@ -1,25 +1,59 @@
-import requests
+import re
 
-from .http import build_note_api_headers
-from .markdown import markdown_body_length, markdown_to_html
+from .deadline import request_timeout
+from .http import build_note_api_headers, get_session, send_json
+from .markdown import extract_image_urls, markdown_body_length, markdown_to_html
+from .metrics import mark_retry
+from .tracing import span
 
+CREATE_URL = "https://note.com/api/v1/text_notes"
+DRAFT_SAVE_URL = "https://note.com/api/v1/text_notes/draft_save"
+# Fields whose remote value can be compared exactly with the local article.
+REMOTE_COMPARABLE_FIELDS = ("title", "hashtags", "publish")
 
-def create_article(cookies, title, markdown_content):
-    """新しい記事を作成"""
-    html_content = markdown_to_html(markdown_content)
 
+def normalize_hashtags(hashtags):
+    """ハッシュタグを `#` 付き・空要素なしに揃える (None はそのまま返す)"""
+    if hashtags is None:
+        return None
+    normalized = []
+    for tag in hashtags:
+        value = str(tag).strip()
+        if not value:
+            continue
+        if not value.startswith("#"):
+            value = f"#{value}"
+        normalized.append(value)
+    return normalized
+
+
+def article_url(article_id):
+    return f"https://note.com/api/v1/text_notes/{article_id}"
+
+
+def build_create_payload(title, markdown_content, empty_body=False, html_content=None):
+    """記事作成 (POST text_notes) のペイロード"""
+    if empty_body:
+        body = ""
+    else:
+        body = html_content if html_content is not None else markdown_to_html(markdown_content)
+    return {"body": body, "name": title}
+
+
+def create_article(cookies, title, markdown_content, empty_body=False):
+    """新しい記事を作成
+
+    empty_body=True なら本文なしで作成する (本文は後続の draft_save / 公開で送る)。
+    本文なしの作成が拒否された場合は本文付きで作成し直す。
+    """
     headers = build_note_api_headers(cookies)
-    data = {
-        "body": html_content,
-        "name": title,
-    }
+    data = build_create_payload(title, markdown_content, empty_body=empty_body)
 
-    response = requests.post(
-        "https://note.com/api/v1/text_notes",
-        cookies=cookies,
-        headers=headers,
-        json=data,
-    )
+    response = send_json("POST", CREATE_URL, cookies, headers, data, label="create")
+    if empty_body and response.status_code not in (200, 201):
+        print(f"本文なしの記事作成が拒否されたため本文付きで再試行します: {response.status_code}")
+        mark_retry("create")
+        return create_article(cookies, title, markdown_content)
 
     if response.status_code in (200, 201):
         result = response.json()
@@ -39,95 +73,248 @@ def create_article(cookies, title, markdown_content):
     return None, None
 
 
+def article_exists(cookies, article_id):
+    """記事が存在すれば True、404 なら False、確認できなければ None を返す"""
+    headers = build_note_api_headers(cookies)
+    with span("http.fetch", method="GET") as current:
+        response = get_session().get(
+            article_url(article_id),
+            cookies=cookies,
+            headers=headers,
+            timeout=request_timeout(phase="fetch"),
+        )
+        current.set(status=response.status_code)
+    if response.status_code == 404:
+        return False
+    if response.status_code in (200, 201):
+        return True
+    return None
+
+
 def update_existing_article(cookies, article_id, title, markdown_content):
-    """既存記事の存在確認のみ行い、本文更新は draft_save 側で実施"""
+    """既存記事を取得して (article_id, article_key, 記事データ) を返す
+
+    本文更新は draft_save 側で実施する。取得できなかった場合の記事データは None。
+    """
     headers = build_note_api_headers(cookies)
-    response = requests.get(
-        f"https://note.com/api/v1/text_notes/{article_id}",
-        cookies=cookies,
-        headers=headers,
-    )
+    with span("http.fetch", method="GET") as current:
+        response = get_session().get(
+            article_url(article_id),
+            cookies=cookies,
+            headers=headers,
+            timeout=request_timeout(phase="fetch"),
+        )
+        current.set(status=response.status_code)
 
     if response.status_code == 404:
         print(f"既存記事の取得失敗: {response.status_code}")
         print(f"レスポンス本文: {response.text[:500]}")
         print("article_id が存在しないため更新を中断します。")
-        return None, None, False
+        return None, None, None
 
     if response.status_code == 405:
         print("既存記事の事前確認は 405 のためスキップします。draft_save で更新します。")
-        return article_id, None, False
+        return article_id, None, None
 
     if response.status_code not in (200, 201):
         print(f"既存記事の確認に失敗: {response.status_code}")
         print(f"レスポンス本文: {response.text[:500]}")
         print("article_id の確認ができないため更新を中断します。")
-        return None, None, False
+        return None, None, None
 
-    print("既存記事の確認成功。draft_save で更新します。")
-    return article_id, None, False
+    try:
+        remote = response.json().get("data")
+    except (ValueError, AttributeError):
+        remote = None
+    if not isinstance(remote, dict):
+        print("既存記事の確認成功。(レスポンスを解釈できないため差分比較なし)")
+        return article_id, None, None
 
+    print("既存記事の確認成功。")
+    return article_id, remote.get("key"), remote
 
-def update_article_draft(
-    cookies,
+
+def _normalize_note_html(html):
+    # Block ids are random per render and note rehosts images, so compare
+    # structure and text without them.
+    html = re.sub(r'\s(?:name|id)="[^"]*"', "", html or "")
+    html = re.sub(r'(<img\b[^>]*?\bsrc=")[^"]*(")', r"\1\2", html)
+    return re.sub(r"\s+", " ", html).strip()
+
+
+def _remote_hashtags(remote):
+    names = []
+    for item in remote.get("hashtags") or []:
+        if isinstance(item, dict):
+            name = (item.get("hashtag") or {}).get("name") or item.get("name")
+        else:
+            name = item
+        if name:
+            names.append(name)
+    return normalize_hashtags(names)
+
+
+def remote_image_keys(remote):
+    """取得済みの既存記事に登録されている本文画像のキー (分からなければ空リスト)"""
+    for name in ("image_keys", "embedded_image_keys"):
+        keys = remote.get(name)
+        if isinstance(keys, list):
+            return [key for key in keys if isinstance(key, str) and key]
+    return []
+
+
+def diff_remote_article(
+    remote,
+    title,
+    markdown_content,
+    hashtags=None,
+    eyecatch_image_url=None,
+    publish=False,
+):
+    """取得済みの既存記事とローカル記事を比べ、差分のある要素名の集合を返す
+
+    本文に画像がある場合、note 側で画像 URL が置き換わっているため
+    本文は常に差分ありとみなす。アイキャッチも note 側の URL からは元画像と
+    同じか判断できないため、指定があれば常に差分ありとみなす
+    (変わっていないことは同期状態のハッシュでだけ判断する)。
+    """
+    changed = set()
+    if (remote.get("name") or "") != (title or ""):
+        changed.add("title")
+    if extract_image_urls(markdown_content) or _normalize_note_html(
+        remote.get("body")
+    ) != _normalize_note_html(markdown_to_html(markdown_content)):
+        changed.add("body")
+    local_hashtags = normalize_hashtags(hashtags)
+    if local_hashtags is not None and set(local_hashtags) != set(_remote_hashtags(remote)):
+        changed.add("hashtags")
+    if eyecatch_image_url:
+        changed.add("eyecatch")
+    if publish and remote.get("status") != "published":
+        changed.add("publish")
+    return changed
+
+
+def build_draft_save_payloads(
     article_id,
     article_key,
     title,
     markdown_content,
     image_key=None,
     embedded_image_keys=None,
+    html_content=None,
+    body_length=None,
 ):
-    """記事を更新して下書き保存"""
+    """draft_save で試すペイロード形式の (形式名, ペイロード) のリスト (既定の順)"""
     embedded_image_keys = list(dict.fromkeys(embedded_image_keys or []))
-    headers = build_note_api_headers(cookies)
-    url = "https://note.com/api/v1/text_notes/draft_save"
-    html_content = markdown_to_html(markdown_content)
-    body_length = markdown_body_length(markdown_content)
+    if html_content is None:
+        html_content = markdown_to_html(markdown_content)
+    if body_length is None:
+        body_length = markdown_body_length(markdown_content)
 
     payload_candidates = [
-        {
-            "name": title,
-            "body": html_content,
-            "body_length": body_length,
-            "index": False,
-            "is_lead_form": False,
-            "raw_body": markdown_content,
-            "image_keys": embedded_image_keys,
-            "embedded_image_keys": embedded_image_keys,
-        },
-        {
-            "name": title,
-            "body": html_content,
-            "body_length": body_length,
-            "index": False,
-            "is_lead_form": False,
-        },
-        {
-            "name": title,
-            "body": markdown_content,
-            "body_length": body_length,
-            "index": False,
-            "is_lead_form": False,
-        },
-        {"id": article_id, "name": title, "body": html_content},
-        {"key": article_key, "name": title, "body": html_content},
+        (
+            "html_raw_body",
+            {
+                "name": title,
+                "body": html_content,
+                "body_length": body_length,
+                "index": False,
+                "is_lead_form": False,
+                "raw_body": markdown_content,
+                "image_keys": embedded_image_keys,
+                "embedded_image_keys": embedded_image_keys,
+            },
+        ),
+        (
+            "html",
+            {
+                "name": title,
+                "body": html_content,
+                "body_length": body_length,
+                "index": False,
+                "is_lead_form": False,
+            },
+        ),
+        (
+            "markdown",
+            {
+                "name": title,
+                "body": markdown_content,
+                "body_length": body_length,
+                "index": False,
+                "is_lead_form": False,
+            },
+        ),
+        ("by_id", {"id": article_id, "name": title, "body": html_content}),
+        ("by_key", {"key": article_key, "name": title, "body": html_content}),
     ]
 
     if image_key:
-        for payload in payload_candidates:
+        for _, payload in payload_candidates:
             payload["eyecatch_image_key"] = image_key
+    return payload_candidates
+
+
+def draft_save_order(names, strategy=None, account=None, minimal=False):
+    """draft_save で形式を試す順番"""
+    order = list(names)
+    if strategy is not None and account:
+        order = strategy.order(account, order)
+    if minimal:
+        order.sort(key=lambda name: name == "html_raw_body")
+    return order
+
+
+def update_article_draft(
+    cookies,
+    article_id,
+    article_key,
+    title,
+    markdown_content,
+    image_key=None,
+    embedded_image_keys=None,
+    strategy=None,
+    account=None,
+    minimal=False,
+):
+    """記事を更新して下書き保存
+
+    strategy (DraftSaveStrategy) と account を渡すと、前回成功したペイロード形式から
+    試し、各形式の成否を記録する。minimal=True なら本文を二重に送る raw_body 付きの
+    形式は最後に回す。
+    """
+    headers = build_note_api_headers(cookies)
+    payload_candidates = build_draft_save_payloads(
+        article_id, article_key, title, markdown_content, image_key, embedded_image_keys
+    )
+    pattern_numbers = {name: idx for idx, (name, _) in enumerate(payload_candidates, 1)}
+    payloads = dict(payload_candidates)
+    order = draft_save_order(payloads, strategy=strategy, account=account, minimal=minimal)
 
     last_response = None
-    for idx, payload in enumerate(payload_candidates, 1):
-        response = requests.post(
-            url,
-            cookies=cookies,
-            headers=headers,
-            params={"id": article_id, "is_temp_saved": "true"},
-            json=payload,
-        )
-        last_response = response
-        if response.status_code in (200, 201):
+    try:
+        for name in order:
+            if last_response is not None:
+                mark_retry("draft_save")
+            with span("draft_save.attempt", pattern=name):
+                response = send_json(
+                    "POST",
+                    DRAFT_SAVE_URL,
+                    cookies,
+                    headers,
+                    payloads[name],
+                    label="draft_save",
+                    params={"id": article_id, "is_temp_saved": "true"},
+                )
+            last_response = response
+            if response.status_code not in (200, 201):
+                if strategy is not None and account:
+                    strategy.record(
+                        account, name, False, status=response.status_code, detail=response.text
+                    )
+                continue
+
             try:
                 resp_json = response.json()
             except Exception:
@@ -142,8 +329,13 @@ def update_article_draft(
                 else:
                     print(f"記事の更新失敗: APIエラー code={code}, message={message}")
                 return False
-            print(f"記事の下書き保存成功！(POST draft_save / pattern {idx})")
+            if strategy is not None and account:
+                strategy.record(account, name, True)
+            print(f"記事の下書き保存成功！(POST draft_save / pattern {pattern_numbers[name]}: {name})")
             return True
+    finally:
+        if strategy is not None:
+            strategy.save()
 
     if last_response is not None:
         print(f"記事の更新失敗: {last_response.status_code}")
@@ -161,21 +353,60 @@ def publish_article(
     hashtags=None,
     article_key=None,
     embedded_image_keys=None,
+    html_content=None,
 ):
-    """記事を公開する"""
+    """記事を公開する
+
+    html_content を渡すと本文を変換せずにそのまま送る (note 上の本文の再利用)。
+    """
     headers = build_note_api_headers(cookies)
-    html_content = markdown_to_html(markdown_content)
-    body_length = markdown_body_length(markdown_content)
-    normalized_hashtags = None
-    if hashtags is not None:
-        normalized_hashtags = []
-        for tag in hashtags:
-            value = str(tag).strip()
-            if not value:
-                continue
-            if not value.startswith("#"):
-                value = f"#{value}"
-            normalized_hashtags.append(value)
+    payload = build_publish_payload(
+        title,
+        markdown_content,
+        hashtags=hashtags,
+        article_key=article_key,
+        embedded_image_keys=embedded_image_keys,
+        html_content=html_content,
+    )
+
+    response = send_json(
+        "PUT", article_url(article_id), cookies, headers, payload, label="publish"
+    )
+    if response.status_code not in (200, 201):
+        print(f"記事の公開失敗: {response.status_code}")
+        print(f"レスポンス本文: {response.text[:500]}")
+        return False
+
+    try:
+        resp_json = response.json()
+    except Exception:
+        resp_json = {}
+    error = resp_json.get("error") if isinstance(resp_json, dict) else None
+    if error:
+        code = error.get("code", "unknown")
+        message = error.get("message", "")
+        print(f"記事の公開失敗: APIエラー code={code}, message={message}")
+        return False
+
+    print("記事の公開成功！")
+    return True
+
+
+def build_publish_payload(
+    title,
+    markdown_content,
+    hashtags=None,
+    article_key=None,
+    embedded_image_keys=None,
+    html_content=None,
+    body_length=None,
+):
+    """記事公開 (PUT text_notes/{id}) のペイロード"""
+    if html_content is None:
+        html_content = markdown_to_html(markdown_content)
+    if body_length is None:
+        body_length = markdown_body_length(markdown_content)
+    normalized_hashtags = normalize_hashtags(hashtags)
 
     payload = {
         "author_ids": [],
@@ -205,28 +436,4 @@ def publish_article(
         payload["hashtags"] = normalized_hashtags
     if article_key:
         payload["slug"] = f"slug-{article_key}"
-
-    response = requests.put(
-        f"https://note.com/api/v1/text_notes/{article_id}",
-        cookies=cookies,
-        headers=headers,
-        json=payload,
-    )
-    if response.status_code not in (200, 201):
-        print(f"記事の公開失敗: {response.status_code}")
-        print(f"レスポンス本文: {response.text[:500]}")
-        return False
-
-    try:
-        resp_json = response.json()
-    except Exception:
-        resp_json = {}
-    error = resp_json.get("error") if isinstance(resp_json, dict) else None
-    if error:
-        code = error.get("code", "unknown")
-        message = error.get("message", "")
-        print(f"記事の公開失敗: APIエラー code={code}, message={message}")
-        return False
-
-    print("記事の公開成功！")
-    return True
+    return payload
@@ -1,11 +1,45 @@
 import os
-import time
 
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+from .cache import account_key, cache_path
+from .deadline import get_deadline, remaining_seconds
+from .tracing import span
+
+LOGIN_MODES = ("browser", "session")
+LOGIN_TIMEOUT = 20
+COOKIE_POLL_INTERVAL = 0.1
+PROFILE_SESSION_TIMEOUT = 5
+
+# Requests the login form does not need, blocked in fast login mode.
+# reCAPTCHA (google.com / gstatic.com) is deliberately left alone.
+FAST_LOGIN_BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*googletagmanager.com*",
+    "*google-analytics.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*googleadservices.com*",
+    "*facebook.net*",
+    "*facebook.com/tr*",
+    "*platform.twitter.com*",
+    "*analytics.twitter.com*",
+    "*ads-twitter.com*",
+    "*clarity.ms*",
+    "*hotjar.com*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+    "*sentry.io*",
+    "*karte.io*",
+]
 
 
 def _parse_cookie_header(cookie_header):
@@ -55,7 +89,35 @@ def _is_truthy_env(name):
     return str(value).strip().lower() in ("1", "true", "yes", "on")
 
 
-def _build_driver():
+def login_mode():
+    """NOTE_LOGIN_MODE (browser / session、既定は browser)"""
+    mode = (os.getenv("NOTE_LOGIN_MODE") or "browser").strip().lower()
+    return mode if mode in LOGIN_MODES else "browser"
+
+
+def fast_login_enabled():
+    """NOTE_FAST_LOGIN が真なら、ブラウザでのログインを軽量な設定で行う"""
+    return _is_truthy_env("NOTE_FAST_LOGIN")
+
+
+def browser_profile_dir(email):
+    """再利用する Chrome のユーザーデータディレクトリ (使わない場合は None)
+
+    NOTE_BROWSER_PROFILE_DIR があればその下、なければ fast login 時のみキャッシュディレクトリの下に
+    アカウントごとに作る。ログイン済みのセッションが残っていれば、次回はフォーム入力を省ける。
+    """
+    base = os.getenv("NOTE_BROWSER_PROFILE_DIR")
+    if not base:
+        if not fast_login_enabled():
+            return None
+        base = cache_path("chrome-profile")
+    return os.path.join(base, account_key(email))
+
+
+def _build_driver(profile_dir=None):
+    from selenium import webdriver
+
+    fast = fast_login_enabled()
     options = webdriver.ChromeOptions()
     if not _is_truthy_env("NOTE_SHOW_BROWSER"):
         options.add_argument("--headless=new")
@@ -70,6 +132,20 @@ def _build_driver():
     )
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+    if fast:
+        # Hand control back once the DOM is ready instead of waiting for every subresource.
+        options.page_load_strategy = "eager"
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--no-first-run")
+        options.add_argument("--no-default-browser-check")
 
     chrome_binary = os.getenv("CHROME_BINARY")
     if chrome_binary:
@@ -78,21 +154,92 @@ def _build_driver():
     chromedriver_path = os.getenv("CHROMEDRIVER_PATH")
     if chromedriver_path:
         service = webdriver.ChromeService(executable_path=chromedriver_path)
-        return webdriver.Chrome(service=service, options=options)
+        driver = webdriver.Chrome(service=service, options=options)
+    else:
+        driver = webdriver.Chrome(options=options)
+    if fast:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": FAST_LOGIN_BLOCKED_URLS})
+        except Exception as exc:
+            # Blocking is only an optimization; log in normally without it.
+            print(f"不要なリソースのブロックを設定できませんでした: {exc}")
+    return driver
+
+
+def _auth_cookies(driver):
+    """driver の Cookie に _note_session_v5 があれば Cookie の辞書を、なければ None を返す"""
+    cookie_map = {cookie["name"]: cookie["value"] for cookie in driver.get_cookies()}
+    return cookie_map if _has_auth_cookie(cookie_map) else None
+
+
+def get_note_cookies(email, password, fallback_cookies=None):
+    """noteにログインしてCookieを取得
+
+    ログインに失敗した場合は fallback_cookies (省略時は環境変数のセッション情報) を使う。
+    NOTE_LOGIN_MODE=session ならブラウザを起動せず、セッション情報だけを使う。
+    """
+    if fallback_cookies is None:
+        fallback_cookies = _get_cookie_fallback_from_env()
+    if login_mode() == "session":
+        if _has_auth_cookie(fallback_cookies):
+            print("NOTE_LOGIN_MODE=session のため、ブラウザを起動せずセッション情報を使います。")
+            return fallback_cookies
+        print("NOTE_LOGIN_MODE=session ですが、セッション情報 (_note_session_v5) が見つかりません。")
+        return {}
+
+    cookie_map = _browser_login(email, password)
+    if cookie_map:
+        return cookie_map
 
-    return webdriver.Chrome(options=options)
+    if _has_auth_cookie(fallback_cookies):
+        print("ID/パスワードログインに失敗。環境変数のセッション情報で継続します。")
+        return fallback_cookies
 
+    print("セッション情報のフォールバックも見つからないためログイン失敗です。")
+    return {}
+
+
+def _browser_login(email, password):
+    """Selenium でログインし、認証 Cookie を返す (失敗した場合は None)"""
+    # selenium takes a noticeable time to import and is not installed in the
+    # slim image, so it is only imported once a browser login is needed.
+    try:
+        from selenium.common.exceptions import NoSuchElementException, TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+    except ImportError:
+        print("selenium がインストールされていないため、ブラウザでのログインをスキップします。")
+        return None
 
-def get_note_cookies(email, password):
-    """noteにログインしてCookieを取得"""
     if _is_truthy_env("NOTE_SHOW_BROWSER"):
         print("NOTE_SHOW_BROWSER=1 のためヘッドレスを無効化して起動します。")
-    driver = _build_driver()
-    login_error = None
+    profile_dir = browser_profile_dir(email)
+    with span("login.driver_start", fast=fast_login_enabled(), profile=bool(profile_dir)):
+        driver = _build_driver(profile_dir)
 
+    # Each wait is capped by what is left of the run's deadline, if any.
+    timeout = max(1.0, min(LOGIN_TIMEOUT, remaining_seconds(LOGIN_TIMEOUT)))
     try:
-        driver.get("https://note.com/login")
-        wait = WebDriverWait(driver, 20)
+        if fast_login_enabled() or get_deadline() is not None:
+            # Without either, the page load is unbounded as it always was: a slow
+            # CI runner would otherwise fail a login that eventually succeeds.
+            driver.set_page_load_timeout(timeout)
+        with span("login.page_load"):
+            driver.get("https://note.com/login")
+        cookie_map = _auth_cookies(driver) if profile_dir else None
+        if cookie_map:
+            # note sends a still-valid session away from the login form.
+            try:
+                WebDriverWait(driver, PROFILE_SESSION_TIMEOUT).until(
+                    lambda d: "note.com/login" not in d.current_url
+                )
+                print("保存済みのブラウザプロファイルのセッションでログインしました。")
+                return cookie_map
+            except TimeoutException:
+                print("保存済みのセッションが無効なため、フォームからログインします。")
+        wait = WebDriverWait(driver, timeout)
 
         def find_first(selectors):
             for by, value in selectors:
@@ -162,20 +309,21 @@ def get_note_cookies(email, password):
         )
         if not login_button:
             raise TimeoutException("ログインボタンを検出できませんでした。")
-        wait.until(EC.element_to_be_clickable(login_button)).click()
-
-        wait.until(lambda d: "note.com/login" not in d.current_url)
-        time.sleep(2)
-
-        cookies = driver.get_cookies()
-        cookie_map = {cookie["name"]: cookie["value"] for cookie in cookies}
-        if _has_auth_cookie(cookie_map):
-            return cookie_map
-        login_error = "ログイン後Cookieに _note_session_v5 が含まれていません。"
+        with span("login.submit"):
+            wait.until(EC.element_to_be_clickable(login_button)).click()
+            wait.until(lambda d: "note.com/login" not in d.current_url)
+        with span("login.session_cookie"):
+            try:
+                # The session cookie is set shortly after the redirect; poll for it
+                # instead of sleeping a fixed time.
+                return WebDriverWait(driver, timeout, poll_frequency=COOKIE_POLL_INTERVAL).until(
+                    _auth_cookies
+                )
+            except TimeoutException:
+                print("ログイン後Cookieに _note_session_v5 が含まれていません。")
 
     except (TimeoutException, NoSuchElementException) as exc:
-        login_error = f"ログイン処理で要素取得に失敗しました: {exc}"
-        print(login_error)
+        print(f"ログイン処理で要素取得に失敗しました: {exc}")
         print(f"current_url={driver.current_url}")
         print(f"title={driver.title}")
         try:
@@ -185,12 +333,7 @@ def get_note_cookies(email, password):
         except Exception:
             pass
     finally:
-        driver.quit()
+        with span("login.driver_quit"):
+            driver.quit()
 
-    fallback_cookies = _get_cookie_fallback_from_env()
-    if _has_auth_cookie(fallback_cookies):
-        print("ID/パスワードログインに失敗。環境変数のセッション情報で継続します。")
-        return fallback_cookies
-
-    print("セッション情報のフォールバックも見つからないためログイン失敗です。")
-    return {}
+    return None
@@ -0,0 +1,233 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .articles import normalize_hashtags
+from .front_matter import parse_front_matter, split_front_matter_and_body
+from .state import state_key_for_path
+
+DEFAULT_POST_WORKERS = 2
+
+
+def prepare_article(source, publish=False, article_id=None):
+    """記事ファイルの内容から post_to_note に渡す値を組み立てる
+
+    publish / article_id は CLI・Action 入力による上書き (front matter より優先)。
+    """
+    front_matter_text, body = split_front_matter_and_body(source)
+    front_matter = parse_front_matter(front_matter_text)
+    hashtags = None
+    if front_matter.note_hashtags is not None:
+        hashtags = list(dict.fromkeys(normalize_hashtags(front_matter.note_hashtags)))
+    return {
+        "disabled": front_matter.note_disabled,
+        "title": front_matter.title,
+        "content": body,
+        "eyecatch_image_url": front_matter.image,
+        "article_id": article_id or front_matter.note_id,
+        "note_key": front_matter.note_key,
+        "publish": bool(publish or front_matter.note_published),
+        "hashtags": hashtags,
+    }
+
+
+def post_file(client, path, publish, state, write_back, transfer_mode, article_id):
+    """1 ファイルを client で投稿し、サマリー表の 1 行 {path, status, note_id, detail, seconds} を返す
+
+    article_id は front matter に note_id がない場合に使う記事 ID (リネーム前のファイルのもの)。
+    """
+    started = time.perf_counter()
+
+    def row(status, note_id=None, detail=""):
+        return {
+            "path": path,
+            "status": status,
+            "note_id": note_id,
+            "detail": detail,
+            "seconds": time.perf_counter() - started,
+        }
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        article = prepare_article(source, publish=publish)
+        inherited = bool(article_id) and not article["article_id"]
+        article["article_id"] = article["article_id"] or article_id
+        if article["disabled"]:
+            return row("skipped", detail="note_disabled")
+        if not article["title"]:
+            # README.md and other notes without front matter are not articles.
+            return row("skipped", detail="title がありません")
+        if not article["content"]:
+            return row("failed", detail="本文がありません")
+
+        print(f"--- {path}")
+        result = client.post(
+            article["title"],
+            article["content"],
+            eyecatch_image_url=article["eyecatch_image_url"],
+            article_id=article["article_id"],
+            note_key=article["note_key"],
+            publish=article["publish"],
+            hashtags=article["hashtags"],
+            state=state,
+            state_key=state_key_for_path(path) if state is not None else None,
+            transfer_mode=transfer_mode,
+            content_file=path,
+        )
+    except Exception as exc:
+        print(f"投稿処理で例外が発生しました: {path} ({exc})")
+        return row("failed", detail=str(exc)[:80])
+
+    if not result.success:
+        return row("failed", detail="投稿失敗")
+    if (result.created_new or result.matched or inherited) and write_back is not None:
+        write_back.queue(path, result.article_id)
+    if result.skipped:
+        return row("skipped", result.article_id, "変更なし")
+    if result.created_new:
+        detail = "新規作成"
+    elif result.matched:
+        detail = "既存記事に一致"
+    else:
+        detail = "更新"
+    return row("posted", result.article_id, detail)
+
+
+def post_files(
+    client,
+    paths,
+    publish=False,
+    state=None,
+    write_back=None,
+    transfer_mode="full",
+    workers=DEFAULT_POST_WORKERS,
+    article_ids=None,
+):
+    """複数の記事ファイルを 1 つの NoteClient で投稿し、ファイルごとの結果を返す
+
+    paths は遅延評価され、同時に処理中のファイルは workers 件までに抑える。
+    新規作成した記事の note_id は write_back (NoteIdWriteBack) に溜めるだけで、
+    書き戻しは呼び出し側が最後に flush する。
+    article_ids (path -> note_id) は front matter に note_id がないファイルの既定値。
+    """
+    return post_routed_files(
+        {None: client},
+        lambda path: None,
+        paths,
+        publish=publish,
+        state=state,
+        write_back=write_back,
+        transfer_mode=transfer_mode,
+        workers={None: workers},
+        article_ids=article_ids,
+    )
+
+
+def post_routed_files(
+    clients,
+    route,
+    paths,
+    publish=False,
+    state=None,
+    write_back=None,
+    transfer_mode="full",
+    workers=None,
+    article_ids=None,
+):
+    """記事ファイルを route(path) が返すアカウントの NoteClient で並行して投稿する
+
+    clients は アカウント名 -> NoteClient、workers は アカウント名 -> 同時投稿数。
+    アカウントごとに別のスレッドプールで処理するので、あるアカウントの上限や
+    待ち時間がほかのアカウントの投稿を止めることはない。
+    paths の先読みは全アカウントの同時投稿数の合計の 2 倍までに抑える。
+    """
+    workers = {
+        name: max(1, int((workers or {}).get(name) or DEFAULT_POST_WORKERS)) for name in clients
+    }
+    article_ids = article_ids or {}
+    backlog = {name: deque() for name in clients}
+    running = {name: 0 for name in clients}
+    read_ahead = sum(workers.values()) * 2
+    executors = {name: ThreadPoolExecutor(max_workers=workers[name]) for name in clients}
+    iterator = iter(paths)
+    exhausted = False
+    pending = {}
+    rows = []
+    try:
+        while True:
+            while not exhausted and sum(len(queue) for queue in backlog.values()) < read_ahead:
+                path = next(iterator, None)
+                if path is None:
+                    exhausted = True
+                    break
+                name = route(path)
+                if name not in clients:
+                    rows.append(
+                        {
+                            "path": path,
+                            "status": "failed",
+                            "note_id": None,
+                            "detail": f"アカウント {name} が設定されていません",
+                            "seconds": 0.0,
+                            "account": name,
+                        }
+                    )
+                    continue
+                backlog[name].append(path)
+
+            for name, queue in backlog.items():
+                while queue and running[name] < workers[name]:
+                    path = queue.popleft()
+                    future = executors[name].submit(
+                        post_file,
+                        clients[name],
+                        path,
+                        publish,
+                        state,
+                        write_back,
+                        transfer_mode,
+                        article_ids.get(path),
+                    )
+                    pending[future] = name
+                    running[name] += 1
+
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                running[name] -= 1
+                row = future.result()
+                if name is not None:
+                    row["account"] = name
+                rows.append(row)
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+    return rows
+
+
+def format_summary(rows, elapsed):
+    """投稿結果の一覧と件数のサマリー表を作る"""
+    lines = []
+    if rows:
+        path_width = min(60, max(len("path"), *(len(r["path"]) for r in rows)))
+        accounts = any(r.get("account") for r in rows)
+        header = f"{'path':<{path_width}}  {'status':<8}  {'note_id':<14}  {'sec':>6}  detail"
+        lines.append(f"{'account':<12}  {header}" if accounts else header)
+        for r in sorted(rows, key=lambda item: (str(item.get("account")), item["path"])):
+            line = (
+                f"{r['path'][-path_width:]:<{path_width}}  {r['status']:<8}  "
+                f"{(r['note_id'] or '-'):<14}  {r['seconds']:>6.1f}  {r['detail']}"
+            )
+            lines.append(f"{str(r.get('account') or '-'):<12}  {line}" if accounts else line)
+        lines.append("")
+    counts = {status: 0 for status in ("posted", "skipped", "failed")}
+    for r in rows:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    lines.append(
+        f"posted: {counts['posted']}  skipped: {counts['skipped']}  "
+        f"failed: {counts['failed']}  total: {len(rows)}  duration: {elapsed:.1f}s"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,21 @@
+import hashlib
+import os
+
+
+def cache_dir():
+    """キャッシュの保存先ディレクトリ (NOTE_CACHE_DIR、なければ ~/.cache/github-to-note)"""
+    path = os.getenv("NOTE_CACHE_DIR")
+    if not path:
+        base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(base, "github-to-note")
+    return path
+
+
+def cache_path(name):
+    return os.path.join(cache_dir(), name)
+
+
+def account_key(email):
+    """アカウントごとのキャッシュキー (メールアドレスそのものは保存しない)"""
+    normalized = str(email or "").strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,60 @@
+import threading
+
+from .auth import get_note_cookies
+from .http import create_session, use_session
+from .publisher import post_article
+from .strategy import DraftSaveStrategy
+
+
+class NoteClient:
+    """1 回のログインと 1 つの HTTP セッションを複数記事の投稿で使い回す
+
+    ログインは最初に必要になった時点で 1 度だけ行う (失敗した場合も再試行しない)。
+    journal (Journal) を渡すと、すべての投稿の工程をそのジャーナルに記録する。
+    rate_limit (回/秒) と pool_size はこのクライアントの HTTP セッションだけに効くので、
+    アカウントごとにクライアントを作ればアカウントごとに独立して制限される。
+    article_index (ArticleIndex) を渡すと、note_id のない記事を既存記事と突き合わせる。
+    """
+
+    def __init__(
+        self,
+        email,
+        password,
+        journal=None,
+        rate_limit=None,
+        pool_size=None,
+        draft_strategy=None,
+        fallback_cookies=None,
+        article_index=None,
+    ):
+        self.email = email
+        self.password = password
+        self.journal = journal
+        self.session = create_session(rate_limit=rate_limit, pool_size=pool_size)
+        self.draft_strategy = draft_strategy if draft_strategy is not None else DraftSaveStrategy()
+        self.fallback_cookies = fallback_cookies
+        self.article_index = article_index
+        self._cookies = None
+        self._login_lock = threading.Lock()
+
+    def get_cookies(self):
+        with self._login_lock:
+            if self._cookies is None:
+                self._cookies = (
+                    get_note_cookies(self.email, self.password, self.fallback_cookies) or {}
+                )
+            return self._cookies
+
+    def post(self, title, markdown_content, **kwargs):
+        """post_article をこのクライアントのログイン・セッションで実行する"""
+        kwargs.setdefault("journal", self.journal)
+        kwargs.setdefault("article_index", self.article_index)
+        with use_session(self.session):
+            return post_article(
+                self.email,
+                self.password,
+                title,
+                markdown_content,
+                client=self,
+                **kwargs,
+            )
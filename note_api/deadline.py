@@ -0,0 +1,144 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from .tracing import span
+
+# Used when no deadline is set or when it leaves more time than these.
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 60.0
+# Below this, a request is not started at all: it could not finish anyway.
+MIN_REQUEST_SECONDS = 0.5
+
+_deadline = None
+
+
+class DeadlineExceeded(Exception):
+    """実行全体の期限 (Deadline) を過ぎたため、次の工程やリクエストを始めなかった"""
+
+    def __init__(self, phase, budget):
+        super().__init__(f"実行時間の上限 {budget:g} 秒を超えたため中断しました (工程: {phase})")
+        self.phase = phase
+
+
+class Deadline:
+    """実行全体の制限時間と、工程ごとの所要時間・超過時間の記録
+
+    phases は 工程名 -> {"count", "seconds", "overrun_seconds"}。overrun_seconds は
+    その工程のうち期限を過ぎてから費やした時間で、どの工程が予算を食いつぶしたかを示す。
+    """
+
+    def __init__(self, seconds):
+        self.budget = float(seconds)
+        self.started = time.monotonic()
+        self.expires = self.started + self.budget
+        self.phases = {}
+        self.exceeded_in = None
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def check(self, phase):
+        """期限を過ぎていれば DeadlineExceeded を送出する"""
+        if self.remaining() <= 0:
+            self._exceeded(phase)
+
+    def _exceeded(self, phase):
+        with self.lock:
+            if self.exceeded_in is None:
+                self.exceeded_in = phase
+        raise DeadlineExceeded(phase, self.budget)
+
+    def timeout(self, read=READ_TIMEOUT, connect=CONNECT_TIMEOUT, phase="request"):
+        """残り時間に収まる requests の (接続, 読み込み) タイムアウト"""
+        remaining = self.remaining()
+        if remaining < MIN_REQUEST_SECONDS:
+            self._exceeded(phase)
+        return (min(connect, remaining), min(read, remaining))
+
+    def record(self, phase, started, ended):
+        """monotonic 時刻 started から ended まで phase を実行したことを記録する"""
+        with self.lock:
+            stats = self.phases.setdefault(
+                phase, {"count": 0, "seconds": 0.0, "overrun_seconds": 0.0}
+            )
+            stats["count"] += 1
+            stats["seconds"] += ended - started
+            stats["overrun_seconds"] += max(0.0, ended - max(started, self.expires))
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            return {
+                "budget_seconds": self.budget,
+                "elapsed_seconds": round(elapsed, 3),
+                "exceeded": elapsed > self.budget,
+                "exceeded_in": self.exceeded_in,
+                "phases": {
+                    name: {
+                        "count": stats["count"],
+                        "seconds": round(stats["seconds"], 3),
+                        "overrun_seconds": round(stats["overrun_seconds"], 3),
+                    }
+                    for name, stats in sorted(self.phases.items())
+                },
+            }
+
+    def format_report(self):
+        report = self.report()
+        line = f"実行時間: {report['elapsed_seconds']:.1f}s / 上限 {self.budget:g}s"
+        if not report["exceeded"]:
+            return line
+        overruns = [
+            f"{name} {stats['overrun_seconds']:.1f}s"
+            for name, stats in sorted(
+                report["phases"].items(), key=lambda item: -item[1]["overrun_seconds"]
+            )
+            if stats["overrun_seconds"] > 0
+        ]
+        line += " (超過"
+        if report["exceeded_in"]:
+            line += f"、{report['exceeded_in']} で中断"
+        if overruns:
+            line += f"、工程別の超過: {', '.join(overruns)}"
+        return line + ")"
+
+
+def set_deadline(deadline):
+    """プロセス全体で使う期限を設定する (None で無効化)"""
+    global _deadline
+    _deadline = deadline
+
+
+def get_deadline():
+    return _deadline
+
+
+def request_timeout(read=READ_TIMEOUT, connect=CONNECT_TIMEOUT, phase="request"):
+    """requests に渡すタイムアウト (期限が設定されていれば残り時間で頭打ちにする)"""
+    deadline = _deadline
+    if deadline is None:
+        return (connect, read)
+    return deadline.timeout(read, connect, phase)
+
+
+def remaining_seconds(default=None):
+    """期限までの残り秒数 (期限がなければ default)"""
+    deadline = _deadline
+    return default if deadline is None else deadline.remaining()
+
+
+@contextmanager
+def phase(name, **attributes):
+    """span(name) として記録し、期限があれば開始前に確認して所要時間を工程別に集計する"""
+    deadline = _deadline
+    if deadline is not None:
+        deadline.check(name)
+    started = time.monotonic()
+    try:
+        with span(name, **attributes) as current:
+            yield current
+    finally:
+        if deadline is not None:
+            deadline.record(name, started, time.monotonic())
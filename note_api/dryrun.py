@@ -0,0 +1,160 @@
+import json
+import time
+
+from .articles import (
+    CREATE_URL,
+    DRAFT_SAVE_URL,
+    article_url,
+    build_create_payload,
+    build_draft_save_payloads,
+    build_publish_payload,
+    draft_save_order,
+)
+from .batch import prepare_article
+from .markdown import extract_image_urls, markdown_body_length, markdown_to_html
+
+# Placeholder for ids that only exist after note answers the create request.
+PENDING_ID = "<created article id>"
+PENDING_KEY = "<created article key>"
+
+
+class _StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    def run(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.timings[stage] = round((time.perf_counter() - start) * 1e6, 1)
+        return result
+
+
+def _request(label, method, url, payload=None, params=None):
+    request = {"label": label, "method": method, "url": url}
+    if params:
+        request["params"] = params
+    if payload is not None:
+        request["payload"] = payload
+        request["bytes"] = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    return request
+
+
+def plan_post(
+    title,
+    markdown_content,
+    eyecatch_image_url=None,
+    article_id=None,
+    publish=False,
+    hashtags=None,
+    transfer_mode="full",
+    timer=None,
+):
+    """post_to_note が送るリクエストを、通信せずに組み立てて返す
+
+    画像はアップロードしないため、本文の画像 URL は元のまま、画像キーは空になる。
+    新規作成時の記事 ID/KEY はプレースホルダー。draft_save は最初に試す形式を載せる。
+    戻り値は {"requests": [...], "timings_us": {段階: マイクロ秒}}。
+    """
+    timer = timer or _StageTimer()
+    minimal = transfer_mode == "minimal"
+    planned = []
+
+    image_urls = timer.run("images", extract_image_urls, markdown_content)
+    html_content = timer.run("render", markdown_to_html, markdown_content)
+    body_length = timer.run("body_length", markdown_body_length, markdown_content)
+
+    def build():
+        article_key = None
+        if article_id:
+            planned.append(_request("fetch", "GET", article_url(article_id)))
+        for url in image_urls:
+            planned.append(_request("image_upload", "GET+POST", url))
+        if article_id:
+            target_id = article_id
+        else:
+            create = build_create_payload(
+                title, markdown_content, empty_body=minimal, html_content=html_content
+            )
+            planned.append(_request("create", "POST", CREATE_URL, create))
+            target_id, article_key = PENDING_ID, PENDING_KEY
+
+        if not (minimal and publish):
+            candidates = build_draft_save_payloads(
+                target_id,
+                article_key,
+                title,
+                markdown_content,
+                html_content=html_content,
+                body_length=body_length,
+            )
+            payloads = dict(candidates)
+            order = draft_save_order(payloads, minimal=minimal)
+            request = _request(
+                "draft_save",
+                "POST",
+                DRAFT_SAVE_URL,
+                payloads[order[0]],
+                params={"id": target_id, "is_temp_saved": "true"},
+            )
+            request["pattern"] = order[0]
+            request["fallback_patterns"] = order[1:]
+            planned.append(request)
+
+        if publish:
+            payload = build_publish_payload(
+                title,
+                markdown_content,
+                hashtags=hashtags,
+                article_key=article_key,
+                html_content=html_content,
+                body_length=body_length,
+            )
+            planned.append(_request("publish", "PUT", article_url(target_id), payload))
+        if eyecatch_image_url:
+            planned.append(_request("eyecatch", "GET+POST", eyecatch_image_url))
+
+    timer.run("payloads", build)
+    return {"requests": planned, "timings_us": timer.timings}
+
+
+def dry_run_file(path, publish=False, transfer_mode="full"):
+    """1 ファイルを読み込み、送るはずのリクエストと段階ごとの処理時間を返す
+
+    失敗した場合は {"path", "error"} を返す (プロセスプールから呼ぶため例外を外に出さない)。
+    """
+    timer = _StageTimer()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        article = timer.run("front_matter", prepare_article, source, publish=publish)
+        record = {
+            "path": path,
+            "title": article["title"],
+            "disabled": article["disabled"],
+            "article_id": article["article_id"],
+            "publish": article["publish"],
+        }
+        problems = []
+        if not article["title"]:
+            problems.append("title がありません")
+        if not article["content"]:
+            problems.append("本文がありません")
+        if article["disabled"] or problems:
+            record["problems"] = problems
+            record["timings_us"] = timer.timings
+            return record
+        record.update(
+            plan_post(
+                article["title"],
+                article["content"],
+                eyecatch_image_url=article["eyecatch_image_url"],
+                article_id=article["article_id"],
+                publish=article["publish"],
+                hashtags=article["hashtags"],
+                transfer_mode=transfer_mode,
+                timer=timer,
+            )
+        )
+        return record
+    except Exception as exc:
+        return {"path": path, "error": str(exc)}
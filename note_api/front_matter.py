@@ -0,0 +1,171 @@
+import re
+from dataclasses import dataclass, field
+
+_KEY_LINE = re.compile(r"^\s*([A-Za-z0-9_-]+)\s*:(.*)$")
+_LIST_ITEM = re.compile(r"^\s*-\s*(.+?)\s*$")
+_FLOW_ITEM = re.compile(r"""(?:'[^']*'|"[^"]*"|[^,]+)""")
+
+
+def _is_truthy(value):
+    if value is None:
+        return False
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _strip_quotes(text):
+    value = (text or "").strip()
+    if (value.startswith('"') and value.endswith('"')) or (
+        value.startswith("'") and value.endswith("'")
+    ):
+        return value[1:-1].strip()
+    return value
+
+
+def split_front_matter_and_body(content):
+    """先頭の YAML front matter と本文を分割する"""
+    if not content:
+        return "", content
+    text = content.replace("\r\n", "\n")
+    if not text.startswith("---\n"):
+        return "", content
+
+    end = text.find("\n---\n", 4)
+    if end == -1:
+        return "", content
+
+    front_matter = text[4:end]
+    body = text[end + 5 :]
+    return front_matter, body
+
+
+@dataclass
+class FrontMatter:
+    """YAML front matter を 1 回の走査で解析した結果
+
+    values にはキーごとの値 (文字列、リスト、または値なしの None) が入る。
+    同じキーが複数回出てきた場合は最初のものを採用する。
+    """
+
+    values: dict = field(default_factory=dict)
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def get(self, key, default=None):
+        value = self.values.get(key)
+        if value is None or isinstance(value, list):
+            return default
+        return value or default
+
+    def get_bool(self, key):
+        return _is_truthy(self.get(key))
+
+    def get_list(self, key):
+        value = self.values.get(key)
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return list(value)
+        return [value] if value else []
+
+    @property
+    def title(self):
+        return self.get("title")
+
+    @property
+    def image(self):
+        return self.get("image")
+
+    @property
+    def note_id(self):
+        return self.get("note_id")
+
+    @property
+    def note_key(self):
+        """記事の URL の末尾 (n から始まる記事キー)"""
+        return self.get("note_key")
+
+    @property
+    def note_published(self):
+        return self.get_bool("note_published")
+
+    @property
+    def note_disabled(self):
+        return self.get_bool("note_disabled")
+
+    @property
+    def note_hashtags(self):
+        """note_hashtags キーがなければ None、あれば文字列のリスト"""
+        if "note_hashtags" not in self.values:
+            return None
+        return self.get_list("note_hashtags")
+
+
+def _parse_flow_list(text):
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end == -1 or end <= start:
+        return []
+    inner = text[start + 1 : end].strip()
+    if not inner:
+        return []
+    return [_strip_quotes(p) for p in _FLOW_ITEM.findall(inner) if _strip_quotes(p)]
+
+
+def parse_front_matter(front_matter):
+    """front matter 文字列を先頭から 1 回だけ走査して FrontMatter を返す"""
+    values = {}
+    lines = (front_matter or "").splitlines()
+    idx = 0
+    while idx < len(lines):
+        m = _KEY_LINE.match(lines[idx])
+        idx += 1
+        if not m:
+            continue
+        key, rest = m.group(1), m.group(2).strip()
+
+        if rest.startswith("["):
+            flow_text = rest
+            while "]" not in flow_text and idx < len(lines):
+                flow_text += " " + lines[idx].strip()
+                idx += 1
+            value = _parse_flow_list(flow_text)
+        elif rest:
+            value = _strip_quotes(rest)
+        else:
+            items = []
+            while idx < len(lines):
+                sub = lines[idx]
+                if not sub.strip():
+                    idx += 1
+                    continue
+                if _KEY_LINE.match(sub):
+                    break
+                item_match = _LIST_ITEM.match(sub)
+                if not item_match:
+                    break
+                item = _strip_quotes(item_match.group(1))
+                if item:
+                    items.append(item)
+                idx += 1
+            value = items if items else None
+
+        values.setdefault(key, value)
+    return FrontMatter(values)
+
+
+def read_front_matter(path):
+    """ファイル先頭の front matter だけを読み込んで FrontMatter を返す
+
+    本文は読まないため、大量のファイルを走査するバッチ処理で使う。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+        if first.rstrip("\r\n") != "---":
+            return FrontMatter()
+        lines = []
+        for line in f:
+            if line.rstrip("\r\n") == "---":
+                return parse_front_matter("".join(lines))
+            lines.append(line)
+    return FrontMatter()
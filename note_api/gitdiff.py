@@ -0,0 +1,80 @@
+import subprocess
+from collections import namedtuple
+
+from .front_matter import parse_front_matter, split_front_matter_and_body
+from .render import MARKDOWN_EXTENSIONS
+
+# `git hash-object -t tree /dev/null`; diffing against it lists every file.
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+ChangedFile = namedtuple("ChangedFile", "status path old_path")
+
+
+class GitDiffError(Exception):
+    pass
+
+
+def _git(args, cwd=None):
+    # Actions mount the workspace with a different owner than the container user.
+    command = ["git", "-c", "safe.directory=*"] + list(args)
+    try:
+        completed = subprocess.run(
+            command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
+        )
+    except OSError as exc:
+        raise GitDiffError(f"git を実行できません: {exc}") from exc
+    if completed.returncode != 0:
+        message = completed.stderr.decode("utf-8", "replace").strip()
+        raise GitDiffError(f"git {' '.join(args[:2])} に失敗しました: {message}")
+    return completed.stdout
+
+
+def _is_null_commit(rev):
+    return not rev or set(rev) == {"0"}
+
+
+def _pathspecs(content_dir=None, globs=None):
+    specs = []
+    if content_dir:
+        specs.append(content_dir)
+    for pattern in globs or []:
+        specs.append(f":(glob){pattern}")
+    return specs
+
+
+def changed_markdown_files(base, head="HEAD", content_dir=None, globs=None, cwd=None):
+    """base..head で追加・変更・リネームされた Markdown ファイルを返す
+
+    base が空または 0000... (新規ブランチの push) のときは head の全ファイルを対象にする。
+    削除されたファイルは含めない。パスはリポジトリルートからの相対パス。
+    """
+    base = EMPTY_TREE if _is_null_commit(base) else base
+    args = ["diff", "--name-status", "-z", "-M", "--diff-filter=AMR", base, head or "HEAD"]
+    specs = _pathspecs(content_dir, globs)
+    if specs:
+        args += ["--"] + specs
+
+    fields = _git(args, cwd=cwd).decode("utf-8").split("\0")
+    changed = []
+    index = 0
+    while index < len(fields) and fields[index]:
+        status = fields[index][0]
+        if status == "R":
+            old_path, path = fields[index + 1], fields[index + 2]
+            index += 3
+        else:
+            old_path, path = None, fields[index + 1]
+            index += 2
+        if path.lower().endswith(MARKDOWN_EXTENSIONS):
+            changed.append(ChangedFile(status, path, old_path))
+    return changed
+
+
+def note_id_at_revision(rev, path, cwd=None):
+    """rev 時点の path の front matter にある note_id を返す (なければ None)"""
+    try:
+        source = _git(["show", f"{rev}:{path}"], cwd=cwd).decode("utf-8")
+    except (GitDiffError, UnicodeDecodeError):
+        return None
+    front_matter_text, _ = split_front_matter_and_body(source)
+    return parse_front_matter(front_matter_text).note_id
@@ -0,0 +1,128 @@
+import os
+import queue
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+from . import metrics
+from .deadline import request_timeout
+from .http import get_session
+
+# Until a host has this many samples, the hedge fires after DEFAULT_DELAY.
+MIN_SAMPLES = 10
+HISTORY_SIZE = 200
+DEFAULT_DELAY = 1.0
+MIN_DELAY = 0.1
+MAX_DELAY = 10.0
+# At most this share of downloads (plus BURST) may send a second request.
+MAX_HEDGE_RATIO = 0.1
+BURST = 2
+
+_lock = threading.Lock()
+_latencies = {}
+_counts = {"requests": 0, "hedged": 0}
+
+
+def hedging_enabled():
+    """NOTE_HEDGE_DOWNLOADS が真なら、遅い画像ダウンロードに 2 本目のリクエストを出す"""
+    value = os.getenv("NOTE_HEDGE_DOWNLOADS")
+    return value is not None and str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def hedge_delay(host):
+    """host の最近のヘッダー到着時間の p95 (履歴が少なければ DEFAULT_DELAY)"""
+    override = os.getenv("NOTE_HEDGE_DELAY")
+    if override:
+        return float(override)
+    with _lock:
+        samples = list(_latencies.get(host) or ())
+    if len(samples) < MIN_SAMPLES:
+        return DEFAULT_DELAY
+    return min(MAX_DELAY, max(MIN_DELAY, _percentile(samples, 0.95)))
+
+
+def _record_latency(host, seconds):
+    with _lock:
+        _latencies.setdefault(host, deque(maxlen=HISTORY_SIZE)).append(seconds)
+
+
+def _allow_hedge():
+    with _lock:
+        if _counts["hedged"] >= _counts["requests"] * MAX_HEDGE_RATIO + BURST:
+            return False
+        _counts["hedged"] += 1
+        return True
+
+
+def _attempt(index, session, url, headers, timeout, host, headers_ready, results, cancelled):
+    try:
+        response = session.get(url, headers=headers, timeout=timeout, stream=True)
+        _record_latency(host, response.elapsed.total_seconds())
+        headers_ready.set()
+        if not cancelled.is_set():
+            # stream=True only deferred the body until the headers were in.
+            response.content
+    except requests.RequestException as exc:
+        headers_ready.set()
+        results.put((index, None, exc))
+        return
+    if cancelled.is_set():
+        # The other request already won.
+        response.close()
+        return
+    results.put((index, response, None))
+
+
+def hedged_get(url, headers=None, read=30, phase="image.download"):
+    """冪等な GET を送り、遅ければ 2 本目を出して先に終わった方のレスポンスを返す
+
+    1 本目のヘッダーが hedge_delay(host) 秒以内に届かなければ同じリクエストをもう 1 本送る。
+    2 本目を出せるのはダウンロード全体の MAX_HEDGE_RATIO (+BURST) 件まで。
+    失敗は requests.RequestException として送出する (両方失敗した場合は後の方)。
+    NOTE_HEDGE_DOWNLOADS が無効なら普通の GET と同じ。
+    """
+    session = get_session()
+    if not hedging_enabled():
+        return session.get(url, headers=headers, timeout=request_timeout(read=read, phase=phase))
+
+    host = urlparse(url).hostname or ""
+    family = metrics.endpoint_family("GET", url)
+    with _lock:
+        _counts["requests"] += 1
+    results = queue.Queue()
+    cancelled = threading.Event()
+    first_headers = threading.Event()
+
+    def start(index, headers_ready):
+        # The session is passed explicitly: worker threads do not see use_session().
+        timeout = request_timeout(read=read, phase=phase)
+        threading.Thread(
+            target=_attempt,
+            args=(index, session, url, headers, timeout, host, headers_ready, results, cancelled),
+            name=f"hedge-{index}",
+            daemon=True,
+        ).start()
+
+    start(0, first_headers)
+    attempts = 1
+    if not first_headers.wait(hedge_delay(host)) and _allow_hedge():
+        metrics.mark_hedge(family)
+        start(1, threading.Event())
+        attempts = 2
+
+    error = None
+    for _ in range(attempts):
+        index, response, error = results.get()
+        if response is not None:
+            cancelled.set()
+            if index == 1:
+                metrics.mark_hedge_win(family)
+            return response
+    raise error
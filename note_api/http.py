@@ -1,3 +1,94 @@
+import contextvars
+import gzip
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .deadline import request_timeout
+from .tracing import span
+
+_current_session = contextvars.ContextVar("note_session", default=None)
+_thread_local = threading.local()
+_stats_lock = threading.Lock()
+_transfer_stats = {}
+_gzip_rejected = False
+# Requests that must not be sent twice: a 400 may not be an encoding rejection.
+NON_IDEMPOTENT_LABELS = ("create",)
+
+
+def get_session():
+    """現在の HTTP セッションを返す (use_session で指定がなければスレッドごとに 1 つ)"""
+    session = _current_session.get()
+    if session is None:
+        session = getattr(_thread_local, "session", None)
+        if session is None:
+            session = _thread_local.session = metrics.install(requests.Session())
+    return session
+
+
+class RateLimiter:
+    """リクエストの間隔を 1 / rate 秒以上空ける (rate が None か 0 なら制限しない)"""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _RateLimitedSession(requests.Session):
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, method, url, *args, **kwargs):
+        # Only note.com is throttled; presigned uploads and image downloads go elsewhere.
+        host = urlparse(url).hostname or ""
+        if host == "note.com" or host.endswith(".note.com"):
+            self.limiter.acquire()
+        return super().request(method, url, *args, **kwargs)
+
+
+def create_session(rate_limit=None, pool_size=None):
+    """アカウント用の HTTP セッションを作る
+
+    rate_limit は note.com へのリクエスト数の上限 (回/秒)、pool_size はホストごとの
+    接続プールの大きさ (同時に投稿する記事数に合わせる)。
+    """
+    session = metrics.install(_RateLimitedSession(RateLimiter(rate_limit)))
+    if pool_size:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+
+@contextmanager
+def use_session(session):
+    """with ブロック内の note API 呼び出しで session を使う"""
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
 def build_note_api_headers(cookies):
     """note API向けヘッダーを組み立てる"""
     headers = {
@@ -19,3 +110,105 @@ def build_note_api_headers(cookies):
         headers["X-XSRF-TOKEN"] = csrf_token
 
     return headers
+
+
+def _gzip_enabled():
+    value = os.getenv("NOTE_GZIP_REQUESTS")
+    if value is None:
+        return False
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _rejects_gzip(response):
+    """gzip 版へのレスポンスが圧縮の拒否に見えるか (415、または本文を JSON として読めない 400)"""
+    if response.status_code == 415:
+        return True
+    if response.status_code != 400:
+        return False
+    try:
+        response.json()
+    except ValueError:
+        return True
+    return False
+
+
+def record_transfer(label, sent_bytes):
+    with _stats_lock:
+        stats = _transfer_stats.setdefault(label, {"requests": 0, "bytes": 0})
+        stats["requests"] += 1
+        stats["bytes"] += sent_bytes
+
+
+def transfer_stats():
+    """label ごとの送信リクエスト数と送信バイト数のコピーを返す"""
+    with _stats_lock:
+        return {label: dict(stats) for label, stats in _transfer_stats.items()}
+
+
+def format_transfer_stats():
+    stats = transfer_stats()
+    if not stats:
+        return "送信量: なし"
+    parts = [
+        f"{label} {value['requests']}回/{value['bytes']:,}B"
+        for label, value in sorted(stats.items())
+    ]
+    total = sum(value["bytes"] for value in stats.values())
+    return f"送信量: {', '.join(parts)} (合計 {total:,}B)"
+
+
+def send_json(method, url, cookies, headers, payload, label, params=None):
+    """JSON ペイロードを UTF-8 のまま送信し、送信バイト数を label ごとに記録する
+
+    NOTE_GZIP_REQUESTS が有効なら gzip 圧縮して送る。圧縮版が圧縮の拒否
+    (415、または本文を解釈できない 400) で失敗した場合だけ非圧縮で再送し、成功すれば
+    サーバーが gzip を受け付けないとみなして以降は圧縮しない。それ以外の失敗は再送しない。
+    記事作成 (NON_IDEMPOTENT_LABELS) は 415 のときだけ再送し、400 なら以降の圧縮だけやめる。
+    """
+    global _gzip_rejected
+
+    # requests' json= escapes every non-ASCII character as \uXXXX, which
+    # doubles the size of Japanese text.
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    use_gzip = _gzip_enabled() and not _gzip_rejected
+    data = gzip.compress(body) if use_gzip else body
+    send_headers = dict(headers)
+    if use_gzip:
+        send_headers["Content-Encoding"] = "gzip"
+
+    session = get_session()
+    with span(f"http.{label}", method=method, bytes=len(data), gzip=use_gzip) as current:
+        response = session.request(
+            method,
+            url,
+            cookies=cookies,
+            headers=send_headers,
+            params=params,
+            data=data,
+            timeout=request_timeout(phase=label),
+        )
+        current.set(status=response.status_code)
+    record_transfer(label, len(data))
+    if not use_gzip or not _rejects_gzip(response):
+        return response
+    if label in NON_IDEMPOTENT_LABELS and response.status_code != 415:
+        _gzip_rejected = True
+        return response
+
+    metrics.mark_retry(label)
+    with span(f"http.{label}", method=method, bytes=len(body), gzip=False) as current:
+        plain_response = session.request(
+            method,
+            url,
+            cookies=cookies,
+            headers=headers,
+            params=params,
+            data=body,
+            timeout=request_timeout(phase=label),
+        )
+        current.set(status=plain_response.status_code)
+    record_transfer(label, len(body))
+    if plain_response.status_code < 400:
+        print("サーバーが gzip 圧縮リクエストを受け付けないため、以降は非圧縮で送信します。")
+        _gzip_rejected = True
+    return plain_response
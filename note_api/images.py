@@ -1,16 +1,26 @@
 import mimetypes
 import os
-import re
 import tempfile
 import time
 from urllib.parse import urlparse
 
 import requests
 
+from .deadline import remaining_seconds, request_timeout
+from .hedging import hedged_get
+from .http import get_session
+from .markdown import MARKDOWN_IMAGE_PATTERN
+from .metrics import mark_retry
+from .tracing import span
+
 
 def check_url_status(url):
     try:
-        resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=15)
+        resp = get_session().get(
+            url,
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=request_timeout(read=15, phase="image.verify"),
+        )
         return resp.status_code
     except requests.RequestException:
         return "ERR"
@@ -38,13 +48,15 @@ def upload_image(cookies, image_path):
         headers["X-CSRF-Token"] = csrf_token
         headers["X-XSRF-TOKEN"] = csrf_token
 
-    presign_resp = requests.post(
-        "https://note.com/api/v3/images/upload/presigned_post",
-        cookies=cookies,
-        headers=headers,
-        files={"filename": (None, filename)},
-        timeout=30,
-    )
+    with span("image.presign") as current:
+        presign_resp = get_session().post(
+            "https://note.com/api/v3/images/upload/presigned_post",
+            cookies=cookies,
+            headers=headers,
+            files={"filename": (None, filename)},
+            timeout=request_timeout(read=30, phase="image.presign"),
+        )
+        current.set(status=presign_resp.status_code)
     if presign_resp.status_code not in (200, 201):
         print(f"画像アップロード失敗(署名取得): {presign_resp.status_code}")
         print(f"レスポンス本文: {presign_resp.text[:500]}")
@@ -73,14 +85,15 @@ def upload_image(cookies, image_path):
         "Origin": "https://editor.note.com",
         "Referer": "https://editor.note.com/",
     }
-    with open(image_path, "rb") as f:
-        s3_resp = requests.post(
+    with span("image.s3", bytes=os.path.getsize(image_path)) as current, open(image_path, "rb") as f:
+        s3_resp = get_session().post(
             upload_url,
             data=post_fields,
             files={"file": (filename, f, mime_type)},
             headers=s3_headers,
-            timeout=60,
+            timeout=request_timeout(read=60, phase="image.s3"),
         )
+        current.set(status=s3_resp.status_code)
 
     if s3_resp.status_code != 204:
         print(f"画像アップロード失敗(S3): {s3_resp.status_code}")
@@ -89,7 +102,9 @@ def upload_image(cookies, image_path):
 
     print("画像アップロード成功！(v3 presigned_post)")
     if image_url:
-        status = check_url_status(image_url)
+        with span("image.verify") as current:
+            status = check_url_status(image_url)
+            current.set(status=status)
         print(f"アップロード画像URL到達確認: {status} ({image_url})")
     return image_key, image_url
 
@@ -97,12 +112,12 @@ def upload_image(cookies, image_path):
 def upload_image_from_url(cookies, image_url):
     """外部画像URLをダウンロードしてnoteへアップロード"""
     try:
-        response = requests.get(
-            image_url,
-            headers={"User-Agent": "Mozilla/5.0"},
-            timeout=30,
-        )
-        response.raise_for_status()
+        with span("image.download", url=image_url) as current:
+            response = hedged_get(
+                image_url, headers={"User-Agent": "Mozilla/5.0"}, read=30, phase="image.download"
+            )
+            current.set(status=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
     except requests.RequestException as exc:
         print(f"画像ダウンロード失敗: {image_url} ({exc})")
         return None, None
@@ -125,9 +140,14 @@ def upload_image_from_url(cookies, image_url):
             os.remove(temp_path)
 
 
-def upload_markdown_images(cookies, markdown_content):
-    """本文内の Markdown 画像を note へアップロードし URL を差し替える"""
-    pattern = re.compile(r"!\[([^\]]*)\]\((https?://[^)\s]+)\)")
+def upload_markdown_images(cookies, markdown_content, image_cache=None, on_upload=None):
+    """本文内の Markdown 画像を note へアップロードし URL を差し替える
+
+    image_cache (元URL -> [image_key, note URL]) を渡すと、登録済みの画像は
+    アップロードせずに再利用し、新しくアップロードした画像を追記する。
+    on_upload(元URL, image_key, note URL) は画像を 1 枚アップロードするたびに呼ばれる。
+    """
+    pattern = MARKDOWN_IMAGE_PATTERN
     matches = pattern.findall(markdown_content)
     if not matches:
         return markdown_content, []
@@ -137,7 +157,16 @@ def upload_markdown_images(cookies, markdown_content):
     for _, src_url in matches:
         if src_url in url_map:
             continue
-        uploaded_key, uploaded_url = upload_image_from_url(cookies, src_url)
+        cached = image_cache.get(src_url) if image_cache is not None else None
+        if cached:
+            uploaded_key, uploaded_url = cached
+        else:
+            with span("image", url=src_url):
+                uploaded_key, uploaded_url = upload_image_from_url(cookies, src_url)
+            if uploaded_url and image_cache is not None:
+                image_cache[src_url] = [uploaded_key, uploaded_url]
+            if uploaded_url and on_upload is not None:
+                on_upload(src_url, uploaded_key, uploaded_url)
         if uploaded_url:
             url_map[src_url] = uploaded_url
             if uploaded_key:
@@ -194,14 +223,18 @@ def upload_note_eyecatch(cookies, note_id, image_path):
             with open(image_path, "rb") as f:
                 upload_name, _, content_type = file_meta
                 files = {file_key: (upload_name, f, content_type)}
-                resp = requests.post(
-                    "https://note.com/api/v1/image_upload/note_eyecatch",
-                    cookies=cookies,
-                    headers=headers,
-                    files=files,
-                    data={"note_id": str(note_id)},
-                    timeout=60,
-                )
+                if last_resp is not None:
+                    mark_retry("eyecatch_upload")
+                with span("eyecatch.attempt", attempt=attempt, field=file_key) as current:
+                    resp = get_session().post(
+                        "https://note.com/api/v1/image_upload/note_eyecatch",
+                        cookies=cookies,
+                        headers=headers,
+                        files=files,
+                        data={"note_id": str(note_id)},
+                        timeout=request_timeout(read=60, phase="eyecatch.attempt"),
+                    )
+                    current.set(status=resp.status_code)
             last_resp = resp
             if resp.status_code in (200, 201):
                 try:
@@ -211,7 +244,9 @@ def upload_note_eyecatch(cookies, note_id, image_path):
                 eyecatch_url = data.get("url")
                 print(f"サムネイル画像アップロード成功: {eyecatch_url}")
                 return eyecatch_url
-        time.sleep(1.5 * attempt)
+        with span("eyecatch.backoff", attempt=attempt):
+            # Never sleep past the deadline; the next attempt then stops the run.
+            time.sleep(max(0.0, min(1.5 * attempt, remaining_seconds(1.5 * attempt))))
 
     if last_resp is not None:
         print(f"サムネイル画像アップロード失敗: {last_resp.status_code}")
@@ -224,12 +259,12 @@ def upload_note_eyecatch(cookies, note_id, image_path):
 def upload_note_eyecatch_from_url(cookies, note_id, image_url):
     """外部URLの画像をダウンロードしてサムネイル画像としてアップロード"""
     try:
-        response = requests.get(
-            image_url,
-            headers={"User-Agent": "Mozilla/5.0"},
-            timeout=30,
-        )
-        response.raise_for_status()
+        with span("eyecatch.download", url=image_url) as current:
+            response = hedged_get(
+                image_url, headers={"User-Agent": "Mozilla/5.0"}, read=30, phase="eyecatch.download"
+            )
+            current.set(status=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
     except requests.RequestException as exc:
         print(f"サムネイル画像ダウンロード失敗: {image_url} ({exc})")
         return None
@@ -0,0 +1,267 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from .batch import post_file
+
+JOB_ACTIONS = ("post", "publish")
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 60
+
+Job = namedtuple("Job", "id account content_file action priority run_at attempts")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    content_file TEXT NOT NULL,
+    action TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    note_id TEXT,
+    last_error TEXT,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, run_at, id);
+CREATE INDEX IF NOT EXISTS jobs_file ON jobs (account, content_file, status);
+"""
+
+_JOB_COLUMNS = "id, account, content_file, action, priority, run_at, attempts"
+
+
+class JobQueue:
+    """SQLite に保存する投稿ジョブのキュー
+
+    ジョブは (account, content_file) 単位で重複排除され、待機中のジョブは
+    同じファイルの新しいジョブで置き換えられる (superseded)。
+    状態は queued -> running -> done / failed。実行中のまま lease_seconds を
+    過ぎたジョブ (プロセスが落ちた場合など) は待機中に戻す。
+    接続はスレッドごとに開くので、複数のワーカースレッドから共有できる。
+    """
+
+    def __init__(self, path, lease_seconds=1800):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly below.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, func):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def enqueue(self, account, content_file, action="post", priority=0, run_at=None):
+        """ジョブを 1 件追加し、その id を返す"""
+        return self.enqueue_many([(account, content_file, action, priority, run_at)])[0]
+
+    def enqueue_many(self, jobs):
+        """(account, content_file, action, priority, run_at) の列を 1 トランザクションで追加する
+
+        同じファイルの待機中ジョブは superseded にし、その優先度と publish 指定は
+        新しいジョブに引き継ぐ。
+        """
+
+        def insert(conn):
+            now = time.time()
+            ids = []
+            for account, content_file, action, priority, run_at in jobs:
+                if action not in JOB_ACTIONS:
+                    raise ValueError(f"unknown job action: {action}")
+                content_file = os.path.abspath(content_file)
+                priority = int(priority or 0)
+                queued = conn.execute(
+                    "SELECT action, priority FROM jobs"
+                    " WHERE account = ? AND content_file = ? AND status = 'queued'",
+                    (account, content_file),
+                ).fetchall()
+                for old_action, old_priority in queued:
+                    priority = max(priority, old_priority)
+                    if old_action == "publish":
+                        action = "publish"
+                if queued:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'superseded', updated_at = ?"
+                        " WHERE account = ? AND content_file = ? AND status = 'queued'",
+                        (now, account, content_file),
+                    )
+                cursor = conn.execute(
+                    "INSERT INTO jobs (account, content_file, action, priority, run_at,"
+                    " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (account, content_file, action, priority, run_at or now, now, now),
+                )
+                ids.append(cursor.lastrowid)
+            return ids
+
+        return self._transaction(insert)
+
+    def claim(self, account_limits=None, default_limit=1):
+        """実行可能なジョブを 1 件 running にして返す (なければ None)
+
+        優先度の高い順、run_at の早い順に、同時実行数が上限に達したアカウントと
+        実行中のファイルを除いて選ぶ。
+        """
+        account_limits = account_limits or {}
+
+        def pick(conn):
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', claimed_at = NULL, updated_at = ?"
+                " WHERE status = 'running' AND claimed_at < ?",
+                (now, now - self.lease_seconds),
+            )
+            running = conn.execute(
+                "SELECT account, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY account"
+            ).fetchall()
+            full = [
+                account
+                for account, count in running
+                if count >= account_limits.get(account, default_limit)
+            ]
+            placeholders = ", ".join("?" for _ in full)
+            row = conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs"
+                " WHERE status = 'queued' AND run_at <= ?"
+                f" AND account NOT IN ({placeholders})"
+                " AND content_file NOT IN (SELECT content_file FROM jobs WHERE status = 'running')"
+                " ORDER BY priority DESC, run_at, id LIMIT 1",
+                [now] + full,
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', claimed_at = ?, attempts = attempts + 1,"
+                " updated_at = ? WHERE id = ?",
+                (now, now, row[0]),
+            )
+            job = Job(*row)
+            return job._replace(attempts=job.attempts + 1)
+
+        return self._transaction(pick)
+
+    def complete(self, job_id, note_id=None):
+        self._transaction(
+            lambda conn: conn.execute(
+                "UPDATE jobs SET status = 'done', note_id = ?, last_error = NULL,"
+                " updated_at = ? WHERE id = ?",
+                (note_id, time.time(), job_id),
+            )
+        )
+
+    def fail(self, job, error, max_attempts=MAX_ATTEMPTS):
+        """失敗を記録する。試行回数が残っていれば指数的に間隔を空けて再実行する"""
+        now = time.time()
+        if job.attempts < max_attempts:
+            status, run_at = "queued", now + RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+        else:
+            status, run_at = "failed", job.run_at
+        self._transaction(
+            lambda conn: conn.execute(
+                "UPDATE jobs SET status = ?, run_at = ?, last_error = ?, claimed_at = NULL,"
+                " updated_at = ? WHERE id = ? AND status = 'running'",
+                (status, run_at, (error or "")[:500], now, job.id),
+            )
+        )
+        return status
+
+    def counts(self):
+        """状態ごとのジョブ数"""
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ).fetchall()
+        return dict(rows)
+
+    def has_ready(self):
+        """実行時刻を過ぎた待機中のジョブがあるか (同時実行数の上限で待っているものを含む)"""
+        row = self._connection().execute(
+            "SELECT 1 FROM jobs WHERE status = 'queued' AND run_at <= ? LIMIT 1",
+            (time.time(),),
+        ).fetchone()
+        return row is not None
+
+
+def run_queue(
+    queue,
+    clients,
+    workers=2,
+    account_limits=None,
+    default_limit=1,
+    state=None,
+    write_back=None,
+    transfer_mode="full",
+    poll_interval=0.5,
+):
+    """キューの実行可能なジョブがなくなるまでワーカースレッドで処理し、結果の行を返す
+
+    clients は アカウントキー -> NoteClient。対応するクライアントがないジョブは失敗にする。
+    run_at が未来のジョブはキューに残す。
+    """
+    rows = []
+    rows_lock = threading.Lock()
+
+    def work():
+        while True:
+            job = queue.claim(account_limits, default_limit)
+            if job is None:
+                if not queue.has_ready():
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            client = clients.get(job.account)
+            if client is None:
+                row = {
+                    "path": job.content_file,
+                    "status": "failed",
+                    "note_id": None,
+                    "detail": "アカウントの認証情報がありません",
+                    "seconds": 0.0,
+                }
+            else:
+                row = post_file(
+                    client,
+                    job.content_file,
+                    job.action == "publish",
+                    state,
+                    write_back,
+                    transfer_mode,
+                    None,
+                )
+            if row["status"] == "failed":
+                if queue.fail(job, row["detail"]) == "queued":
+                    row["detail"] = f"{row['detail']} (再試行予定)"
+            else:
+                queue.complete(job.id, row["note_id"])
+            row["path"] = os.path.relpath(row["path"])
+            with rows_lock:
+                rows.append(row)
+
+    threads = [threading.Thread(target=work) for _ in range(max(1, int(workers or 1)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return rows
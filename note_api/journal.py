@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+
+from .state import _digest, state_key_for_path
+from .writeback import atomic_write_text
+
+JOURNAL_STEPS = ("created", "image", "draft_saved", "published", "eyecatch", "done")
+
+
+def journal_key(state_key, title, content_file=None):
+    """ジャーナルのキー (state_key か content_file のパス。どちらもなければタイトルから作る)"""
+    if state_key:
+        return state_key
+    if content_file:
+        return state_key_for_path(content_file)
+    return f"title:{_digest(title or '')[:16]}"
+
+
+def content_fingerprint(hashes):
+    return _digest(hashes)
+
+
+class Journal:
+    """post_to_note の各工程の完了を追記していく JSON Lines のジャーナル
+
+    1 行が 1 工程で、{"key", "step", "fingerprint", ...} の形。書き込みごとに fsync する。
+    途中で止まった投稿は、次回同じキーで resume() すると完了済みの工程を返す。
+    "done" まで進んだキーは次に開いたときに取り除く。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        stale = False
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key = record["key"]
+                except (ValueError, KeyError, TypeError):
+                    # A torn last line from a crash mid-write.
+                    stale = True
+                    continue
+                if record.get("step") == "done":
+                    self.entries.pop(key, None)
+                    stale = True
+                    continue
+                self.entries.setdefault(key, []).append(record)
+        if stale:
+            text = "".join(
+                json.dumps(record, ensure_ascii=False) + "\n"
+                for records in self.entries.values()
+                for record in records
+            )
+            atomic_write_text(self.path, text)
+
+    def resume(self, key, fingerprint, same_content_only=False):
+        """key の途中経過を返す
+
+        戻り値は {"article_id", "article_key", "images", "steps"}。
+        steps には現在の内容 (fingerprint) と同じ内容で完了した工程だけを入れる。
+        作成済みの記事 ID とアップロード済みの画像は内容が変わっても再利用する。
+        same_content_only=True (キーがファイルのパスでなくタイトルの場合) は、
+        別のファイルの記事を上書きしないよう、記事 ID と画像も同じ内容のときだけ再利用する。
+        """
+        with self.lock:
+            records = list(self.entries.get(key) or [])
+        progress = {"article_id": None, "article_key": None, "images": {}, "steps": set()}
+        for record in records:
+            step = record.get("step")
+            if same_content_only and record.get("fingerprint") != fingerprint:
+                continue
+            if step == "created":
+                progress["article_id"] = record.get("article_id")
+                progress["article_key"] = record.get("article_key")
+            elif step == "image":
+                progress["images"][record["src"]] = [record.get("image_key"), record.get("url")]
+            elif record.get("fingerprint") == fingerprint:
+                progress["steps"].add(step)
+        return progress
+
+    def record(self, key, step, fingerprint=None, **data):
+        if step not in JOURNAL_STEPS:
+            raise ValueError(f"unknown journal step: {step}")
+        record = dict(data, key=key, step=step, fingerprint=fingerprint, at=int(time.time()))
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if step == "done":
+                self.entries.pop(key, None)
+            else:
+                self.entries.setdefault(key, []).append(record)
+
+    def finish(self, key):
+        """key の投稿が最後まで終わったことを記録する"""
+        with self.lock:
+            pending = key in self.entries
+        if pending:
+            self.record(key, "done")
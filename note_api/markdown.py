@@ -1,7 +1,256 @@
+import os
 import re
 import uuid
 from html import escape
 
+MARKDOWN_IMAGE_PATTERN = re.compile(r"!\[([^\]]*)\]\((https?://[^)\s]+)\)")
+_INLINE_SPECIAL = re.compile(r"[`!\[*~]|https?://")
+_LINK_URL_SCHEME = re.compile(r"https?://")
+_LINK_URL_DELIMITER = re.compile(r"[)\s]")
+_BARE_URL = re.compile(r"https?://[A-Za-z0-9\-._~:/?#@!$&'()*+,;=%]+")
+_BARE_URL_TRAILING = ".,;:!?'*~"
+_STANDALONE_URL = re.compile(r"https?://[^\s<>\"]+")
+_EMBED_SERVICES = [
+    (("youtube.com", "youtu.be"), "youtube"),
+    (("twitter.com", "x.com"), "twitter"),
+    (("note.com",), "note"),
+]
+
+
+class _Finder:
+    """同じ区切り文字の検索結果を使い回し、走査全体を線形に保つ"""
+
+    def __init__(self, text, needle):
+        self.text = text
+        self.needle = needle
+        self.start = None
+        self.pos = -1
+
+    def find(self, start, end):
+        if (
+            self.start is None
+            or start < self.start
+            or (self.pos != -1 and self.pos < start)
+        ):
+            self.start = start
+            self.pos = self.text.find(self.needle, start)
+        if self.pos == -1 or self.pos + len(self.needle) > end:
+            return -1
+        return self.pos
+
+
+class _InlineScanner:
+    """1 行分のインライン記法を左から 1 回だけ走査して HTML にする"""
+
+    def __init__(self, text):
+        self.text = text
+        self.finders = {}
+        self.link_urls = {}
+        self.url_run = (-1, -1)
+        self.emphasis_dead = {}
+
+    def find(self, needle, start, end):
+        finder = self.finders.get(needle)
+        if finder is None:
+            finder = self.finders[needle] = _Finder(self.text, needle)
+        return finder.find(start, end)
+
+    def render(self, start, end, autolink=True):
+        text = self.text
+        out = []
+        i = start
+        while i < end:
+            m = _INLINE_SPECIAL.search(text, i, end)
+            if not m:
+                out.append(escape(text[i:end]))
+                break
+            pos = m.start()
+            if pos > i:
+                out.append(escape(text[i:pos]))
+            html, next_pos = self.render_special(pos, end, autolink)
+            if html is None:
+                out.append(escape(text[pos]))
+                i = pos + 1
+            else:
+                out.append(html)
+                i = next_pos
+        return "".join(out)
+
+    def render_special(self, pos, end, autolink):
+        text = self.text
+        ch = text[pos]
+
+        if ch == "`":
+            # note does not support inline code spans; keep them as plain text.
+            close = self.find("`", pos + 1, end)
+            if close > pos + 1:
+                return escape(text[pos + 1 : close]), close + 1
+            return None, pos
+
+        if ch == "!":
+            if pos + 1 < end and text[pos + 1] == "[":
+                link = self.link_at(pos + 1, end)
+                if link:
+                    close, url_end = link
+                    alt = escape(text[pos + 2 : close].strip())
+                    url = escape(text[close + 2 : url_end], quote=True)
+                    return (
+                        f'<img src="{url}" alt="{alt}" loading="lazy" class="is-slide" data-modal="true">',
+                        url_end + 1,
+                    )
+            return None, pos
+
+        if ch == "[":
+            link = self.link_at(pos, end)
+            if link and link[0] > pos + 1:
+                close, url_end = link
+                label_start, label_end = _strip_range(text, pos + 1, close)
+                if label_start < label_end:
+                    label = self.render(label_start, label_end, autolink=False)
+                    url = escape(text[close + 2 : url_end], quote=True)
+                    return (
+                        f'<a href="{url}" target="_blank" rel="noopener noreferrer">{label}</a>',
+                        url_end + 1,
+                    )
+            return None, pos
+
+        if ch == "~":
+            if text.startswith("~~", pos, end):
+                close = self.find("~~", pos + 3, end)
+                if close != -1:
+                    inner = self.render(pos + 2, close, autolink)
+                    return f"<s>{inner}</s>", close + 2
+            return None, pos
+
+        if ch == "*":
+            if text.startswith("***", pos, end):
+                close = self.find("*", pos + 3, end)
+                if close > pos + 3 and text.startswith("***", close, end):
+                    inner = self.render(pos + 3, close, autolink)
+                    return f"<em><strong>{inner}</strong></em>", close + 3
+            if text.startswith("**", pos, end):
+                close = self.find("*", pos + 2, end)
+                if close > pos + 2 and text.startswith("**", close, end):
+                    inner = self.render(pos + 2, close, autolink)
+                    return f"<strong>{inner}</strong>", close + 2
+            close = self.emphasis_close(pos + 1, end)
+            if close > pos + 1:
+                inner = self.render(pos + 1, close, autolink)
+                return f"<em>{inner}</em>", close + 1
+            return None, pos
+
+        if not autolink or (pos > 0 and text[pos - 1].isascii() and text[pos - 1].isalnum()):
+            return None, pos
+        if text.startswith("](", pos - 2, pos):
+            # The URL of a malformed `[label](url` stays plain text.
+            return None, pos
+        url_end = _bare_url_end(text, pos, end)
+        if url_end is None:
+            return None, pos
+        url = escape(text[pos:url_end], quote=True)
+        return (
+            f'<a href="{url}" target="_blank" rel="noopener noreferrer">{url}</a>',
+            url_end,
+        )
+
+    def link_at(self, pos, end):
+        """pos の `[` から始まる `[label](https://...)` を探し (`]` の位置, URL 終端) を返す"""
+        close = self.find("]", pos + 1, end)
+        if close == -1 or not self.text.startswith("(", close + 1, end):
+            return None
+        if close not in self.link_urls:
+            self.link_urls[close] = self.link_url_end(close + 2)
+        url_end = self.link_urls[close]
+        if url_end == -1 or url_end + 1 > end:
+            return None
+        return close, url_end
+
+    def emphasis_close(self, start, end):
+        """start 以降で `*` 強調を閉じる `*` の位置を返す (間の `**...**` は飛ばす)。なければ -1"""
+        text = self.text
+        # `**` positions already known to lead to no closer before end.
+        dead = self.emphasis_dead.setdefault(end, set())
+        skipped = []
+        close = self.find("*", start, end)
+        while close != -1 and close not in dead:
+            strong_close = self.find("*", close + 2, end)
+            if (
+                not text.startswith("**", close, end)
+                or strong_close <= close + 2
+                or not text.startswith("**", strong_close, end)
+            ):
+                return close
+            skipped.append(close)
+            close = self.find("*", strong_close + 2, end)
+        dead.update(skipped)
+        return -1
+
+    def link_url_end(self, start):
+        """start から始まる URL の終端 (`)` の位置) を返す。見つからなければ -1"""
+        if not _LINK_URL_SCHEME.match(self.text, start):
+            return -1
+        # Every position inside one run of URL characters ends at the same
+        # delimiter, so remember the last run instead of rescanning it.
+        run_start, run_end = self.url_run
+        if not run_start <= start <= run_end:
+            m = _LINK_URL_DELIMITER.search(self.text, start)
+            run_start, run_end = start, m.start() if m else len(self.text)
+            self.url_run = (run_start, run_end)
+        if run_end == start or not self.text.startswith(")", run_end):
+            return -1
+        return run_end
+
+
+def _strip_range(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _bare_url_end(text, pos, end):
+    m = _BARE_URL.match(text, pos, end)
+    if not m:
+        return None
+    url_end = m.end()
+    unbalanced = text.count(")", pos, url_end) - text.count("(", pos, url_end)
+    while url_end > pos:
+        last = text[url_end - 1]
+        if last in _BARE_URL_TRAILING:
+            url_end -= 1
+        elif last == "(":
+            url_end -= 1
+            unbalanced += 1
+        elif last == ")" and unbalanced > 0:
+            url_end -= 1
+            unbalanced -= 1
+        else:
+            break
+    if url_end <= text.index("//", pos) + 2:
+        return None
+    return url_end
+
+
+def inline_format(text):
+    """インライン記法 (リンク・画像・強調・打ち消し線・裸の URL) を HTML に変換"""
+    return _InlineScanner(text).render(0, len(text))
+
+
+def embeds_enabled():
+    """NOTE_EMBED_URLS が真なら、URL だけの行を埋め込みブロックにする (既定は段落内のリンク)"""
+    value = os.getenv("NOTE_EMBED_URLS")
+    return value is not None and str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _embed_service(url):
+    host = url.split("//", 1)[1].split("/", 1)[0].split(":", 1)[0].lower()
+    for domains, service in _EMBED_SERVICES:
+        for domain in domains:
+            if host == domain or host.endswith(f".{domain}"):
+                return service
+    return "external-article"
+
 
 def markdown_to_html(markdown_text):
     """Markdownをnote表示向けHTMLに変換"""
@@ -9,34 +258,11 @@ def markdown_to_html(markdown_text):
     if not text:
         return ""
 
+    embeds = embeds_enabled()
+
     def block_id():
         return str(uuid.uuid4())
 
-    def inline_format(s):
-        # note does not support inline code spans; keep them as plain text.
-        s = re.sub(r"`([^`]+)`", r"\1", s)
-        s = escape(s)
-
-        def replace_image(match):
-            alt = escape(match.group(1).strip())
-            url = escape(match.group(2).strip(), quote=True)
-            return f'<img src="{url}" alt="{alt}" loading="lazy" class="is-slide" data-modal="true">'
-
-        def replace_link(match):
-            label = match.group(1).strip()
-            url = escape(match.group(2).strip(), quote=True)
-            label = re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", escape(label))
-            label = re.sub(r"\*([^*]+)\*", r"<em>\1</em>", label)
-            return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{label}</a>'
-
-        s = re.sub(r"!\[([^\]]*)\]\((https?://[^)\s]+)\)", replace_image, s)
-        s = re.sub(r"\[([^\]]+)\]\((https?://[^)\s]+)\)", replace_link, s)
-        s = re.sub(r"~~(.+?)~~", r"<s>\1</s>", s)
-        s = re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", s)
-        s = re.sub(r"\*([^*]+)\*", r"<em>\1</em>", s)
-
-        return s
-
     def image_block(line):
         m = re.match(r"^!\[([^\]]*)\]\((https?://[^)\s]+)\)$", line.strip())
         if not m:
@@ -52,6 +278,19 @@ def markdown_to_html(markdown_text):
             '</figure>'
         )
 
+    def embed_block(line):
+        url = line.strip()
+        if not _STANDALONE_URL.fullmatch(url):
+            return None
+        href = escape(url, quote=True)
+        bid = block_id()
+        return (
+            f'<figure name="{bid}" id="{bid}" data-src="{href}" '
+            f'embedded-service="{_embed_service(url)}" contenteditable="false">'
+            f'<a href="{href}" target="_blank" rel="noopener noreferrer">{href}</a>'
+            "</figure>"
+        )
+
     lines = text.split("\n")
     blocks = []
     paragraph_lines = []
@@ -155,6 +394,15 @@ def markdown_to_html(markdown_text):
             blocks.append(img_block)
             continue
 
+        if embeds and not line[:1].isspace():
+            embed = embed_block(line)
+            if embed is not None:
+                flush_paragraph()
+                flush_list()
+                flush_quote()
+                blocks.append(embed)
+                continue
+
         if re.match(r"^\s*---\s*$", line):
             flush_paragraph()
             flush_list()
@@ -223,3 +471,9 @@ def markdown_body_length(markdown_text):
     text = text.replace("**", "").replace("*", "").replace("`", "")
     compact = re.sub(r"\s+", "", text)
     return len(compact)
+
+
+def extract_image_urls(markdown_text):
+    """本文内の Markdown 画像 URL を出現順・重複なしで返す"""
+    urls = (m.group(2) for m in MARKDOWN_IMAGE_PATTERN.finditer(markdown_text or ""))
+    return list(dict.fromkeys(urls))
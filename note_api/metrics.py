@@ -0,0 +1,308 @@
+import json
+import re
+import socket
+import threading
+from urllib.parse import urlparse
+
+from .writeback import atomic_write_text
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (method or None, host pattern, path pattern, endpoint family), first match wins.
+_ENDPOINT_FAMILIES = [
+    ("POST", r"(^|\.)note\.com$", r"^/api/v1/text_notes/draft_save$", "draft_save"),
+    ("POST", r"(^|\.)note\.com$", r"^/api/v1/text_notes/?$", "create"),
+    ("PUT", r"(^|\.)note\.com$", r"^/api/v1/text_notes/[^/]+$", "publish"),
+    ("GET", r"(^|\.)note\.com$", r"^/api/v1/text_notes/[^/]+$", "fetch"),
+    (None, r"(^|\.)note\.com$", r"/images/upload/presigned_post$", "image_presign"),
+    (None, r"(^|\.)note\.com$", r"/image_upload/note_eyecatch$", "eyecatch_upload"),
+    ("GET", r"(^|\.)note\.com$", r"^/api/v2/note_list/", "note_list"),
+    (None, r"(^|\.)note\.com$", r"", "note_other"),
+    ("GET", r"(^|\.)st-note\.com$", r"", "image_verify"),
+    ("POST", r"", r"", "image_s3"),
+    ("GET", r"", r"", "image_download"),
+]
+_ENDPOINT_FAMILIES = [
+    (method, re.compile(host), re.compile(path), family)
+    for method, host, path, family in _ENDPOINT_FAMILIES
+]
+
+_lock = threading.Lock()
+_families = {}
+_sinks = []
+
+
+def endpoint_family(method, url):
+    """リクエストの送り先をエンドポイントの種類 (create, draft_save, image_s3 など) に分類する"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    for family_method, host_pattern, path_pattern, family in _ENDPOINT_FAMILIES:
+        if family_method and family_method != method.upper():
+            continue
+        if host_pattern.search(host) and path_pattern.search(parsed.path):
+            return family
+    return "other"
+
+
+def _new_family():
+    return {
+        "requests": 0,
+        "retries": 0,
+        "hedges": 0,
+        "hedge_wins": 0,
+        "status": {},
+        "bytes_sent": 0,
+        "bytes_received": 0,
+        "latency": {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0},
+    }
+
+
+def observe(family, status, seconds, sent_bytes=0, received_bytes=0):
+    """1 リクエスト分の結果を記録し、登録済みのシンクにも渡す"""
+    with _lock:
+        stats = _families.setdefault(family, _new_family())
+        stats["requests"] += 1
+        key = str(status)
+        stats["status"][key] = stats["status"].get(key, 0) + 1
+        stats["bytes_sent"] += sent_bytes
+        stats["bytes_received"] += received_bytes
+        latency = stats["latency"]
+        index = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS)
+        )
+        latency["buckets"][index] += 1
+        latency["sum"] += seconds
+        latency["count"] += 1
+        sinks = list(_sinks)
+    for sink in sinks:
+        sink.observe(family, status, seconds, sent_bytes, received_bytes)
+
+
+def mark_retry(family):
+    """family へのリクエストが再送 (別形式・再試行) であることを記録する"""
+    with _lock:
+        _families.setdefault(family, _new_family())["retries"] += 1
+        sinks = list(_sinks)
+    for sink in sinks:
+        sink.retry(family)
+
+
+def mark_hedge(family):
+    """family への遅いリクエストに 2 本目 (ヘッジ) を出したことを記録する"""
+    with _lock:
+        _families.setdefault(family, _new_family())["hedges"] += 1
+        sinks = list(_sinks)
+    for sink in sinks:
+        sink.hedge(family, False)
+
+
+def mark_hedge_win(family):
+    """ヘッジした 2 本目が 1 本目より先に終わったことを記録する"""
+    with _lock:
+        _families.setdefault(family, _new_family())["hedge_wins"] += 1
+        sinks = list(_sinks)
+    for sink in sinks:
+        sink.hedge(family, True)
+
+
+def snapshot():
+    """エンドポイントの種類ごとの集計のコピー (ヒストグラムは累積件数)"""
+    with _lock:
+        result = {}
+        for family, stats in sorted(_families.items()):
+            latency = stats["latency"]
+            cumulative = []
+            total = 0
+            for count in latency["buckets"]:
+                total += count
+                cumulative.append(total)
+            bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            result[family] = {
+                "requests": stats["requests"],
+                "retries": stats["retries"],
+                "hedges": stats["hedges"],
+                "hedge_wins": stats["hedge_wins"],
+                "status": dict(stats["status"]),
+                "bytes_sent": stats["bytes_sent"],
+                "bytes_received": stats["bytes_received"],
+                "latency": {
+                    "buckets": dict(zip(bounds, cumulative)),
+                    "sum": round(latency["sum"], 6),
+                    "count": latency["count"],
+                },
+            }
+        return result
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    try:
+        return len(body)
+    except TypeError:
+        # Streamed bodies (generators, file objects) have no cheap length.
+        return 0
+
+
+def response_hook(response, *args, **kwargs):
+    """requests の response フックとして、すべてのリクエストを observe に記録する"""
+    request = response.request
+    if kwargs.get("stream"):
+        received = int(response.headers.get("Content-Length") or 0)
+    else:
+        received = len(response.content or b"")
+    observe(
+        endpoint_family(request.method, request.url),
+        response.status_code,
+        response.elapsed.total_seconds(),
+        _body_size(request.body),
+        received,
+    )
+    return response
+
+
+def install(session):
+    """session のすべてのリクエストを計測する"""
+    if response_hook not in session.hooks["response"]:
+        session.hooks["response"].append(response_hook)
+    return session
+
+
+class _Sink:
+    def observe(self, family, status, seconds, sent_bytes, received_bytes):
+        pass
+
+    def retry(self, family):
+        pass
+
+    def hedge(self, family, won):
+        pass
+
+    def flush(self, metrics):
+        pass
+
+
+class JsonSink(_Sink):
+    """実行終了時に snapshot() を JSON ファイルへ書き出す"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def flush(self, metrics):
+        atomic_write_text(self.path, json.dumps(metrics, ensure_ascii=False, indent=2) + "\n")
+
+
+class PrometheusSink(_Sink):
+    """実行終了時に Prometheus のテキスト形式 (node_exporter の textfile 用) で書き出す"""
+
+    def __init__(self, path, prefix="note"):
+        self.path = path
+        self.prefix = prefix
+
+    def flush(self, metrics):
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_http_requests_total HTTP requests by endpoint family and status.",
+            f"# TYPE {p}_http_requests_total counter",
+        ]
+        for family, stats in metrics.items():
+            for status, count in sorted(stats["status"].items()):
+                lines.append(
+                    f'{p}_http_requests_total{{endpoint="{family}",status="{status}"}} {count}'
+                )
+        for name, key, help_text in (
+            ("http_retries_total", "retries", "Requests resent with another format or after a failure."),
+            ("http_hedges_total", "hedges", "Slow requests duplicated by a hedged second request."),
+            ("http_hedge_wins_total", "hedge_wins", "Hedged second requests that finished first."),
+            ("http_sent_bytes_total", "bytes_sent", "Request body bytes sent."),
+            ("http_received_bytes_total", "bytes_received", "Response body bytes received."),
+        ):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} counter")
+            for family, stats in metrics.items():
+                lines.append(f'{p}_{name}{{endpoint="{family}"}} {stats[key]}')
+        lines.append(f"# HELP {p}_http_request_duration_seconds Time until the response headers arrived.")
+        lines.append(f"# TYPE {p}_http_request_duration_seconds histogram")
+        for family, stats in metrics.items():
+            latency = stats["latency"]
+            for bound, count in latency["buckets"].items():
+                lines.append(
+                    f'{p}_http_request_duration_seconds_bucket{{endpoint="{family}",le="{bound}"}} {count}'
+                )
+            lines.append(f'{p}_http_request_duration_seconds_sum{{endpoint="{family}"}} {latency["sum"]}')
+            lines.append(
+                f'{p}_http_request_duration_seconds_count{{endpoint="{family}"}} {latency["count"]}'
+            )
+        atomic_write_text(self.path, "\n".join(lines) + "\n")
+
+
+class StatsdSink(_Sink):
+    """リクエストごとに StatsD (UDP) へカウンターとタイマーを送る"""
+
+    def __init__(self, host="127.0.0.1", port=8125, prefix="note"):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, lines):
+        try:
+            self.socket.sendto("\n".join(lines).encode("utf-8"), self.address)
+        except OSError:
+            # Metrics must never break a post.
+            pass
+
+    def observe(self, family, status, seconds, sent_bytes, received_bytes):
+        p = f"{self.prefix}.http.{family}"
+        self._send(
+            [
+                f"{p}.requests:1|c",
+                f"{p}.status.{status}:1|c",
+                f"{p}.sent_bytes:{sent_bytes}|c",
+                f"{p}.received_bytes:{received_bytes}|c",
+                f"{p}.latency:{seconds * 1000:.3f}|ms",
+            ]
+        )
+
+    def retry(self, family):
+        self._send([f"{self.prefix}.http.{family}.retries:1|c"])
+
+    def hedge(self, family, won):
+        name = "hedge_wins" if won else "hedges"
+        self._send([f"{self.prefix}.http.{family}.{name}:1|c"])
+
+    def flush(self, metrics):
+        self.socket.close()
+
+
+def create_sink(spec):
+    """"形式:送り先" (prometheus:PATH / json:PATH / statsd:HOST:PORT) からシンクを作る"""
+    kind, _, target = spec.partition(":")
+    if kind == "prometheus" and target:
+        return PrometheusSink(target)
+    if kind == "json" and target:
+        return JsonSink(target)
+    if kind == "statsd":
+        host, _, port = (target or "127.0.0.1:8125").rpartition(":")
+        return StatsdSink(host or "127.0.0.1", port or 8125)
+    raise ValueError(
+        f"unknown metrics sink: {spec} (expected prometheus:PATH, json:PATH or statsd:HOST:PORT)"
+    )
+
+
+def add_sink(sink):
+    with _lock:
+        _sinks.append(sink)
+
+
+def flush_sinks():
+    """登録済みのシンクに集計を渡して閉じる"""
+    with _lock:
+        sinks = list(_sinks)
+        _sinks.clear()
+    metrics = snapshot()
+    for sink in sinks:
+        sink.flush(metrics)
+    return metrics
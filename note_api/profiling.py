@@ -0,0 +1,128 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+DEFAULT_PROFILE_DIR = "profile"
+SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler:
+    """全スレッドのスタックを一定間隔で記録し、flamegraph 用の collapsed 形式で書き出す
+
+    cProfile は有効にしたスレッドしか計測しないため、ワーカースレッドで投稿する
+    バッチ処理ではこちらで全体を見る。
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _write_stats(profiler, path, limit=80):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs()
+    stream.write("=== cumulative time ===\n")
+    stats.sort_stats("cumulative").print_stats(limit)
+    stream.write("\n=== own time ===\n")
+    stats.sort_stats("tottime").print_stats(limit)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(stream.getvalue())
+
+
+def _write_memory(snapshot, path, limit=40):
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"current {current:,} B / peak {peak:,} B", "", "=== by line ==="]
+    lines += [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+    lines += ["", "=== by traceback (top 10) ==="]
+    for stat in snapshot.statistics("traceback")[:10]:
+        lines.append(f"{stat.count} blocks, {stat.size:,} B")
+        lines += [f"    {line}" for line in stat.traceback.format()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+@contextmanager
+def profile_run(output_dir=DEFAULT_PROFILE_DIR, memory=False, interval=SAMPLE_INTERVAL):
+    """with ブロックの実行をプロファイルし、output_dir に結果を書き出す
+
+    - profile.prof: cProfile の結果 (snakeviz / pstats で開ける)
+    - profile.txt: 累積時間順・自己時間順の上位関数
+    - profile.collapsed: 全スレッドのスタックのサンプル (flamegraph.pl / speedscope 用)
+    - memory.txt: memory=True のとき、tracemalloc による確保量の多い行
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if memory:
+        tracemalloc.start(25)
+    sampler = StackSampler(interval)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - started
+        if memory:
+            # Snapshot before writing the reports so their own allocations stay out.
+            snapshot = tracemalloc.take_snapshot()
+            _write_memory(snapshot, os.path.join(output_dir, "memory.txt"))
+            tracemalloc.stop()
+        profiler.dump_stats(os.path.join(output_dir, "profile.prof"))
+        _write_stats(profiler, os.path.join(output_dir, "profile.txt"))
+        sampler.write_collapsed(os.path.join(output_dir, "profile.collapsed"))
+        print(
+            f"プロファイルを書き出しました: {output_dir} "
+            f"({elapsed:.2f}s, スタックのサンプル {sampler.samples} 回)",
+            file=sys.stderr,
+        )
@@ -1,14 +1,54 @@
+import json
+from collections import namedtuple
+
+import requests
+
 from .articles import (
+    REMOTE_COMPARABLE_FIELDS,
+    article_exists,
     create_article,
+    diff_remote_article,
     publish_article,
+    remote_image_keys,
     update_article_draft,
     update_existing_article,
 )
 from .auth import get_note_cookies
+from .cache import account_key
+from .deadline import DeadlineExceeded, phase
+from .dryrun import plan_post
 from .images import upload_markdown_images, upload_note_eyecatch_from_url
+from .journal import content_fingerprint, journal_key
+from .markdown import extract_image_urls
+from .state import content_hashes, state_key_for_path
+from .strategy import DraftSaveStrategy
+from .tracing import span
+
+TRANSFER_MODES = ("full", "minimal")
+
+
+class PostResult(
+    namedtuple("PostResult", "success article_id created_new skipped matched", defaults=(False,))
+):
+    """post_article の結果
+
+    skipped は変更がなく何も送らなかった場合、matched は note_id がなかった記事を
+    記事一覧 (ArticleIndex) から見つけた既存記事に投稿した場合に True。
+    """
 
+    __slots__ = ()
 
-def post_to_note(
+
+def post_to_note(email, password, title, markdown_content, *args, **kwargs):
+    """noteに記事を投稿し、(成功したか, 記事 ID, 新規作成したか) を返す
+
+    引数は post_article と同じ。スキップや既存記事との一致も知りたい場合は post_article を使う。
+    """
+    result = post_article(email, password, title, markdown_content, *args, **kwargs)
+    return result.success, result.article_id, result.created_new
+
+
+def post_article(
     email,
     password,
     title,
@@ -18,65 +58,382 @@ def post_to_note(
     article_id=None,
     publish=False,
     hashtags=None,
+    state=None,
+    state_key=None,
+    transfer_mode="full",
+    client=None,
+    journal=None,
+    dry_run=False,
+    article_index=None,
+    note_key=None,
+    content_file=None,
 ):
-    """noteに記事を投稿するメインフロー"""
+    """noteに記事を投稿するメインフロー (結果は PostResult で返す)
+
+    state (SyncState) と state_key を渡すと、前回の同期から変わっていない
+    記事はログインせずにスキップし、変わっていない工程も省略する。
+    既存記事の更新時は取得した記事との差分も確認し、差分のない工程を省略する。
+    transfer_mode="minimal" では本文を 1 回だけ送るように、本文なしで記事を作成し、
+    公開時は下書き保存を省略する (拒否された場合は通常の手順に戻す)。
+    client (NoteClient) を渡すと、ログインせずにそのクライアントの Cookie を使う。
+    journal (Journal) を渡すと各工程の完了を記録し、前回途中で止まった投稿は
+    作成済みの記事とアップロード済みの画像を再利用して、残りの工程から再開する。
+    ジャーナルは state_key か content_file (記事ファイルのパス) ごとに記録する。
+    dry_run=True なら通信を一切せず、送るはずのリクエストを JSON で出力して終わる。
+    トレーサー (tracing.set_tracer) が設定されていれば、各工程の処理時間をスパンに記録する。
+    期限 (deadline.set_deadline) が設定されていれば、各工程の前とリクエストごとに残り時間を確認し、
+    期限を過ぎたかタイムアウトした時点で失敗として中断する。
+    article_index (ArticleIndex) を渡すと、article_id のない記事は新規作成する前に
+    記事キー (note_key) かタイトルが一致する既存記事を探し、見つかればそれを更新する。
+    """
+    with span(
+        "post_to_note",
+        title=title,
+        article_id=str(article_id) if article_id else None,
+        publish=bool(publish),
+        transfer_mode=transfer_mode,
+        state_key=state_key,
+    ) as current:
+        try:
+            result = _post_to_note(
+                email,
+                password,
+                title,
+                markdown_content,
+                image_path,
+                eyecatch_image_url,
+                article_id,
+                publish,
+                hashtags,
+                state,
+                state_key,
+                transfer_mode,
+                client,
+                journal,
+                dry_run,
+                article_index,
+                note_key,
+                content_file,
+            )
+        except (DeadlineExceeded, requests.Timeout) as exc:
+            # Completed steps are in the journal, so the next run resumes from here.
+            print(f"投稿を中断しました: {exc}")
+            result = PostResult(False, None, False, False)
+        current.set(
+            success=result.success,
+            result_article_id=result.article_id,
+            created_new=result.created_new,
+            skipped=result.skipped,
+            matched=result.matched,
+        )
+    return result
+
+
+def _post_to_note(
+    email,
+    password,
+    title,
+    markdown_content,
+    image_path,
+    eyecatch_image_url,
+    article_id,
+    publish,
+    hashtags,
+    state,
+    state_key,
+    transfer_mode,
+    client,
+    journal,
+    dry_run,
+    article_index,
+    note_key,
+    content_file,
+):
+    if dry_run:
+        report = plan_post(
+            title,
+            markdown_content,
+            eyecatch_image_url=eyecatch_image_url,
+            article_id=article_id,
+            publish=publish,
+            hashtags=hashtags,
+            transfer_mode=transfer_mode,
+        )
+        print(json.dumps(report, ensure_ascii=False))
+        return PostResult(True, str(article_id) if article_id else None, False, False)
+
+    minimal = transfer_mode == "minimal"
+    hashes = None
+    changed = None
+    image_cache = None
+    if state is not None and state_key:
+        previous = state.get(state_key)
+        hashes = content_hashes(title, markdown_content, hashtags, eyecatch_image_url, publish)
+        image_cache = dict(previous.get("images") or {})
+        known_id = previous.get("note_id")
+        if known_id and (not article_id or str(article_id) == known_id):
+            article_id = known_id
+            changed = state.changed_fields(state_key, hashes)
+            if not changed:
+                print(f"前回の同期から変更がないためスキップします: {state_key} (ID: {known_id})")
+                return PostResult(True, known_id, False, True)
+            print(f"前回の同期からの変更: {sorted(changed)}")
+
+    created_new = False
+    article_key = None
+    resumed = False
+    progress = {"article_id": None, "article_key": None, "images": {}, "steps": set()}
+    if journal is not None:
+        entry_key = journal_key(state_key, title, content_file)
+        fingerprint = content_fingerprint(
+            content_hashes(title, markdown_content, hashtags, eyecatch_image_url, publish)
+        )
+        # A title alone may be shared by other files: only the same content resumes.
+        progress = journal.resume(
+            entry_key, fingerprint, same_content_only=not (state_key or content_file)
+        )
+        if progress["article_id"] and not article_id:
+            article_id = progress["article_id"]
+            article_key = progress["article_key"]
+            # The earlier run created the article but never reported its id.
+            created_new = True
+            resumed = True
+            print(f"前回中断した投稿を再開します (ID: {article_id}, 完了済み: {sorted(progress['steps'])})")
+
+        def checkpoint(step, **data):
+            journal.record(entry_key, step, fingerprint, **data)
+
+    else:
+
+        def checkpoint(step, **data):
+            pass
+
     print("1. noteにログイン中...")
-    cookies = get_note_cookies(email, password)
+    with phase("login", shared=client is not None):
+        cookies = client.get_cookies() if client is not None else get_note_cookies(email, password)
     if not cookies:
         print("ログインに失敗したため処理を中断します。")
-        return False, None, False
+        return PostResult(False, None, False, False)
 
-    print("2. 本文中の画像をアップロード中...")
-    processed_markdown, embedded_image_keys = upload_markdown_images(cookies, markdown_content)
+    if resumed:
+        with phase("verify_resumed", article_id=str(article_id)):
+            exists = article_exists(cookies, article_id)
+        if exists is False:
+            # Deleted on note since: without this the entry could never finish.
+            print(f"前回中断した投稿の記事 (ID: {article_id}) が見つからないため、作成し直します。")
+            journal.finish(entry_key)
+            article_id = article_key = None
+            created_new = resumed = False
+            progress = {"article_id": None, "article_key": None, "images": {}, "steps": set()}
 
-    created_new = False
-    if article_id:
-        print(f"3. 既存記事を更新中... (ID: {article_id})")
-        article_id, article_key, _ = update_existing_article(
-            cookies, article_id, title, processed_markdown
-        )
+    remote = None
+    matched = False
+    index_account = account_key(email)
+    index_source = state_key_for_path(content_file) if content_file else None
+    if not article_id and article_index is not None:
+        with phase("index_lookup") as current:
+            match = article_index.lookup(
+                index_account, cookies, title=title, key=note_key, source=index_source
+            )
+            current.set(found=match is not None)
+        if match:
+            article_id = match["id"]
+            matched = True
+            print(f"記事一覧から既存の記事が見つかったため、新規作成せずに更新します (ID: {article_id})")
+
+    if article_id and not resumed and (changed is None or changed & {"title", "body", "hashtags", "publish"}):
+        print(f"2. 既存記事の状態を確認中... (ID: {article_id})")
+        with phase("fetch_existing", article_id=str(article_id)):
+            article_id, article_key, remote = update_existing_article(
+                cookies, article_id, title, markdown_content
+            )
+        if not article_id:
+            if matched:
+                # Most likely deleted on note; look it up afresh next time.
+                article_index.forget(index_account, match["id"])
+                article_index.save()
+            return PostResult(False, None, False, False)
+        if remote is not None:
+            remote_changed = diff_remote_article(
+                remote,
+                title,
+                markdown_content,
+                hashtags=hashtags,
+                eyecatch_image_url=eyecatch_image_url,
+                publish=publish,
+            )
+            if changed is None:
+                changed = remote_changed
+            else:
+                # The remote copy is authoritative for fields it can compare
+                # exactly; the body only when it has no rehosted images.
+                comparable = set(REMOTE_COMPARABLE_FIELDS)
+                if not extract_image_urls(markdown_content):
+                    comparable.add("body")
+                changed = {
+                    name for name in changed if name not in comparable or name in remote_changed
+                }
+            if not changed:
+                print("既存記事と差分がないため更新をスキップします。")
+                if hashes is not None:
+                    state.update(state_key, article_id, hashes, images=image_cache)
+                    state.save()
+                return PostResult(True, str(article_id), False, True, matched)
+            print(f"既存記事との差分: {sorted(changed)}")
+
+    # changed is None when neither sync state nor the remote copy is usable: run every step.
+    body_changed = changed is None or bool(changed & {"title", "body"})
+    publish_changed = changed is None or bool(changed & {"title", "body", "hashtags", "publish"})
+    eyecatch_changed = changed is None or "eyecatch" in changed
+    # Only front matter changed: publish with the body note already has
+    # instead of uploading the images and rendering the body again.
+    remote_body = (
+        remote.get("body")
+        if not body_changed and not resumed and article_id and remote is not None
+        else None
+    )
+
+    processed_markdown = markdown_content
+    embedded_image_keys = []
+    if remote_body and publish and publish_changed:
+        print("3. 本文に変更がないため、note 上の本文を再利用します (画像アップロードなし)。")
+        embedded_image_keys = remote_image_keys(remote)
+        if not embedded_image_keys and image_cache:
+            embedded_image_keys = list(
+                dict.fromkeys(
+                    image_cache[src][0]
+                    for src in extract_image_urls(markdown_content)
+                    if image_cache.get(src) and image_cache[src][0]
+                )
+            )
+    elif body_changed or (publish and publish_changed):
+        print("3. 本文中の画像をアップロード中...")
+        if progress["images"]:
+            image_cache = dict(progress["images"], **(image_cache or {}))
+        with phase("images") as current:
+            processed_markdown, embedded_image_keys = upload_markdown_images(
+                cookies,
+                markdown_content,
+                image_cache=image_cache,
+                on_upload=lambda src, image_key, url: checkpoint(
+                    "image", src=src, image_key=image_key, url=url
+                ),
+            )
+            current.set(image_keys=len(embedded_image_keys))
     else:
-        print("3. 記事を作成中...")
-        article_id, article_key = create_article(cookies, title, processed_markdown)
-        created_new = True
+        print("3. 本文に変更がないため画像アップロードをスキップします。")
+
     if not article_id:
-        return False, None, False
+        print("4. 記事を作成中...")
+        with phase("create", empty_body=minimal):
+            article_id, article_key = create_article(
+                cookies, title, processed_markdown, empty_body=minimal
+            )
+        created_new = True
+        if not article_id:
+            return PostResult(False, None, False, False)
+        checkpoint("created", article_id=str(article_id), article_key=article_key)
+        if article_index is not None:
+            article_index.record(
+                index_account,
+                article_id,
+                key=article_key,
+                title=title,
+                status="draft",
+                source=index_source,
+            )
+            article_index.save()
 
     image_key = None
     if image_path:
-        print("4. 画像をアップロード中...")
+        print("5. 画像をアップロード中...")
         # image_key, _ = upload_image(cookies, image_path)
 
-    print("5. 記事を下書き保存中...")
-    success = update_article_draft(
-        cookies,
-        article_id,
-        article_key,
-        title,
-        processed_markdown,
-        image_key,
-        embedded_image_keys,
-    )
-    if not success:
-        return False, None, created_new
+    def save_draft():
+        with phase("draft_save") as current:
+            saved = update_article_draft(
+                cookies,
+                article_id,
+                article_key,
+                title,
+                processed_markdown,
+                image_key,
+                embedded_image_keys,
+                strategy=client.draft_strategy if client is not None else DraftSaveStrategy(),
+                account=account_key(email),
+                minimal=minimal,
+            )
+            current.set(success=saved)
+        return saved
 
-    if publish:
-        print("6. 記事を公開中...")
-        success = publish_article(
-            cookies,
-            article_id,
-            title,
-            processed_markdown,
-            hashtags=hashtags,
-            article_key=article_key,
-            embedded_image_keys=embedded_image_keys,
-        )
+    # In minimal mode the publish request carries the body, so a separate
+    # draft_save would only send the same HTML once more.
+    draft_skipped = minimal and publish and publish_changed
+    if "draft_saved" in progress["steps"]:
+        print("6. 前回の実行で下書き保存済みのためスキップします。")
+    elif body_changed and not draft_skipped:
+        print("6. 記事を下書き保存中...")
+        if not save_draft():
+            return PostResult(False, None, created_new, False)
+        checkpoint("draft_saved")
+    elif body_changed:
+        print("6. 公開リクエストで本文を送るため下書き保存を省略します。")
+    else:
+        print("6. 本文に変更がないため下書き保存をスキップします。")
+
+    if publish and publish_changed and "published" in progress["steps"]:
+        print("7. 前回の実行で公開済みのためスキップします。")
+    elif publish and publish_changed:
+        print("7. 記事を公開中...")
+        publish_kwargs = {
+            "hashtags": hashtags,
+            "article_key": article_key,
+            "embedded_image_keys": embedded_image_keys,
+            "html_content": remote_body or None,
+        }
+        with phase("publish") as current:
+            success = publish_article(
+                cookies, article_id, title, processed_markdown, **publish_kwargs
+            )
+            if not success and draft_skipped and body_changed:
+                print("下書き保存を省略した公開に失敗したため、下書き保存してから再試行します。")
+                success = save_draft() and publish_article(
+                    cookies, article_id, title, processed_markdown, **publish_kwargs
+                )
+            current.set(success=success)
         if not success:
-            return False, None, created_new
+            return PostResult(False, None, created_new, False)
+        checkpoint("published")
 
-    if eyecatch_image_url:
-        print("7. YAML image をサムネイルとしてアップロード中...")
-        upload_note_eyecatch_from_url(cookies, article_id, eyecatch_image_url)
+    if eyecatch_image_url and "eyecatch" in progress["steps"]:
+        print("8. 前回の実行でサムネイル設定済みのためスキップします。")
+    elif eyecatch_image_url and (eyecatch_changed or created_new):
+        print("8. YAML image をサムネイルとしてアップロード中...")
+        with phase("eyecatch") as current:
+            eyecatch_url = upload_note_eyecatch_from_url(cookies, article_id, eyecatch_image_url)
+            current.set(success=bool(eyecatch_url))
+        if eyecatch_url:
+            checkpoint("eyecatch")
+        elif hashes is not None:
+            # Leave the eyecatch marked as changed so the next run retries it.
+            hashes["eyecatch"] = None
+
+    if hashes is not None:
+        with span("state_save"):
+            state.update(state_key, article_id, hashes, images=image_cache)
+            state.save()
+    if journal is not None:
+        journal.finish(entry_key)
+    if article_index is not None:
+        article_index.record(
+            index_account,
+            article_id,
+            key=article_key,
+            title=title,
+            status="published" if publish else None,
+            source=index_source,
+        )
+        article_index.save()
 
     if publish:
         print("\n✅ 公開完了！")
@@ -84,4 +441,4 @@ def post_to_note(
         print("\n✅ 投稿完了！")
     if article_key:
         print(f"記事URL: https://note.com/your_username/n/{article_key}")
-    return True, str(article_id), created_new
+    return PostResult(True, str(article_id), created_new, False, matched)
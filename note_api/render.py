@@ -0,0 +1,94 @@
+import glob
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from .front_matter import split_front_matter_and_body
+from .markdown import extract_image_urls, markdown_body_length, markdown_to_html
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+
+def iter_markdown_paths(patterns):
+    """ファイル・ディレクトリ・glob パターンから Markdown ファイルを遅延列挙"""
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(pattern):
+            for path in glob.iglob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    yield path
+        else:
+            yield pattern
+
+
+def render_file(path):
+    """1 ファイルを読み込み (path, html, body_length, image_urls) を返す"""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    _, body = split_front_matter_and_body(source)
+    body = body or ""
+    return path, markdown_to_html(body), markdown_body_length(body), extract_image_urls(body)
+
+
+def _render_file_or_none(path):
+    try:
+        return render_file(path)
+    except Exception as exc:
+        print(f"レンダリング失敗: {path} ({exc})")
+        return path, None, 0, []
+
+
+def _map_chunk(func, paths):
+    return [func(path) for path in paths]
+
+
+def _chunks(paths, chunk_size):
+    iterator = iter(paths)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_files(paths, max_workers=None, chunk_size=16):
+    """複数ファイルをプロセスプールで並列レンダリングし、終わった順に結果を返す
+
+    読み込みやレンダリングに失敗したファイルは html=None で返す。
+    max_workers=1 のときはプロセスを起動せずに現在のプロセスで処理する。
+    """
+    return map_files(_render_file_or_none, paths, max_workers=max_workers, chunk_size=chunk_size)
+
+
+def map_files(func, paths, max_workers=None, chunk_size=16):
+    """func(path) をプロセスプールで並列に実行し、終わった順に結果を返す
+
+    func はモジュールレベルの関数 (または functools.partial) で、例外を自分で処理すること。
+    max_workers=1 のときはプロセスを起動せずに現在のプロセスで処理する。
+    """
+    chunk_size = max(1, int(chunk_size))
+    if max_workers == 1:
+        for chunk in _chunks(paths, chunk_size):
+            yield from _map_chunk(func, chunk)
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded number of chunks in flight so huge path lists are
+        # consumed lazily instead of being submitted all at once.
+        max_pending = max_workers * 2
+        chunks = _chunks(paths, chunk_size)
+        pending = set()
+        for chunk in islice(chunks, max_pending):
+            pending.add(executor.submit(_map_chunk, func, chunk))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+            for chunk in islice(chunks, max_pending - len(pending)):
+                pending.add(executor.submit(_map_chunk, func, chunk))
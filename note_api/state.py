@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .writeback import atomic_write_text
+
+# Bump when markdown_to_html output changes so every article is re-sent once.
+RENDERER_VERSION = "3"
+
+STATE_FIELDS = ("title", "body", "hashtags", "eyecatch", "publish")
+
+
+def _digest(value):
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def content_hashes(title, markdown_content, hashtags, eyecatch_image_url, publish):
+    """記事の各要素のハッシュを返す (本文はレンダラーのバージョン込み)"""
+    return {
+        "title": _digest(title or ""),
+        "body": _digest([RENDERER_VERSION, markdown_content or ""]),
+        "hashtags": _digest(hashtags),
+        "eyecatch": _digest(eyecatch_image_url or ""),
+        "publish": _digest(bool(publish)),
+    }
+
+
+def state_key_for_path(content_file):
+    """content_file からマニフェストのキーを作る (作業ディレクトリからの相対パス)"""
+    path = os.path.relpath(os.path.abspath(content_file))
+    return path.replace(os.sep, "/")
+
+
+class SyncState:
+    """前回の同期内容をファイル単位で記録する JSON マニフェスト
+
+    entries は キー (content_file の相対パス) -> {note_id, hashes, images, ...}。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.entries = data.get("entries", {}) if isinstance(data, dict) else {}
+            except (OSError, ValueError) as exc:
+                print(f"同期状態ファイルを読み込めないため空の状態から開始します: {path} ({exc})")
+                self.entries = {}
+
+    def get(self, key):
+        with self.lock:
+            return dict(self.entries.get(key) or {})
+
+    def changed_fields(self, key, hashes):
+        """前回から変わった要素名の集合を返す (記録がなければ全要素)"""
+        previous = self.get(key).get("hashes") or {}
+        return {name for name in STATE_FIELDS if previous.get(name) != hashes.get(name)}
+
+    def update(self, key, note_id, hashes, images=None):
+        with self.lock:
+            self.entries[key] = {
+                "note_id": str(note_id) if note_id else None,
+                "hashes": dict(hashes),
+                "images": dict(images or {}),
+                "synced_at": int(time.time()),
+            }
+            self.dirty = True
+
+    def rename(self, old_key, new_key):
+        """リネームされたファイルの記録を新しいキーに引き継ぐ (新しいキーに記録があれば何もしない)"""
+        with self.lock:
+            if old_key == new_key or old_key not in self.entries or new_key in self.entries:
+                return False
+            self.entries[new_key] = self.entries.pop(old_key)
+            self.dirty = True
+            return True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or not self.path:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            text = json.dumps(
+                {"version": 1, "entries": self.entries},
+                ensure_ascii=False,
+                indent=2,
+                sort_keys=True,
+            )
+            atomic_write_text(self.path, text + "\n")
+            self.dirty = False
@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+import time
+
+from .cache import cache_path
+from .writeback import atomic_write_text
+
+# A pattern that failed this many times without ever succeeding is only
+# tried after every other pattern.
+DROP_AFTER_FAILURES = 3
+
+
+class DraftSaveStrategy:
+    """draft_save で通ったペイロード形式をアカウントごとに記録する
+
+    records は アカウントキー -> {"preferred": 形式名, "patterns": {形式名: 統計}}。
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else cache_path("draft_strategy.json")
+        self.records = {}
+        self.lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self.records = data
+            except (OSError, ValueError) as exc:
+                print(f"draft_save の学習結果を読み込めないため初期状態で開始します: {exc}")
+
+    def order(self, account, names):
+        """試す順番に並べ替えた形式名のリストを返す"""
+        record = self.records.get(account) or {}
+        patterns = record.get("patterns") or {}
+        preferred = record.get("preferred")
+
+        def rank(item):
+            idx, name = item
+            stats = patterns.get(name) or {}
+            dropped = stats.get("success", 0) == 0 and stats.get("failure", 0) >= DROP_AFTER_FAILURES
+            return (name != preferred, dropped, -stats.get("success", 0), idx)
+
+        return [name for _, name in sorted(enumerate(names), key=rank)]
+
+    def record(self, account, name, ok, status=None, detail=None):
+        with self.lock:
+            record = self.records.setdefault(account, {"preferred": None, "patterns": {}})
+            stats = record["patterns"].setdefault(name, {"success": 0, "failure": 0})
+            if ok:
+                stats["success"] += 1
+                record["preferred"] = name
+            else:
+                stats["failure"] += 1
+                stats["last_status"] = status
+                stats["last_error"] = (detail or "")[:200]
+                if record.get("preferred") == name:
+                    record["preferred"] = None
+            stats["updated_at"] = int(time.time())
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            text = json.dumps(self.records, ensure_ascii=False, indent=2, sort_keys=True)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            atomic_write_text(self.path, text + "\n", fsync="none")
+        except OSError as exc:
+            print(f"draft_save の学習結果を保存できませんでした: {exc}")
@@ -0,0 +1,256 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import requests
+
+from .writeback import atomic_write_text
+
+SERVICE_NAME = "github-to-note"
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+
+# OTLP status codes.
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("note_span", default=None)
+_tracer = None
+
+
+@dataclass
+class Span:
+    """1 つの処理区間 (時刻はエポックからのナノ秒)"""
+
+    name: str
+    span_id: str
+    parent_id: str = None
+    start_ns: int = 0
+    end_ns: int = None
+    attributes: dict = field(default_factory=dict)
+    error: str = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """実行 1 回分のスパンを集める
+
+    作成と同時に実行全体を表すルートスパン (root_name) を開始する。親のないスパン
+    (ワーカースレッドで始まったものなど) はルートスパンの子になる。
+    """
+
+    def __init__(self, root_name="run", service_name=SERVICE_NAME, **attributes):
+        self.service_name = service_name
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.lock = threading.Lock()
+        # Wall clock once, monotonic clock for every offset after it.
+        self._epoch_ns = time.time_ns()
+        self._base_ns = time.perf_counter_ns()
+        self.root = self.start(root_name, parent=None, **attributes)
+
+    def now_ns(self):
+        return self._epoch_ns + time.perf_counter_ns() - self._base_ns
+
+    def start(self, name, parent=False, **attributes):
+        """スパンを開始する (parent=False なら現在のスパンかルートスパンの子にする)"""
+        if parent is False:
+            parent = _current_span.get() or getattr(self, "root", None)
+        span = Span(
+            name=name,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=self.now_ns(),
+            attributes=attributes,
+        )
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def end(self, span, error=None):
+        span.end_ns = self.now_ns()
+        if error is not None:
+            span.error = error
+
+    def finish(self):
+        """ルートスパンを閉じる (開いたままのスパンも同じ時刻で閉じる)"""
+        now = self.now_ns()
+        with self.lock:
+            for span in self.spans:
+                if span.end_ns is None:
+                    span.end_ns = now
+
+    def report(self):
+        """JSON で書き出す実行レポート (スパンの一覧と、スパン名ごとの集計)"""
+        with self.lock:
+            spans = list(self.spans)
+        phases = {}
+        for span in spans:
+            if span is self.root or span.end_ns is None:
+                continue
+            phase = phases.setdefault(
+                span.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0}
+            )
+            phase["count"] += 1
+            phase["total_ms"] += span.duration_ms
+            phase["max_ms"] = max(phase["max_ms"], span.duration_ms)
+            phase["errors"] += span.error is not None
+        for phase in phases.values():
+            phase["total_ms"] = round(phase["total_ms"], 3)
+            phase["max_ms"] = round(phase["max_ms"], 3)
+        return {
+            "service": self.service_name,
+            "trace_id": self.trace_id,
+            "started_at": self._epoch_ns / 1e9,
+            "duration_ms": self.root.duration_ms,
+            "attributes": self.root.attributes,
+            "phases": phases,
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "start_ms": round((span.start_ns - self._epoch_ns) / 1e6, 3),
+                    "duration_ms": round(span.duration_ms, 3) if span.end_ns else None,
+                    "attributes": span.attributes,
+                    "error": span.error,
+                }
+                for span in spans
+            ],
+        }
+
+    def write_report(self, path):
+        atomic_write_text(path, json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n")
+
+    def otlp_payload(self):
+        """OTLP/HTTP (JSON エンコード) の ExportTraceServiceRequest"""
+        with self.lock:
+            spans = list(self.spans)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "note_api"},
+                            "spans": [self._otlp_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def _otlp_span(self, span):
+        record = {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": _STATUS_OK},
+        }
+        if span.parent_id:
+            record["parentSpanId"] = span.parent_id
+        if span.error is not None:
+            record["status"] = {"code": _STATUS_ERROR, "message": span.error}
+        return record
+
+    def export_otlp(self, endpoint=DEFAULT_OTLP_ENDPOINT, timeout=5):
+        """OTLP/HTTP のコレクターへスパンを送る。失敗しても例外は出さず False を返す"""
+        try:
+            response = requests.post(
+                endpoint,
+                data=json.dumps(self.otlp_payload()).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                timeout=timeout,
+            )
+        except requests.RequestException as exc:
+            print(f"トレースの送信に失敗しました: {endpoint} ({exc})")
+            return False
+        if response.status_code >= 400:
+            print(f"トレースの送信に失敗しました: {endpoint} ({response.status_code})")
+            return False
+        return True
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple, set)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+def otlp_traces_endpoint(endpoint):
+    """OTEL_EXPORTER_OTLP_ENDPOINT 形式のベース URL なら /v1/traces を付ける"""
+    endpoint = endpoint.rstrip("/")
+    if endpoint.endswith("/v1/traces"):
+        return endpoint
+    return f"{endpoint}/v1/traces"
+
+
+def set_tracer(tracer):
+    """プロセス全体で使うトレーサーを設定する (None で無効化)"""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+@contextmanager
+def span(name, **attributes):
+    """with ブロックの処理時間をスパンとして記録する
+
+    トレーサーが設定されていなければ何もしない。例外はスパンにエラーとして
+    記録してからそのまま送出する。with で受け取ったスパンの set() で属性を追加できる。
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    current = tracer.start(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        tracer.end(current, error=f"{type(exc).__name__}: {exc}")
+        raise
+    else:
+        tracer.end(current)
+    finally:
+        _current_span.reset(token)
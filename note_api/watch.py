@@ -0,0 +1,228 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import select
+import struct
+import time
+
+from .render import MARKDOWN_EXTENSIONS, iter_markdown_paths
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _normalize(path):
+    return os.path.normpath(os.path.abspath(path))
+
+
+def _glob_root(pattern):
+    """glob パターンのうち特殊文字を含まない先頭ディレクトリ"""
+    parts = []
+    for part in pattern.replace(os.sep, "/").split("/"):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+
+class _Targets:
+    """監視対象 (ファイル・ディレクトリ・glob) と、変更を拾うべきパスの判定"""
+
+    def __init__(self, targets):
+        self.files = set()
+        self.dirs = []
+        self.globs = []
+        for target in targets:
+            if glob.has_magic(target):
+                self.globs.append(target)
+            elif os.path.isdir(target):
+                self.dirs.append(_normalize(target))
+            else:
+                self.files.add(_normalize(target))
+
+    def watch_roots(self):
+        """(ディレクトリ, 再帰するか) の列"""
+        roots = [(os.path.dirname(path), False) for path in sorted(self.files)]
+        roots += [(path, True) for path in self.dirs]
+        roots += [(_normalize(_glob_root(pattern)), True) for pattern in self.globs]
+        return roots
+
+    def matcher(self):
+        """変更されたパスが対象かどうかを返す関数 (glob はその時点で展開する)"""
+        globbed = set()
+        for pattern in self.globs:
+            globbed.update(_normalize(p) for p in glob.iglob(pattern, recursive=True))
+
+        def matches(path):
+            if path in self.files or path in globbed:
+                return True
+            if not path.lower().endswith(MARKDOWN_EXTENSIONS):
+                return False
+            return any(path.startswith(directory + os.sep) for directory in self.dirs)
+
+        return matches
+
+    def snapshot(self):
+        patterns = sorted(self.files) + self.dirs + self.globs
+        result = {}
+        for path in iter_markdown_paths(patterns):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result[_normalize(path)] = (st.st_mtime_ns, st.st_size)
+        return result
+
+
+def _load_libc():
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class _InotifyWatcher:
+    """inotify (ctypes 経由) でディレクトリを監視する"""
+
+    def __init__(self, targets, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.recursive = set()
+        for directory, recursive in targets.watch_roots():
+            self._add(directory, recursive)
+
+    def _add(self, directory, recursive):
+        if not os.path.isdir(directory):
+            return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            print(f"監視を追加できません: {directory} ({os.strerror(errno)})")
+            return
+        self.watches[wd] = directory
+        if not recursive:
+            return
+        self.recursive.add(wd)
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not name.startswith(".") and os.path.isdir(path):
+                self._add(path, True)
+
+    def wait(self, timeout):
+        """timeout 秒 (None なら無期限) 待ち、変更されたパスのリストを返す"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                print("inotify のイベントがあふれました。一部の変更を取りこぼした可能性があります。")
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if wd in self.recursive and not os.path.basename(path).startswith("."):
+                    self._add(path, True)
+                    changed.extend(_normalize(p) for p in iter_markdown_paths([path]))
+                continue
+            changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingWatcher:
+    """inotify が使えない環境向けに、更新時刻とサイズを定期的に比べる"""
+
+    def __init__(self, targets, poll_interval):
+        self.targets = targets
+        self.poll_interval = poll_interval
+        self.previous = targets.snapshot()
+
+    def wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.poll_interval
+            if deadline is not None:
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            time.sleep(delay)
+            current = self.targets.snapshot()
+            changed = [
+                path for path, stamp in current.items() if self.previous.get(path) != stamp
+            ]
+            self.previous = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def watch_changes(targets, debounce=1.0, poll_interval=1.0, use_inotify=True):
+    """対象の Markdown ファイルの変更を待ち、変更されたパスのリストを順に返す
+
+    連続した保存は debounce 秒静かになるまで 1 回にまとめ、同じファイルの
+    複数回の変更は 1 件に合わせる。変更が続いても debounce の 10 倍で打ち切る。
+    Linux では inotify、それ以外ではポーリングで監視する。
+    """
+    targets = _Targets(targets)
+    libc = _load_libc() if use_inotify else None
+    watcher = None
+    if libc is not None:
+        try:
+            watcher = _InotifyWatcher(targets, libc)
+        except OSError as exc:
+            print(f"inotify を初期化できません: {exc}")
+    if watcher is None:
+        print(f"inotify が使えないため {poll_interval} 秒ごとのポーリングで監視します。")
+        watcher = _PollingWatcher(targets, poll_interval)
+
+    try:
+        while True:
+            changed = set(watcher.wait(None))
+            limit = time.monotonic() + debounce * 10
+            while time.monotonic() < limit:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed.update(more)
+            matches = targets.matcher()
+            paths = sorted(path for path in changed if matches(path) and os.path.isfile(path))
+            if paths:
+                yield [os.path.relpath(path) for path in paths]
+    finally:
+        watcher.close()
@@ -0,0 +1,142 @@
+import os
+import re
+import stat
+import tempfile
+
+from .front_matter import _strip_quotes
+
+# none: no fsync, file: fsync the temp file before rename,
+# full: additionally fsync the directory so the rename itself is durable.
+FSYNC_POLICIES = ("none", "file", "full")
+
+# os.umask can only be read by setting it, which would race with worker
+# threads, so read it once at import.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_text(path, text, fsync="file"):
+    """一時ファイルに書き込んでから os.replace で置き換える"""
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"unknown fsync policy: {fsync}")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+            f.flush()
+            if fsync != "none":
+                os.fsync(f.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            # mkstemp creates 0600; give a new file the mode open() would.
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if fsync == "full" and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _front_matter_span(source):
+    """front matter 本体の (開始, 終了) 位置を返す。なければ None"""
+    newline = "\r\n" if source.startswith("---\r\n") else "\n"
+    opening = f"---{newline}"
+    if not source.startswith(opening):
+        return None, newline
+    end = source.find(f"{newline}---{newline}", len(opening))
+    if end == -1:
+        return None, newline
+    return (len(opening), end), newline
+
+
+def set_front_matter_value(source, key, value):
+    """source の front matter の key を value にした文字列を返す
+
+    front matter がなければ None、値が変わらなければ source をそのまま返す。
+    本文や他の行には一切触れない。
+    """
+    span, newline = _front_matter_span(source)
+    if span is None:
+        return None
+    start, end = span
+    front_matter = source[start:end]
+    line = f"{key}: {value}"
+
+    pattern = re.compile(
+        rf"^[ \t]*{re.escape(key)}[ \t]*:[ \t]*(.*?)[ \t]*(?=\r?$)", re.MULTILINE
+    )
+    m = pattern.search(front_matter)
+    if m:
+        if _strip_quotes(m.group(1)) == str(value):
+            return source
+        front_matter = front_matter[: m.start()] + line + front_matter[m.end() :]
+    else:
+        front_matter = f"{front_matter}{newline}{line}"
+    return source[:start] + front_matter + source[end:]
+
+
+def upsert_front_matter_value(path, key, value, fsync="file"):
+    """ファイルの front matter の key を更新する
+
+    戻り値は "updated" / "unchanged" / "skipped" (front matter なし) のいずれか。
+    読み書きに失敗した場合は OSError をそのまま送出する。
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        source = f.read()
+    updated = set_front_matter_value(source, key, value)
+    if updated is None:
+        return "skipped"
+    if updated == source:
+        return "unchanged"
+    atomic_write_text(path, updated, fsync=fsync)
+    return "updated"
+
+
+def write_back_note_id(content_file, note_id, fsync="file"):
+    """content_file に note_id を書き戻す。成功 (変更なしを含む) なら True"""
+    try:
+        result = upsert_front_matter_value(content_file, "note_id", note_id, fsync=fsync)
+    except OSError as exc:
+        print(f"note_id の書き戻し失敗: {content_file} ({exc})")
+        return False
+
+    if result == "skipped":
+        print("note_id の書き戻しスキップ: YAML front matter がありません。")
+        return False
+    if result == "unchanged":
+        print(f"note_id は最新のため書き戻し不要です: {content_file} (note_id={note_id})")
+        return True
+    print(f"content_file に note_id を書き戻しました: {content_file} (note_id={note_id})")
+    return True
+
+
+class NoteIdWriteBack:
+    """バッチ実行中の note_id 書き戻しを溜めておき、最後にまとめて反映する"""
+
+    def __init__(self, fsync="file"):
+        self.fsync = fsync
+        self.pending = {}
+
+    def queue(self, content_file, note_id):
+        self.pending[os.path.abspath(content_file)] = note_id
+
+    def flush(self):
+        """溜めた書き戻しを 1 ファイル 1 回ずつ反映し、成功件数を返す"""
+        pending, self.pending = self.pending, {}
+        written = 0
+        for content_file, note_id in pending.items():
+            if write_back_note_id(content_file, note_id, fsync=self.fsync):
+                written += 1
+        return written
@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from note_api.accounts import AccountConfigError, account_router, load_accounts
+
+
+class LoadAccountsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "accounts.json")
+        patcher = mock.patch.dict(os.environ, {"NOTE_LOGIN_MODE": "browser"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_values_and_env_references(self):
+        self.write(
+            {
+                "default": "brand",
+                "accounts": {
+                    "brand": {"email": "b@example.com", "password_env": "BRAND_PASSWORD", "paths": "brand/**"},
+                    "alice": {"email": "a@example.com", "password": "pw", "concurrency": 3},
+                },
+            }
+        )
+        with mock.patch.dict(os.environ, {"BRAND_PASSWORD": "secret"}):
+            accounts, default = load_accounts(self.path)
+        self.assertEqual(default, "brand")
+        self.assertEqual(accounts["brand"].password, "secret")
+        self.assertEqual(accounts["brand"].paths, ["brand/**"])
+        self.assertEqual(accounts["alice"].concurrency, 3)
+
+    def test_missing_password(self):
+        self.write({"accounts": {"alice": {"email": "a@example.com"}}})
+        with self.assertRaises(AccountConfigError):
+            load_accounts(self.path)
+
+    def test_session_mode_needs_no_password(self):
+        self.write({"accounts": {"alice": {"email": "a@example.com"}}})
+        with mock.patch.dict(os.environ, {"NOTE_LOGIN_MODE": "session"}):
+            accounts, default = load_accounts(self.path, "d@example.com", None)
+        self.assertIsNone(accounts["alice"].password)
+        self.assertEqual(default, "default")
+
+    def test_not_an_object(self):
+        for data in ([{"email": "a@example.com"}], {"accounts": ["alice"]}, {"accounts": {"alice": "a"}}):
+            with self.subTest(data=data):
+                self.write(data)
+                with self.assertRaises(AccountConfigError):
+                    load_accounts(self.path)
+
+    def test_unknown_default(self):
+        self.write({"default": "bob", "accounts": {"alice": {"email": "a", "password": "p"}}})
+        with self.assertRaises(AccountConfigError):
+            load_accounts(self.path)
+
+    def test_only_implicit_default_uses_global_session(self):
+        self.write(
+            {
+                "accounts": {
+                    "alice": {"email": "a", "password": "p"},
+                    "bob": {"email": "b", "password": "p", "cookie_env": "BOB_COOKIE"},
+                }
+            }
+        )
+        with mock.patch.dict(os.environ, {"BOB_COOKIE": "_note_session_v5=bob"}):
+            accounts, _ = load_accounts(self.path, "d@example.com", "pw")
+            self.assertEqual(accounts["alice"].fallback_cookies(), {})
+            self.assertEqual(accounts["bob"].fallback_cookies(), {"_note_session_v5": "bob"})
+            # None lets get_note_cookies fall back to NOTE_COOKIE / NOTE_SESSION_V5.
+            self.assertIsNone(accounts["default"].fallback_cookies())
+
+
+class AccountRouterTest(unittest.TestCase):
+    def test_front_matter_then_paths_then_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.addCleanup(os.chdir, os.getcwd())
+            os.chdir(tmp)
+            os.makedirs("brand")
+            with open("brand/a.md", "w", encoding="utf-8") as f:
+                f.write("---\ntitle: a\n---\n")
+            with open("brand/b.md", "w", encoding="utf-8") as f:
+                f.write("---\ntitle: b\nnote_account: alice\n---\n")
+            with open("c.md", "w", encoding="utf-8") as f:
+                f.write("---\ntitle: c\n---\n")
+            self.write_config(tmp)
+            accounts, default = load_accounts(os.path.join(tmp, "accounts.json"))
+            route = account_router(accounts, default)
+            self.assertEqual(route("brand/a.md"), "brand")
+            self.assertEqual(route("brand/b.md"), "alice")
+            self.assertEqual(route("c.md"), "alice")
+
+    def write_config(self, directory):
+        data = {
+            "default": "alice",
+            "accounts": {
+                "brand": {"email": "b", "password": "p", "paths": ["brand/*.md"]},
+                "alice": {"email": "a", "password": "p"},
+            },
+        }
+        with open(os.path.join(directory, "accounts.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+from unittest import mock
+
+from note_api import articles
+
+
+class ArticleExistsTest(unittest.TestCase):
+    def check(self, status):
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=status)
+        with mock.patch.object(articles, "get_session", return_value=session):
+            return articles.article_exists({"_note_session_v5": "s"}, "1")
+
+    def test_status_codes(self):
+        self.assertTrue(self.check(200))
+        self.assertFalse(self.check(404))
+        # Anything else is unknown: the resumed article is kept.
+        self.assertIsNone(self.check(500))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from note_api.gitdiff import GitDiffError, changed_markdown_files, note_id_at_revision
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class ChangedMarkdownFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = self.tmp.name
+        self.git("init", "-q")
+        self.write("posts/keep.md", "---\ntitle: keep\nnote_id: n1\n---\nbody\n")
+        self.write("posts/old.md", "---\ntitle: old\nnote_id: n2\n---\n" + "long body\n" * 20)
+        self.write("posts/gone.md", "---\ntitle: gone\n---\nbody\n")
+        self.write("notes.txt", "text\n")
+        self.base = self.commit("base")
+
+    def git(self, *args):
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME="test",
+            GIT_AUTHOR_EMAIL="test@example.com",
+            GIT_COMMITTER_NAME="test",
+            GIT_COMMITTER_EMAIL="test@example.com",
+        )
+        completed = subprocess.run(
+            ["git", "-c", "commit.gpgsign=false"] + list(args),
+            cwd=self.repo,
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+        )
+        return completed.stdout.decode("utf-8").strip()
+
+    def write(self, path, text):
+        path = os.path.join(self.repo, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def commit(self, message):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+    def test_added_modified_and_renamed_files(self):
+        self.write("posts/keep.md", "---\ntitle: keep\nnote_id: n1\n---\nchanged\n")
+        self.write("posts/new.md", "---\ntitle: a brand new article\nnote_hashtags: [x]\n---\nfresh text\n")
+        self.write("README.md", "readme\n")
+        self.git("mv", "posts/old.md", "posts/renamed.md")
+        os.remove(os.path.join(self.repo, "posts", "gone.md"))
+        self.write("notes.txt", "changed\n")
+        self.commit("change")
+
+        changed = changed_markdown_files(self.base, "HEAD", cwd=self.repo)
+        self.assertEqual(
+            sorted((c.status, c.path, c.old_path) for c in changed),
+            [
+                ("A", "README.md", None),
+                ("A", "posts/new.md", None),
+                ("M", "posts/keep.md", None),
+                ("R", "posts/renamed.md", "posts/old.md"),
+            ],
+        )
+        in_dir = changed_markdown_files(self.base, "HEAD", content_dir="posts", cwd=self.repo)
+        self.assertNotIn("README.md", [c.path for c in in_dir])
+        by_glob = changed_markdown_files(self.base, "HEAD", globs=["posts/n*.md"], cwd=self.repo)
+        self.assertEqual([c.path for c in by_glob], ["posts/new.md"])
+
+    def test_null_base_lists_every_markdown_file(self):
+        changed = changed_markdown_files("0" * 40, "HEAD", cwd=self.repo)
+        self.assertEqual(
+            sorted(c.path for c in changed), ["posts/gone.md", "posts/keep.md", "posts/old.md"]
+        )
+
+    def test_note_id_at_revision(self):
+        self.assertEqual(note_id_at_revision(self.base, "posts/old.md", cwd=self.repo), "n2")
+        self.assertIsNone(note_id_at_revision(self.base, "posts/gone.md", cwd=self.repo))
+        self.assertIsNone(note_id_at_revision(self.base, "posts/missing.md", cwd=self.repo))
+
+    def test_unknown_revision_raises(self):
+        with self.assertRaises(GitDiffError):
+            changed_markdown_files("no-such-rev", "HEAD", cwd=self.repo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import time
+import unittest
+
+from note_api.jobqueue import MAX_ATTEMPTS, JobQueue
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.queue = JobQueue(os.path.join(self.tmp.name, "queue.db"))
+
+    def file(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_new_job_supersedes_queued_job_for_same_file(self):
+        self.queue.enqueue("alice", self.file("a.md"), action="publish", priority=5)
+        self.queue.enqueue("alice", self.file("a.md"))
+        self.assertEqual(self.queue.counts(), {"queued": 1, "superseded": 1})
+        job = self.queue.claim()
+        self.assertEqual(job.action, "publish")
+        self.assertEqual(job.priority, 5)
+
+    def test_claim_order_and_file_exclusivity(self):
+        self.queue.enqueue("alice", self.file("low.md"), priority=0)
+        self.queue.enqueue("bob", self.file("high.md"), priority=9)
+        first = self.queue.claim(default_limit=2)
+        self.assertEqual(first.content_file, self.file("high.md"))
+        self.queue.enqueue("bob", self.file("high.md"))
+        second = self.queue.claim(default_limit=2)
+        # The running file is not claimed twice.
+        self.assertEqual(second.content_file, self.file("low.md"))
+        self.assertIsNone(self.queue.claim(default_limit=2))
+
+    def test_account_limit(self):
+        self.queue.enqueue("alice", self.file("a.md"))
+        self.queue.enqueue("alice", self.file("b.md"))
+        self.queue.enqueue("bob", self.file("c.md"))
+        self.assertEqual(self.queue.claim().account, "alice")
+        self.assertEqual(self.queue.claim().account, "bob")
+        self.assertIsNone(self.queue.claim())
+        self.assertIsNotNone(self.queue.claim(account_limits={"alice": 2}))
+
+    def test_failed_job_is_retried_later_then_failed(self):
+        self.queue.enqueue("alice", self.file("a.md"))
+        job = self.queue.claim()
+        self.assertEqual(self.queue.fail(job, "boom"), "queued")
+        # Backed off: not ready yet.
+        self.assertIsNone(self.queue.claim())
+        self.assertFalse(self.queue.has_ready())
+        job = job._replace(attempts=MAX_ATTEMPTS)
+        conn = self.queue._connection()
+        conn.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job.id,))
+        self.assertEqual(self.queue.fail(job, "boom"), "failed")
+        self.assertEqual(self.queue.counts(), {"failed": 1})
+
+    def test_complete(self):
+        job_id = self.queue.enqueue("alice", self.file("a.md"))
+        self.assertEqual(self.queue.claim().id, job_id)
+        self.queue.complete(job_id, note_id="1")
+        self.assertEqual(self.queue.counts(), {"done": 1})
+
+    def test_expired_lease_is_requeued(self):
+        queue = JobQueue(self.queue.path, lease_seconds=0)
+        queue.enqueue("alice", self.file("a.md"))
+        first = queue.claim()
+        time.sleep(0.01)
+        second = queue.claim()
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.attempts, 2)
+
+    def test_unknown_action_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.queue.enqueue("alice", self.file("a.md"), action="delete")
+        self.assertEqual(self.queue.counts(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
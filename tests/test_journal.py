@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+from note_api.journal import Journal, journal_key
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "journal.jsonl")
+
+    def test_resume_returns_completed_steps(self):
+        journal = Journal(self.path)
+        journal.record("a.md", "created", "fp1", article_id="1", article_key="n1")
+        journal.record("a.md", "image", "fp1", src="https://e/a.png", image_key="k", url="https://n/a.png")
+        journal.record("a.md", "draft_saved", "fp1")
+
+        progress = Journal(self.path).resume("a.md", "fp1")
+        self.assertEqual(progress["article_id"], "1")
+        self.assertEqual(progress["article_key"], "n1")
+        self.assertEqual(progress["images"], {"https://e/a.png": ["k", "https://n/a.png"]})
+        self.assertEqual(progress["steps"], {"draft_saved"})
+
+    def test_changed_content_keeps_article_but_reruns_steps(self):
+        journal = Journal(self.path)
+        journal.record("a.md", "created", "fp1", article_id="1", article_key="n1")
+        journal.record("a.md", "published", "fp1")
+        progress = journal.resume("a.md", "fp2")
+        self.assertEqual(progress["article_id"], "1")
+        self.assertEqual(progress["steps"], set())
+
+    def test_title_key_only_resumes_same_content(self):
+        journal = Journal(self.path)
+        key = journal_key(None, "Weekly")
+        journal.record(key, "created", "fp1", article_id="1", article_key="n1")
+        self.assertIsNone(journal.resume(key, "fp2", same_content_only=True)["article_id"])
+        self.assertEqual(journal.resume(key, "fp1", same_content_only=True)["article_id"], "1")
+
+    def test_finished_entries_are_dropped_on_reopen(self):
+        journal = Journal(self.path)
+        journal.record("a.md", "created", "fp1", article_id="1")
+        journal.record("b.md", "created", "fp1", article_id="2")
+        journal.finish("a.md")
+        reopened = Journal(self.path)
+        self.assertEqual(set(reopened.entries), {"b.md"})
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["key"] for line in f], ["b.md"])
+
+    def test_torn_last_line_is_ignored(self):
+        Journal(self.path).record("a.md", "created", "fp1", article_id="1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "a.md", "st')
+        self.assertEqual(Journal(self.path).resume("a.md", "fp1")["article_id"], "1")
+
+    def test_unknown_step_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Journal(self.path).record("a.md", "uploaded")
+
+    def test_key_prefers_state_key_then_path(self):
+        self.assertEqual(journal_key("posts/a.md", "T", "other.md"), "posts/a.md")
+        self.assertEqual(journal_key(None, "T", os.path.join("posts", "a.md")), "posts/a.md")
+        self.assertTrue(journal_key(None, "T").startswith("title:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
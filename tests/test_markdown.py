@@ -0,0 +1,96 @@
+import os
+import unittest
+from unittest import mock
+
+from note_api.markdown import inline_format, markdown_to_html
+
+
+def _link(url):
+    return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{url}</a>'
+
+
+class InlineEmphasisTest(unittest.TestCase):
+    # Inputs and the HTML the original regex renderer produced for them.
+    CASES = [
+        ("*em*", "<em>em</em>"),
+        ("**strong**", "<strong>strong</strong>"),
+        ("***both***", "<em><strong>both</strong></em>"),
+        ("*em **strong** em*", "<em>em <strong>strong</strong> em</em>"),
+        ("***a** b*", "<em><strong>a</strong> b</em>"),
+        ("*a**", "<em>a</em>*"),
+        ("*a **b", "<em>a </em>*b"),
+        ("**a** *b*", "<strong>a</strong> <em>b</em>"),
+        ("*******", "*******"),
+        ("~~gone~~", "<s>gone</s>"),
+    ]
+
+    def test_matches_regex_renderer(self):
+        for source, expected in self.CASES:
+            with self.subTest(source=source):
+                self.assertEqual(inline_format(source), expected)
+
+    def test_text_is_escaped(self):
+        self.assertEqual(inline_format("<b>&"), "&lt;b&gt;&amp;")
+
+    def test_code_spans_are_plain_text(self):
+        self.assertEqual(inline_format("`*x*`"), "*x*")
+
+
+class InlineLinkTest(unittest.TestCase):
+    def test_link_and_image(self):
+        self.assertEqual(
+            inline_format("[label](https://example.com/a)"),
+            '<a href="https://example.com/a" target="_blank" rel="noopener noreferrer">label</a>',
+        )
+        self.assertEqual(
+            inline_format("![alt](https://example.com/a.png)"),
+            '<img src="https://example.com/a.png" alt="alt" loading="lazy" class="is-slide" data-modal="true">',
+        )
+
+    def test_bare_url_is_linked(self):
+        self.assertEqual(
+            inline_format("see https://example.com/a."),
+            f"see {_link('https://example.com/a')}.",
+        )
+
+    def test_bare_url_keeps_balanced_parentheses(self):
+        self.assertEqual(
+            inline_format("(https://example.com/a(b))"),
+            f"({_link('https://example.com/a(b)')})",
+        )
+
+    def test_bare_url_drops_trailing_open_parenthesis(self):
+        self.assertEqual(
+            inline_format("https://example.com/p( x"),
+            f"{_link('https://example.com/p')}( x",
+        )
+
+    def test_malformed_link_stays_text(self):
+        self.assertEqual(inline_format("[a](https://example.com"), "[a](https://example.com")
+
+    def test_no_autolink_inside_link_label(self):
+        self.assertEqual(
+            inline_format("[https://a.example](https://b.example)"),
+            '<a href="https://b.example" target="_blank" rel="noopener noreferrer">https://a.example</a>',
+        )
+
+
+class MarkdownToHtmlTest(unittest.TestCase):
+    def test_standalone_url_is_a_paragraph_by_default(self):
+        with mock.patch.dict(os.environ, {"NOTE_EMBED_URLS": ""}):
+            html = markdown_to_html("https://youtu.be/x")
+        self.assertTrue(html.startswith("<p "))
+        self.assertIn(_link("https://youtu.be/x"), html)
+
+    def test_standalone_url_embed_is_opt_in(self):
+        with mock.patch.dict(os.environ, {"NOTE_EMBED_URLS": "1"}):
+            html = markdown_to_html("https://youtu.be/x")
+        self.assertTrue(html.startswith("<figure "))
+        self.assertIn('embedded-service="youtube"', html)
+
+    def test_empty_body(self):
+        self.assertEqual(markdown_to_html("  \n"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from note_api.state import STATE_FIELDS, SyncState, content_hashes, state_key_for_path
+
+
+class SyncStateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "state.json")
+        self.hashes = content_hashes("T", "body", ["#a"], "https://e/a.png", False)
+
+    def test_unknown_key_changes_every_field(self):
+        self.assertEqual(SyncState(self.path).changed_fields("a.md", self.hashes), set(STATE_FIELDS))
+
+    def test_only_changed_fields_are_reported(self):
+        state = SyncState(self.path)
+        state.update("a.md", 1, self.hashes)
+        hashes = content_hashes("T", "body", ["#b"], "https://e/a.png", True)
+        self.assertEqual(state.changed_fields("a.md", hashes), {"hashtags", "publish"})
+
+    def test_save_and_reload(self):
+        state = SyncState(self.path)
+        state.update("a.md", 1, self.hashes, images={"https://e/a.png": "https://n/a.png"})
+        state.save()
+        reloaded = SyncState(self.path)
+        self.assertEqual(reloaded.get("a.md")["note_id"], "1")
+        self.assertEqual(reloaded.get("a.md")["images"], {"https://e/a.png": "https://n/a.png"})
+        self.assertEqual(reloaded.changed_fields("a.md", self.hashes), set())
+
+    def test_unreadable_file_starts_empty(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{broken")
+        self.assertEqual(SyncState(self.path).entries, {})
+
+    def test_rename_moves_entry_once(self):
+        state = SyncState(self.path)
+        state.update("old.md", 1, self.hashes)
+        self.assertTrue(state.rename("old.md", "new.md"))
+        self.assertEqual(state.get("new.md")["note_id"], "1")
+        self.assertEqual(state.get("old.md"), {})
+        state.update("old.md", 2, self.hashes)
+        self.assertFalse(state.rename("old.md", "new.md"))
+        self.assertEqual(state.get("new.md")["note_id"], "1")
+
+    def test_key_is_relative_posix_path(self):
+        key = state_key_for_path(os.path.abspath(os.path.join("posts", "a.md")))
+        self.assertEqual(key, "posts/a.md")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from note_api.front_matter import parse_front_matter, split_front_matter_and_body
+from note_api.writeback import (
+    NoteIdWriteBack,
+    atomic_write_text,
+    set_front_matter_value,
+    upsert_front_matter_value,
+)
+
+
+def _note_id(source):
+    return parse_front_matter(split_front_matter_and_body(source)[0]).note_id
+
+
+class SetFrontMatterValueTest(unittest.TestCase):
+    def test_adds_missing_key(self):
+        updated = set_front_matter_value("---\ntitle: a\n---\nbody\n", "note_id", "n1")
+        self.assertEqual(updated, "---\ntitle: a\nnote_id: n1\n---\nbody\n")
+
+    def test_replaces_existing_value(self):
+        updated = set_front_matter_value("---\ntitle: a\nnote_id: n0\n---\nbody\n", "note_id", "n1")
+        self.assertEqual(updated, "---\ntitle: a\nnote_id: n1\n---\nbody\n")
+
+    def test_fills_empty_placeholder_in_place(self):
+        for source in (
+            "---\ntitle: a\nnote_id:\n---\nbody\n",
+            "---\ntitle: a\nnote_id: \n---\nbody\n",
+            '---\ntitle: a\nnote_id: ""\n---\nbody\n',
+            "---\r\ntitle: a\r\nnote_id: \r\n---\r\nbody\r\n",
+        ):
+            with self.subTest(source=source):
+                updated = set_front_matter_value(source, "note_id", "n1")
+                self.assertEqual(updated.count("note_id:"), 1)
+                self.assertEqual(_note_id(updated), "n1")
+
+    def test_keeps_crlf_line_endings(self):
+        updated = set_front_matter_value("---\r\ntitle: a\r\n---\r\nbody\r\n", "note_id", "n1")
+        self.assertEqual(updated, "---\r\ntitle: a\r\nnote_id: n1\r\n---\r\nbody\r\n")
+
+    def test_unchanged_value_returns_source(self):
+        source = '---\ntitle: a\nnote_id: "n1"\n---\nbody\n'
+        self.assertIs(set_front_matter_value(source, "note_id", "n1"), source)
+
+    def test_without_front_matter_returns_none(self):
+        self.assertIsNone(set_front_matter_value("# title\n\nbody\n", "note_id", "n1"))
+
+    def test_body_is_not_touched(self):
+        source = "---\ntitle: a\n---\nnote_id: in body\n"
+        updated = set_front_matter_value(source, "note_id", "n1")
+        self.assertTrue(updated.endswith("---\nnote_id: in body\n"))
+        self.assertEqual(_note_id(updated), "n1")
+
+
+class FileWriteBackTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name, text=None):
+        path = os.path.join(self.tmp.name, name)
+        if text is not None:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+        return path
+
+    def read(self, path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return f.read()
+
+    def test_upsert_results(self):
+        article = self.path("a.md", "---\ntitle: a\n---\nbody\n")
+        plain = self.path("b.md", "body\n")
+        self.assertEqual(upsert_front_matter_value(article, "note_id", "n1"), "updated")
+        self.assertEqual(upsert_front_matter_value(article, "note_id", "n1"), "unchanged")
+        self.assertEqual(upsert_front_matter_value(plain, "note_id", "n1"), "skipped")
+        self.assertEqual(self.read(plain), "body\n")
+        self.assertEqual(_note_id(self.read(article)), "n1")
+
+    def test_atomic_write_keeps_existing_mode(self):
+        path = self.path("a.md", "old")
+        os.chmod(path, 0o640)
+        atomic_write_text(path, "new")
+        self.assertEqual(self.read(path), "new")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self.tmp.name), ["a.md"])
+
+    def test_atomic_write_new_file_follows_umask(self):
+        path = self.path("new.md")
+        atomic_write_text(path, "text")
+        with open(self.path("plain.md"), "w", encoding="utf-8") as f:
+            f.write("text")
+        self.assertEqual(
+            stat.S_IMODE(os.stat(path).st_mode),
+            stat.S_IMODE(os.stat(self.path("plain.md")).st_mode),
+        )
+
+    def test_atomic_write_rejects_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            atomic_write_text(self.path("a.md"), "text", fsync="sometimes")
+
+    def test_batch_write_back_writes_each_file_once(self):
+        first = self.path("a.md", "---\ntitle: a\n---\nbody\n")
+        second = self.path("b.md", "no front matter\n")
+        write_back = NoteIdWriteBack(fsync="none")
+        write_back.queue(first, "n0")
+        write_back.queue(first, "n1")
+        write_back.queue(second, "n2")
+        self.assertEqual(write_back.flush(), 1)
+        self.assertEqual(_note_id(self.read(first)), "n1")
+        self.assertEqual(write_back.pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()